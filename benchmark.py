@@ -0,0 +1,164 @@
+""" Benchmarks of the performance critical parts of the NEB code
+
+    Each benchmark compares against a straightforward reference
+    implementation and checks that both give the same result.
+"""
+
+import time
+
+import numpy
+
+import neb
+from neb.bond import Bond
+from neb.methods.leps import LEPSSurface
+
+def timeit(func, *args):
+    """ Returns the result of func and the time in seconds it took """
+    t0 = time.time()
+    result = func(*args)
+    return result, time.time() - t0
+
+def bruteForceBonds(_mol):
+    """ Reference bond perception comparing all pairs of atoms """
+    bonds = []
+    for iat, atom1 in enumerate(_mol.getAtoms()):
+        for jat, atom2 in enumerate(_mol.getAtoms()):
+            if iat <= jat: continue
+            dr = atom2.getCoordinate() - atom1.getCoordinate()
+            R2 = dr.dot(dr)
+
+            dr_cov = atom1.getCovalentRadius() + atom2.getCovalentRadius() + _mol._bond_threshold
+            if R2 < dr_cov**2:
+                bonds.append(Bond(id1=iat, id2=jat))
+    return bonds
+
+def waterBox(n, density=0.0334):
+    """ Returns a cubic box of n randomly oriented water molecules
+
+        Arguments:
+        n -- the number of water molecules
+        density -- number of molecules per cubic angstrom
+    """
+    numpy.random.seed(42)
+    ngrid = int(numpy.ceil(n**(1.0/3.0)))
+    spacing = (1.0/density)**(1.0/3.0)
+    _mol = neb.Molecule()
+    atoms = []
+    for k in range(n):
+        center = spacing * numpy.array([k % ngrid, (k // ngrid) % ngrid, k // ngrid**2])
+        q, r = numpy.linalg.qr(numpy.random.randn(3, 3))
+        oh1 = q.dot([0.9572, 0.0, 0.0])
+        oh2 = q.dot([0.9572*numpy.cos(1.824), 0.9572*numpy.sin(1.824), 0.0])
+        atoms.append(neb.Atom(8, xyz=center))
+        atoms.append(neb.Atom(1, xyz=center + oh1))
+        atoms.append(neb.Atom(1, xyz=center + oh2))
+    _mol.addAtoms(*atoms)
+    return _mol
+
+def benchmarkBonds(sizes=(100, 300, 1000)):
+    print "Bond perception"
+    print "{0:>8s}{1:>8s}{2:>14s}{3:>14s}{4:>10s}".format("atoms", "bonds", "brute (s)", "cells (s)", "speedup")
+    for n in sizes:
+        _mol = waterBox(n)
+        reference, t_ref = timeit(bruteForceBonds, _mol)
+        bonds, t_new = timeit(lambda m: list(m.percieveBonds()), _mol)
+        assert [repr(b) for b in bonds] == [repr(b) for b in reference], "Bonds differ from the brute force result."
+        print "{0:8d}{1:8d}{2:14.4f}{3:14.4f}{4:10.1f}".format(_mol.getNumAtoms(), len(bonds), t_ref, t_new, t_ref / t_new)
+    print
+
+def scalarVLeps(molecule):
+    """ Reference LEPS potential: the original implementation for a single molecule """
+
+    def Q(r,d,dr):
+        alpha = 1.942
+        value = alpha * (r - 0.742)
+        energy_factor = 1.5 * numpy.exp(-2.0*value) - numpy.exp(-value)
+        gradient_factor = alpha*dr/r*(-3.0*numpy.exp(-2.0*value) + numpy.exp(-value))
+        return 0.5*d*energy_factor, 0.5*d*gradient_factor
+
+    def J(r,d,dr):
+        alpha = 1.942
+        value = alpha * (r - 0.742)
+        energy_factor = numpy.exp(-2.0*value) - 6.0*numpy.exp(-value)
+        gradient_factor = alpha*dr/r*(6.0*numpy.exp(-value) - 2.0*numpy.exp(-2.0*value))
+        return 0.25*d*energy_factor, 0.25*d*gradient_factor
+
+    c = molecule.getCoordinates()
+    drab = c[1]-c[0]
+    drbc = c[2]-c[1]
+    drac = c[2]-c[0]
+
+    rab = numpy.linalg.norm(drab)
+    rbc = numpy.linalg.norm(drbc)
+    rac = numpy.linalg.norm(drac)
+
+    opai = 1.0 / (1.0 + 0.05)
+    opbi = 1.0 / (1.0 + 0.30)
+    opci = 1.0 / (1.0 + 0.05)
+    opai2 = opai*opai
+    opbi2 = opbi*opbi
+    opci2 = opci*opci
+
+    dab = 4.476
+    dbc = 4.476
+    dac = 3.445
+
+    qab, gqab = Q(rab, dab, drab)
+    qbc, gqbc = Q(rbc, dbc, drbc)
+    qac, gqac = Q(rac, dac, drac)
+
+    qvalue = qab*opai + qbc*opbi + qac*opci
+    qgrad = gqab*opai + gqbc*opbi + gqac*opci
+
+    jab, gjab = J(rab, dab, drab)
+    jbc, gjbc = J(rbc, dbc, drbc)
+    jac, gjac = J(rac, dac, drac)
+
+    jvalue  = jab*jab*opai2
+    jvalue += jbc*jbc*opbi2
+    jvalue += jac*jac*opci2
+    jvalue -= jab*jbc*opai*opbi
+    jvalue -= jbc*jac*opbi*opci
+    jvalue -= jab*jac*opai*opci
+
+    qgrad = numpy.zeros((3,3))
+    jgrad = numpy.zeros((3,3))
+
+    qgrad[0,:] = gqab*opai + gqac*opci
+    qgrad[1,:] = gqbc*opbi - gqab*opai
+    qgrad[2,:] =-gqbc*opbi - gqac*opci
+
+    djab = gjab*opai*(2*jab*opai - jac*opci - jbc*opbi)
+    djbc = gjbc*opbi*(2*jbc*opbi - jab*opai - jac*opci)
+    djac = gjac*opci*(2*jac*opci - jbc*opbi - jab*opai)
+    jgrad[0,:] =  djab + djac
+    jgrad[1,:] =  djbc - djab
+    jgrad[2,:] = -djbc - djac
+
+    return rab, rbc, qvalue - numpy.sqrt(jvalue), -(qgrad - 0.5/numpy.sqrt(jvalue)*jgrad)
+
+def scalarLEPSSurface(x, y):
+    """ Reference LEPS surface evaluating one molecule at a time """
+    z = numpy.zeros((len(x), len(y)))
+    for ia, xa in enumerate(x):
+        for ic, yc in enumerate(y):
+            _mol = neb.Molecule()
+            _mol.addAtoms(neb.Atom(1, xyz=[xa, 0.0, 0.0]), neb.Atom(1, xyz=[0.0, 0.0, 0.0]), neb.Atom(1, xyz=[0.0, yc, 0.0]))
+            rab, rbc, v, g = scalarVLeps(_mol)
+            z[ia,ic] = v
+    return z
+
+def benchmarkLEPS(sizes=(20, 60, 200)):
+    print "LEPS surface"
+    print "{0:>8s}{1:>14s}{2:>14s}{3:>10s}".format("points", "scalar (s)", "batch (s)", "speedup")
+    for n in sizes:
+        x = numpy.linspace(0.4, 4.0, n)
+        reference, t_ref = timeit(scalarLEPSSurface, x, x)
+        z, t_new = timeit(LEPSSurface, x, x)
+        assert numpy.allclose(z, reference), "LEPS surface differs from the scalar result."
+        print "{0:8d}{1:14.4f}{2:14.4f}{3:10.1f}".format(n*n, t_ref, t_new, t_ref / t_new)
+    print
+
+if __name__ == '__main__':
+    benchmarkBonds()
+    benchmarkLEPS()
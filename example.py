@@ -11,6 +11,7 @@ import neb
 from neb.util import idamax
 from neb.minimizers import SteepestDescent
 from neb.methods import LEPSEnergyAndGradient
+from neb.methods.leps import LEPSSurface
 from neb.interpolate import Linear
 
 def minimize(_mol, nsteps, opttol, func, minimizer):
@@ -73,14 +74,7 @@ if __name__ == '__main__':
     ny = 60
     x = numpy.linspace(0.4,4.0,nx)
     y = numpy.linspace(0.4,4.0,ny)
-    z = numpy.zeros((nx,ny))
-
-    for ia, xa in enumerate(x):
-        for ic, yc in enumerate(y):
-            m = neb.Molecule()
-            m.addAtoms(neb.Atom(1, xyz=[xa, 0.0, 0.0]), neb.Atom(1, xyz=[0.0, 0.0, 0.0]), neb.Atom(1, xyz=[0.0, yc, 0.0]))
-            rab, rbc, v, g = VLeps(m)
-            z[ia,ic] = v
+    z = LEPSSurface(x, y)
 
     f = plt.figure()
     ax = f.add_subplot(111)
@@ -1,4 +1,4 @@
 from molecule import Molecule
 from atom import Atom
 
-from neb import NEB
+from neb import NEB, MinimizationResult
@@ -0,0 +1,114 @@
+""" Rigid body alignment of molecules and beads
+
+    Coordinates of a single molecule have shape (natoms, 3) while the
+    coordinates of a band have shape (nbeads, natoms, 3). The functions
+    here work on both.
+"""
+import numpy
+
+from molecule import Molecule
+
+def alignCoordinates(reference, coordinates, weights=None):
+    """ Rotates and translates coordinates onto a reference
+
+        The rotation minimizing the (weighted) root mean square deviation
+        is found with the Kabsch algorithm, see
+        http://dx.doi.org/10.1107/S0567739476001873
+
+        Arguments:
+        reference -- the coordinates to align onto with shape (natoms, 3)
+        coordinates -- the coordinates to align with shape (natoms, 3)
+                       or (nbeads, natoms, 3)
+
+        Keyword Arguments:
+        weights -- weight of each atom, i.e. the masses. Default is equal weights.
+
+        Returns:
+        the aligned coordinates with the same shape as coordinates
+    """
+    q = numpy.asarray(reference, dtype=float)
+    p = numpy.asarray(coordinates, dtype=float)
+    single = p.ndim == 2
+    if single:
+        p = p[numpy.newaxis]
+
+    if weights is None:
+        weights = numpy.ones(len(q))
+    w = numpy.asarray(weights, dtype=float)[:,numpy.newaxis] / numpy.sum(weights)
+
+    qc = numpy.sum(w * q, axis=0)
+    pc = numpy.sum(w * p, axis=1)
+    P = p - pc[:,numpy.newaxis]
+    Q = q - qc
+
+    H = numpy.einsum('kia,ib->kab', P, w * Q)
+    U, S, Vt = numpy.linalg.svd(H)
+    d = numpy.sign(numpy.linalg.det(numpy.einsum('kab,kbc->kac', U, Vt)))
+    D = numpy.zeros((len(p), 3, 3))
+    D[:,0,0] = 1.0
+    D[:,1,1] = 1.0
+    D[:,2,2] = numpy.where(d < 0.0, -1.0, 1.0)
+    R = numpy.einsum('kab,kbc,kcd->kad', U, D, Vt)
+
+    aligned = numpy.einsum('kia,kab->kib', P, R) + qc
+    if single:
+        return aligned[0]
+    return aligned
+
+def alignMolecule(reference, molecule, weights=None):
+    """ Returns a copy of molecule rotated and translated onto reference
+
+        Arguments:
+        reference -- the molecule to align onto
+        molecule -- the molecule to align
+
+        Keyword Arguments:
+        weights -- weight of each atom, i.e. the masses. Default is equal weights.
+    """
+    c = alignCoordinates(reference.getCoordinates(), molecule.getCoordinates(), weights)
+    return Molecule.fromMolecule(molecule, c)
+
+def projectRigidBody(coordinates, vectors):
+    """ Removes overall translation and rotation from vectors
+
+        The six rigid body displacements (three translations and three
+        rotations about the geometric center) of each bead are made
+        orthonormal and projected out of the vector of that bead.
+        For linear beads only two rotations exist.
+
+        Arguments:
+        coordinates -- the coordinates of the beads with shape (nbeads, natoms, 3)
+        vectors -- the vectors (i.e. forces) to project with shape (nbeads, natoms, 3)
+
+        Returns:
+        the projected vectors
+    """
+    c = numpy.asarray(coordinates, dtype=float)
+    nbeads = len(c)
+    r = c - numpy.mean(c, axis=1)[:,numpy.newaxis]
+
+    modes = numpy.zeros((6,) + numpy.shape(c))
+    for axis in range(3):
+        e = numpy.zeros(3)
+        e[axis] = 1.0
+        modes[axis] = e
+        modes[axis+3] = numpy.cross(e, r)
+
+    v = numpy.array(vectors, dtype=float)
+    basis = []
+    for mode in numpy.reshape(modes, (6, nbeads, -1)):
+        for u in basis:
+            mode -= numpy.sum(mode * u, axis=1)[:,numpy.newaxis] * u
+        norm = numpy.sqrt(numpy.sum(mode * mode, axis=1))[:,numpy.newaxis]
+        mode = numpy.where(norm > _MODETOL, mode / numpy.maximum(norm, _MODETOL), 0.0)
+        basis.append(mode)
+
+    flat = numpy.reshape(v, (nbeads, -1))
+    for u in basis:
+        flat -= numpy.sum(flat * u, axis=1)[:,numpy.newaxis] * u
+
+    return numpy.reshape(flat, numpy.shape(v))
+
+# rigid body modes with a smaller norm after orthogonalization are
+# dependent on the others (i.e. the rotation about the axis of a linear bead)
+_MODETOL = 1.0e-8
@@ -0,0 +1,140 @@
+""" Analysis of converged bands
+"""
+import numpy
+
+class EnergyProfile(object):
+    """ The energy along a band interpolated with a cubic Hermite spline
+
+        The reaction coordinate is the distance along the straight lines
+        between the beads. Between two beads the energy is the cubic
+        polynomial matching the energies of the beads and their slopes
+        dE/ds = g . t which are the projections of the gradients on the
+        unit tangents. No energies or gradients are calculated.
+
+        See http://dx.doi.org/10.1063/1.1323224 by Henkelman et al.
+
+        Typical use-case might look like:
+
+        >>> n.minimize(100, 0.01, eandg, minimizer)
+        >>> profile = neb.analysis.EnergyProfile.fromNEB(n)
+        >>> s, e = profile.getProfile()
+        >>> print profile.getBarrier(), profile.getMaximum()
+
+        Arguments:
+        coordinates -- the coordinates of all beads with shape (nbeads, natoms, 3)
+        energies -- the energies of all beads
+        gradients -- the gradients of all beads with shape (nbeads, natoms, 3)
+
+        Keyword Arguments:
+        tangents -- unit tangents of the beads with shape (nbeads, natoms, 3).
+                    Default is the directions between the neighbouring beads.
+                    Zero tangents (i.e. the endpoints) are replaced by these.
+    """
+    def __init__(self, coordinates, energies, gradients, tangents=None):
+        R = numpy.asarray(coordinates, dtype=float)
+        nbeads = len(R)
+        assert nbeads > 1, "An energy profile needs at least two beads."
+        dR = numpy.reshape(R[1:] - R[:-1], (nbeads - 1, -1))
+        d = numpy.sqrt(numpy.sum(dR*dR, axis=1))
+
+        # the direction of the band at each bead from its neighbours
+        t = numpy.zeros((nbeads, dR.shape[1]))
+        t[0] = dR[0]
+        t[-1] = dR[-1]
+        t[1:-1] = R[2:].reshape(nbeads - 2, -1) - R[:-2].reshape(nbeads - 2, -1)
+        if tangents is not None:
+            tangents = numpy.reshape(tangents, (nbeads, -1))
+            given = numpy.sum(tangents*tangents, axis=1) > 0.0
+            t[given] = tangents[given]
+        t /= numpy.sqrt(numpy.sum(t*t, axis=1))[:,numpy.newaxis]
+
+        g = numpy.reshape(gradients, (nbeads, -1))
+        self._s = numpy.concatenate(([0.0], numpy.cumsum(d)))
+        self._energies = numpy.array(energies, dtype=float)
+        self._slopes = numpy.sum(g*t, axis=1)
+
+    @classmethod
+    def fromNEB(cls, neb):
+        """ Returns the energy profile of the last evaluation of a NEB
+
+            Arguments:
+            neb -- the NEB
+        """
+        return cls(neb.getBandCoordinates(), neb.getEnergies(), neb.getGradients(), neb.getTangents())
+
+    def getReactionCoordinates(self):
+        """ Returns the reaction coordinate of every bead """
+        return self._s.copy()
+
+    def getSlopes(self):
+        """ Returns the slope dE/ds of the energy at every bead """
+        return self._slopes.copy()
+
+    def getEnergy(self, s):
+        """ Returns the interpolated energy at reaction coordinate(s) s
+
+            Arguments:
+            s -- a reaction coordinate or an array of them
+        """
+        s = numpy.asarray(s, dtype=float)
+        segment = numpy.clip(numpy.searchsorted(self._s, s, side='right') - 1, 0, len(self._s) - 2)
+        a, b, c, d = self._coefficients()
+        h = self._s[segment + 1] - self._s[segment]
+        u = (s - self._s[segment]) / h
+        return ((a[segment]*u + b[segment])*u + c[segment])*u + d[segment]
+
+    def getProfile(self, npoints=200):
+        """ Returns the energy profile at evenly spaced reaction coordinates
+
+            Keyword Arguments:
+            npoints -- the number of points. Default is 200.
+
+            Returns:
+            the reaction coordinates and energies as arrays of length npoints
+        """
+        s = numpy.linspace(0.0, self._s[-1], npoints)
+        return s, self.getEnergy(s)
+
+    def getMaximum(self):
+        """ Returns the reaction coordinate and the energy of the highest
+            point of the profile
+
+            The stationary points of each cubic are found analytically.
+        """
+        a, b, c, d = self._coefficients()
+        h = self._s[1:] - self._s[:-1]
+        candidates = [self._s]
+        for k in range(len(h)):
+            roots = numpy.roots([3.0*a[k], 2.0*b[k], c[k]])
+            roots = numpy.real(roots[numpy.isreal(roots)])
+            roots = roots[numpy.logical_and(roots > 0.0, roots < 1.0)]
+            candidates.append(self._s[k] + roots * h[k])
+
+        s = numpy.concatenate(candidates)
+        e = self.getEnergy(s)
+        imax = numpy.argmax(e)
+        return s[imax], e[imax]
+
+    def getBarrier(self, reverse=False):
+        """ Returns the height of the highest point of the profile
+
+            Keyword Arguments:
+            reverse -- measure from the last bead instead of the first. Default is False.
+        """
+        s, e = self.getMaximum()
+        if reverse:
+            return e - self._energies[-1]
+        return e - self._energies[0]
+
+    def _coefficients(self):
+        """ Returns the coefficients a, b, c, d of the cubic
+            a u^3 + b u^2 + c u + d of each segment with 0 <= u <= 1
+        """
+        h = self._s[1:] - self._s[:-1]
+        e0 = self._energies[:-1]
+        e1 = self._energies[1:]
+        m0 = self._slopes[:-1] * h
+        m1 = self._slopes[1:] * h
+        a = 2.0*e0 - 2.0*e1 + m0 + m1
+        b = -3.0*e0 + 3.0*e1 - 2.0*m0 - m1
+        return a, b, m0, e0
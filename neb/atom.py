@@ -15,6 +15,8 @@ class Atom(object):
         mass -- the mass of the atom in atomic units. Default is specified by using the nuclear charge.
         coords -- the Cartesian coordinate of the atom in Angstrom. Default is origin.
     """
+    __slots__ = ('_z', '_c', '_mass', '_vdw_radius', '_cov_radius', '_coordination', '_label')
+
     def __init__(self, Z, **kwargs):
         assert Z > 0, "Nuclear charge of atom must be greater than zero."
         self._z = Z
@@ -49,7 +51,7 @@ class Atom(object):
         return self._cov_radius
 
     def setCoordination(self, value):
-        if not isinstance(int, value):
+        if not isinstance(value, int):
             raise TypeError
 
         max_coordination = util.COORDINATION[self._z]
@@ -60,3 +62,57 @@ class Atom(object):
 
     def getCoordination(self):
         return self._coordination
+
+
+class AtomView(Atom):
+    """ An atom stored in a Molecule
+
+        The molecule keeps the data of all its atoms in arrays. An AtomView
+        only holds a reference to the molecule and the index of the atom, so
+        getting or setting data reads or writes the arrays of the molecule.
+
+        Arguments:
+        molecule -- the molecule the atom is stored in
+        index -- the index of the atom in the molecule
+    """
+    __slots__ = ('_molecule', '_index')
+
+    def __init__(self, molecule, index):
+        self._molecule = molecule
+        self._index = index
+
+    def getMass(self):
+        return self._molecule._masses[self._index]
+
+    def getNuclearCharge(self):
+        return int(self._molecule._z[self._index])
+
+    def getLabel(self):
+        return util.Z2LABEL[self.getNuclearCharge()]
+
+    def getCoordinate(self):
+        return self._molecule._coordinates[self._index]
+
+    def setCoordinate(self, value):
+        (n, ) = numpy.shape(value)
+        assert n == 3, "Dimensions of data do not match. Expected 3 but got {}".format(n)
+        self._molecule._coordinates[self._index] = value
+
+    def getVDWRadius(self):
+        return self._molecule._vdwradii[self._index]
+
+    def getCovalentRadius(self):
+        return self._molecule._covradii[self._index]
+
+    def setCoordination(self, value):
+        if not isinstance(value, int):
+            raise TypeError
+
+        max_coordination = util.COORDINATION[self.getNuclearCharge()]
+        if value > max_coordination:
+            raise ValueError("Coordination number too large.")
+
+        self._molecule._setCoordination(self._index, value)
+
+    def getCoordination(self):
+        return int(self._molecule._coordination[self._index])
@@ -0,0 +1,291 @@
+""" Many independent NEB calculations at once
+
+    Typical use-case might look like:
+
+    >>> reactions = [(m1, m2), (m3, m4), ...]
+    >>> batch = neb.batch.BatchNEB(reactions, eandg, neb.minimizers.FIRE, 'screening',
+    ...                            executor='process', nworkers=16)
+    >>> summary = batch.run(200, 0.01)
+"""
+import json
+import os
+import tempfile
+import threading
+
+import numpy
+
+import parallel
+from neb import NEB, MinimizationResult
+from analysis import EnergyProfile
+from interpolate import Linear
+
+class BatchNEB(object):
+    """ Minimizes the bands of many reactions sharing one pool of workers
+
+        Every band is minimized by its own (lightweight) thread, but the
+        energies and gradients of the beads of all bands are evaluated by
+        the same executor. While one band waits for a slow bead the workers
+        evaluate the beads of the other bands.
+
+        The outcome of every band is written to the file summary.json in
+        directory. Bands write checkpoints (bandNNN.npz) to the same directory
+        so a batch that was interrupted continues the unfinished bands from
+        their last checkpoint when it is run again.
+
+        When the batch is interrupted (i.e. Ctrl-C) the bands that have not
+        started are cancelled and the running bands stop before their next
+        step, keeping their last checkpoint.
+
+        NOTE: Functions that evaluate all beads of a band at once (i.e. ORCA)
+              run them themselves and do not use the shared executor. ORCA
+              gives every band its own scratch directories (scratch/bandNNN)
+              and runs at most maxjobs jobs for all bands together.
+
+        Arguments:
+        reactions -- list of (initial, final) molecule pairs
+        func -- energy and gradient function
+        minimizer -- callable (i.e. a minimizer class) that returns a new minimizer
+        directory -- folder for the summary and the checkpoints. It is created if it does not exist.
+
+        Keyword Arguments:
+        nbeads -- the number of beads in each band including the endpoints
+        k -- force constant between the beads
+        interpolate -- callable (initial, final, nbeads) that returns the initial
+                       path, i.e. an interpolator class. Default is Linear.
+        executor -- 'thread', 'process' or a concurrent.futures.Executor to evaluate
+                    the beads of all bands. Default is 'thread'.
+        nworkers -- maximum number of workers of the executor
+        maxbands -- maximum number of bands minimized at the same time. Default is all.
+        nebkwargs -- dictionary of additional keyword arguments for each NEB (i.e. climb)
+    """
+    SUMMARY = "summary.json"
+
+    def __init__(self, reactions, func, minimizer, directory, nbeads=10, k=1.0, interpolate=None, executor='thread', nworkers=None, maxbands=None, nebkwargs=None):
+        self._reactions = list(reactions)
+        self._func = func
+        self._minimizer = minimizer
+        self._directory = directory
+        self._nbeads = nbeads
+        self._k = k
+        self._interpolate = interpolate
+        if interpolate is None:
+            self._interpolate = Linear
+        self._executor = executor
+        self._nworkers = nworkers
+        self._maxbands = maxbands
+        self._nebkwargs = nebkwargs
+        if nebkwargs is None:
+            self._nebkwargs = {}
+        self._lock = threading.Lock()
+        self._summary = {}
+        self._interrupted = threading.Event()
+
+    def getSummaryFilename(self):
+        return os.path.join(self._directory, self.SUMMARY)
+
+    def getCheckpointFilename(self, index):
+        """ Returns the checkpoint file of a band
+
+            Arguments:
+            index -- the index of the reaction
+        """
+        return os.path.join(self._directory, "band{0:03d}.npz".format(index))
+
+    def getSummary(self):
+        """ Returns the outcome of all bands as a dictionary with
+            an entry for each reaction (keyed by its index as a string)
+        """
+        with self._lock:
+            return json.loads(json.dumps(self._summary))
+
+    def run(self, nsteps, opttol, maxforce=None, energytol=None, checkpointiter=10, verbose=True):
+        """ Minimizes all bands that have not finished before
+
+            A band is finished when it converged, diverged or used all nsteps
+            iterations. Failed and interrupted bands are run again. Bands that
+            used all iterations of an earlier run with fewer nsteps and bands
+            that converged with looser criteria continue from their checkpoint.
+
+            Arguments:
+            nsteps -- perform a maximum of nsteps steps for each band
+            opttol -- the maximum rms force of any bead shall be below this value
+
+            Keyword Arguments:
+            maxforce -- see NEB.minimize
+            energytol -- see NEB.minimize
+            checkpointiter -- number of iterations between checkpoints of a band
+            verbose -- print a line for every band that ends. Default is True.
+
+            Returns:
+            the summary (see getSummary)
+        """
+        if not os.path.exists(self._directory):
+            os.makedirs(self._directory)
+        self._readSummary()
+
+        criteria = {'opttol': opttol, 'maxforce': maxforce, 'energytol': energytol}
+        pending = [index for index in range(len(self._reactions)) if not self._isFinished(index, nsteps, criteria)]
+        if not pending:
+            return self.getSummary()
+
+        self._interrupted.clear()
+        pool = parallel.makeExecutor(self._executor, self._nworkers)
+        bands = parallel.makeExecutor('thread', self._maxbands or len(pending))
+        jobs = []
+        try:
+            jobs = [bands.submit(self._runBand, index, nsteps, opttol, maxforce, energytol, checkpointiter, pool, verbose) for index in pending]
+            # waiting with a timeout lets Ctrl-C through under python 2
+            while not all(job.done() for job in jobs):
+                parallel.futures.wait(jobs, timeout=1.0)
+            for job in jobs:
+                job.result()
+        except KeyboardInterrupt:
+            self._interrupted.set()
+            for job in jobs:
+                job.cancel()
+            raise
+        finally:
+            # an interrupted batch does not wait for the bands to stop
+            wait = not self._interrupted.is_set()
+            bands.shutdown(wait=wait)
+            if isinstance(self._executor, str):
+                pool.shutdown(wait=wait)
+
+        return self.getSummary()
+
+    def _runBand(self, index, nsteps, opttol, maxforce, energytol, checkpointiter, pool, verbose):
+        """ Minimizes the band of reaction index and records the outcome """
+        filename = self.getCheckpointFilename(index)
+        minimizer = _InterruptibleMinimizer(self._minimizer(), self._interrupted)
+        try:
+            func = parallel.functionForBand(self._func, index)
+            if os.path.exists(filename):
+                band = NEB.fromCheckpoint(filename, minimizer, executor=pool)
+            else:
+                initial, final = self._reactions[index]
+                path = self._interpolate(initial, final, self._nbeads)
+                band = NEB(path, self._k, executor=pool, **self._nebkwargs)
+
+            self._update(index, {'status': 'running'})
+            if band.getIteration() < nsteps:
+                result = band.minimize(nsteps - band.getIteration(), opttol, func, minimizer, maxforce=maxforce,
+                                       energytol=energytol, verbose=False, checkpoint=filename, checkpointiter=checkpointiter)
+            else:
+                # the checkpoint was written but not the outcome
+                result = MinimizationResult(0, band, MinimizationResult.MAXSTEPS)
+        except _Interrupted:
+            self._update(index, {'status': 'interrupted'})
+            if verbose:
+                print "BAND {0:3d} interrupted".format(index)
+            return
+        except Exception as e:
+            self._update(index, {'status': 'failed', 'error': str(e)})
+            if verbose:
+                print "BAND {0:3d} failed: {1:s}".format(index, str(e))
+            return
+
+        if result.getReason() == MinimizationResult.DIVERGED:
+            self._update(index, {'status': 'diverged', 'iterations': band.getIteration(), 'nsteps': nsteps,
+                                 'opttol': opttol, 'maxforce': maxforce, 'energytol': energytol,
+                                 'evaluations': band.getNumEvaluations(), 'checkpoint': filename})
+            if verbose:
+                print "BAND {0:3d} {1:s} after {2:d} iterations".format(index, result.getReason(), band.getIteration())
+            return
+
+        energies = result.getEnergies()
+        profile = EnergyProfile.fromNEB(band)
+        s, emax = profile.getMaximum()
+        self._update(index, {
+            'status': 'converged' if result.isConverged() else 'maxsteps',
+            'iterations': band.getIteration(),
+            'nsteps': nsteps,
+            'opttol': opttol,
+            'maxforce': maxforce,
+            'energytol': energytol,
+            'evaluations': band.getNumEvaluations(),
+            'energies': [float(e) for e in energies],
+            'maxrmsforce': float(numpy.max(result.getRMSForces()[1:-1])),
+            'barrier': float(profile.getBarrier()),
+            'reversebarrier': float(profile.getBarrier(reverse=True)),
+            'reactioncoordinate': float(s),
+            'checkpoint': filename,
+        })
+        if verbose:
+            print "BAND {0:3d} {1:s} after {2:d} iterations, barrier {3:12.6f}".format(index, result.getReason(), band.getIteration(), profile.getBarrier())
+
+    def _isFinished(self, index, nsteps, criteria):
+        """ Returns whether the band of reaction index needs no more than nsteps
+            iterations to fulfill criteria
+
+            Arguments:
+            index -- the index of the reaction
+            nsteps -- the maximum number of iterations of the band
+            criteria -- dictionary of the opttol, maxforce and energytol of the run
+        """
+        entry = self._summary.get(str(index), {})
+        if entry.get('status') == 'maxsteps':
+            return entry['iterations'] >= nsteps
+
+        if entry.get('status') == 'converged':
+            # a criterion the band converged without (None) is looser than any value
+            for key, value in criteria.items():
+                if value is not None and (entry.get(key) is None or entry[key] > value):
+                    return False
+            return True
+
+        return entry.get('status') == 'diverged'
+
+    def _update(self, index, entry):
+        """ Replaces the entry of a band in the summary and writes the summary """
+        with self._lock:
+            self._summary[str(index)] = entry
+            self._writeSummary()
+
+    def _readSummary(self):
+        filename = self.getSummaryFilename()
+        with self._lock:
+            self._summary = {}
+            if os.path.exists(filename):
+                with open(filename, 'r') as summaryfile:
+                    self._summary = json.load(summaryfile)
+
+    def _writeSummary(self):
+        """ Writes the summary atomically. Must hold the lock. """
+        filename = self.getSummaryFilename()
+        fd, tmpname = tempfile.mkstemp(prefix=".summary", dir=self._directory)
+        with os.fdopen(fd, 'w') as tmpfile:
+            json.dump(self._summary, tmpfile, indent=2, sort_keys=True)
+        os.rename(tmpname, filename)
+
+class _Interrupted(Exception):
+    pass
+
+class _InterruptibleMinimizer(object):
+    """ Stops a band before its next step when the batch is interrupted
+
+        Everything else is passed on to the minimizer of the band.
+
+        Arguments:
+        minimizer -- the minimizer of the band
+        interrupted -- threading.Event that is set when the batch is interrupted
+    """
+    def __init__(self, minimizer, interrupted):
+        self._minimizer = minimizer
+        self._interrupted = interrupted
+        if hasattr(minimizer, 'stepBand'):
+            self.stepBand = self._stepBand
+        else:
+            self.step = self._step
+
+    def __getattr__(self, name):
+        return getattr(self._minimizer, name)
+
+    def _stepBand(self, *args, **kwargs):
+        if self._interrupted.is_set():
+            raise _Interrupted()
+        return self._minimizer.stepBand(*args, **kwargs)
+
+    def _step(self, *args, **kwargs):
+        if self._interrupted.is_set():
+            raise _Interrupted()
+        return self._minimizer.step(*args, **kwargs)
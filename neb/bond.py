@@ -41,6 +41,10 @@ class Bond(object):
 
         return -1
 
+    def getAtomIndices(self):
+        """ Returns the indices of the two atoms in the bond """
+        return (self._id1, self._id2)
+
     def getNbrAtomIdx(self, value):
         """ Returns the neighboring atom index in the bond """
         if self._id1 == value: return self._id2
@@ -0,0 +1,93 @@
+""" Checkpoints of NEB calculations
+
+    A checkpoint is a numpy .npz file with one array for each entry in
+    the state of a NEB (see NEB.getState). Checkpoints are written to a
+    temporary file next to the checkpoint which is then renamed so that
+    a checkpoint is never left half written if the calculation dies.
+"""
+import os
+import tempfile
+import threading
+
+import numpy
+
+class CheckpointWriter(object):
+    """ Writes checkpoints in a background thread
+
+        The state is copied before write returns so the caller can
+        continue changing its arrays while the file is being written.
+        Only one checkpoint is written at a time: a new write waits for
+        the previous one to finish.
+
+        Arguments:
+        filename -- the file to write the checkpoints to
+    """
+    def __init__(self, filename):
+        self._filename = filename
+        self._thread = None
+        self._error = None
+
+    def getFilename(self):
+        return self._filename
+
+    def write(self, state):
+        """ Starts writing state to the checkpoint file
+
+            Arguments:
+            state -- dictionary of names and arrays (or scalars) to store
+        """
+        self.wait()
+        state = dict((key, numpy.array(value)) for key, value in state.items())
+        self._thread = threading.Thread(target=self._write, args=(state,))
+        self._thread.start()
+
+    def wait(self):
+        """ Waits for the checkpoint being written to be finished
+
+            An error raised while writing the checkpoint is raised here.
+        """
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _write(self, state):
+        try:
+            writeCheckpoint(self._filename, state)
+        except Exception as e:
+            self._error = e
+
+def writeCheckpoint(filename, state):
+    """ Writes state to a checkpoint file atomically
+
+        Arguments:
+        filename -- the file to write the checkpoint to
+        state -- dictionary of names and arrays (or scalars) to store
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmpname = tempfile.mkstemp(prefix=".checkpoint", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as tmpfile:
+            numpy.savez_compressed(tmpfile, **state)
+            tmpfile.flush()
+            os.fsync(tmpfile.fileno())
+        os.rename(tmpname, filename)
+    except:
+        if os.path.exists(tmpname):
+            os.remove(tmpname)
+        raise
+
+def readCheckpoint(filename):
+    """ Returns the state stored in a checkpoint file
+
+        Arguments:
+        filename -- the checkpoint file to read
+
+        Returns:
+        dictionary of names and arrays
+    """
+    with numpy.load(filename) as data:
+        return dict((key, data[key]) for key in data.files)
@@ -0,0 +1,10 @@
+
+class Dihedral(object):
+    def __init__(self, id1, id2, id3, id4):
+        self._id1 = id1
+        self._id2 = id2
+        self._id3 = id3
+        self._id4 = id4
+
+    def __repr__(self):
+        return("Dihedral({0:d},{1:d},{2:d},{3:d})".format(self._id1, self._id2, self._id3, self._id4))
@@ -3,4 +3,5 @@
 
 from restart import Restart
 from linear import Linear
+from idpp import IDPP
 
@@ -0,0 +1,112 @@
+import numpy
+
+from ..minimizers import QuickMin
+
+import linear
+import path
+
+class IDPP(path.Path):
+    """ An interpolator using the image dependent pair potential
+
+        The beads of a linear interpolation are relaxed with a NEB on
+        the objective function
+
+            S_k = sum_i<j w(d_ij) (d_ij^k - d_ij)^2    w(d) = 1 / d^4
+
+        where d_ij^k are the distances between atoms i and j interpolated
+        linearly between the endpoints for bead k. The beads keep physical
+        distances between the atoms instead of passing atoms through each
+        other which the linear interpolation does for anything but the
+        simplest reactions.
+
+        The objective is evaluated for the entire band at once so the
+        interpolation is cheap compared to a single quantum chemical
+        calculation.
+
+        See http://dx.doi.org/10.1063/1.4878664 by Smidstrup et al.
+
+        Arguments:
+        initial -- the first molecule
+        final -- the last molecule
+
+        Keyword Arguments:
+        nsteps -- the number of beads including the endpoints
+        k -- force constant of the springs in the NEB on the objective
+        maxiter -- maximum number of iterations of the NEB on the objective
+        opttol -- the maximum rms force on the objective of any bead
+        align -- rotate and translate (a copy of) the final molecule onto
+                 the initial one first. Default is False.
+    """
+    def __init__(self, initial, final, nsteps=10, k=1.0, maxiter=1000, opttol=1.0e-2, align=False):
+        # imported here because the NEB module imports the interpolators
+        from ..neb import NEB
+
+        path.Path.__init__(self)
+
+        # the objective decreases towards infinite distances beyond twice
+        # the target distance so small steps without much inertia are
+        # used to avoid atoms being thrown past it from a close contact
+        start = linear.Linear(initial, final, nsteps, align)
+        band = NEB(start, k)
+        result = band.minimize(maxiter, opttol, IDPPObjective(initial, start[-1], nsteps), QuickMin(maxstep=0.05), verbose=False)
+        self._converged = result.isConverged()
+        self._molecules = list(start)
+
+    def isConverged(self):
+        """ Returns True if the NEB on the objective converged """
+        return self._converged
+
+class IDPPObjective(object):
+    """ The image dependent pair potential of a band
+
+        Only the band method is provided because the target distances
+        depend on the position of the bead in the band.
+
+        Arguments:
+        initial -- the first molecule
+        final -- the last molecule
+        nbeads -- the number of beads in the band including the endpoints
+    """
+    def __init__(self, initial, final, nbeads):
+        self._nbeads = nbeads
+        self._d0 = _distances(initial.getCoordinates()[numpy.newaxis])[1][0]
+        self._dn = _distances(final.getCoordinates()[numpy.newaxis])[1][0]
+
+    def bandEnergyAndGradient(self, molecule, coordinates, indices=None):
+        """ Returns the objective and its gradient for all beads
+
+            Arguments:
+            molecule -- template molecule of the beads (not used)
+            coordinates -- numpy array of shape (nbeads, natoms, 3)
+            indices -- the positions of the beads in the band. Default is
+                       all beads of the band.
+        """
+        if indices is None:
+            indices = range(self._nbeads)
+        f = numpy.asarray(indices, dtype=float) / (self._nbeads - 1)
+        target = self._d0 + f[:,numpy.newaxis,numpy.newaxis] * (self._dn - self._d0)
+
+        c = numpy.asarray(coordinates, dtype=float)
+        dr, d = _distances(c)
+        n = numpy.shape(c)[1]
+        offdiagonal = numpy.logical_not(numpy.eye(n, dtype=bool))
+        d = numpy.where(offdiagonal, numpy.maximum(d, _DMIN), 1.0)
+
+        # every pair is counted twice in the sums over the full matrices
+        dd = numpy.where(offdiagonal, target - d, 0.0)
+        w = d**-4
+        energies = 0.5 * numpy.sum(numpy.reshape(w*dd*dd, (len(c), -1)), axis=1)
+        dSdd = -4.0*w/d*dd*dd - 2.0*w*dd
+        gradients = numpy.sum((dSdd/d)[:,:,:,numpy.newaxis] * dr, axis=2)
+        return energies, gradients
+
+# atoms closer than this (in Angstrom) are treated as being this far apart
+_DMIN = 1.0e-4
+
+def _distances(c):
+    """ Returns the vectors (nbeads, natoms, natoms, 3) and distances
+        (nbeads, natoms, natoms) between all atoms for coordinates of
+        shape (nbeads, natoms, 3)
+    """
+    dr = c[:,:,numpy.newaxis,:] - c[:,numpy.newaxis,:,:]
+    return dr, numpy.sqrt(numpy.sum(dr*dr, axis=3))
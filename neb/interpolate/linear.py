@@ -1,15 +1,31 @@
+import numpy
+
 from ..molecule import Molecule
+from ..align import alignMolecule
 
 import path
 
 class Linear(path.Path):
     """ A linear interpolator that generates n-2 new molecules
+
+        Arguments:
+        initial -- the first molecule
+        final -- the last molecule
+
+        Keyword Arguments:
+        nsteps -- the number of beads including the endpoints
+        align -- rotate and translate (a copy of) the final molecule onto
+                 the initial one before interpolating so the path holds no
+                 overall rotation. Default is False.
     """
-    def __init__(self, initial, final, nsteps=10):
+    def __init__(self, initial, final, nsteps=10, align=False):
         path.Path.__init__(self)
 
         assert isinstance(nsteps, int)
 
+        if align:
+            final = alignMolecule(initial, final)
+
         self._molecules = [initial]
 
         ci = initial.getCoordinates()
@@ -17,10 +33,9 @@ class Linear(path.Path):
         delta = (cf - ci) / (nsteps - 1)
 
         # only generate the inner range
-        for k in range(1, nsteps-1):
-            m2 = Molecule.fromMolecule(initial)
-            m2.setCoordinates(ci + k*delta)
-            self._molecules.append(m2)
+        k = numpy.arange(1, nsteps-1)[:,numpy.newaxis,numpy.newaxis]
+        for c in ci + k*delta:
+            self._molecules.append(Molecule.fromMolecule(initial, c))
 
         self._molecules.append(final)
         assert self.getNumBeads() == nsteps
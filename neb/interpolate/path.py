@@ -1,3 +1,5 @@
+import copy
+
 from .. import molecule
 
 class Path(object):
@@ -15,3 +17,16 @@ class Path(object):
     def getNumBeads(self):
         return len(self._molecules)
 
+    def insertBead(self, index, _molecule):
+        """ Inserts a molecule so that it becomes the bead at index """
+        self._molecules.insert(index, _molecule)
+
+    def clone(self):
+        """ Returns a copy of the path with copies of all molecules
+
+            The copied molecules share the atomic data with the
+            original ones so only the coordinates are copied.
+        """
+        p = copy.copy(self)
+        p._molecules = [molecule.Molecule.fromMolecule(m) for m in self._molecules]
+        return p
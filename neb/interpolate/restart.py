@@ -1,3 +1,5 @@
+from ..molecule import Molecule
+
 import path
 
 class Restart(path.Path):
@@ -7,3 +9,12 @@ class Restart(path.Path):
         for _molecule in args:
             self._molecules.append(_molecule)
 
+    @classmethod
+    def fromCoordinates(cls, template, coordinates):
+        """ Creates a path from the coordinates of all beads
+
+            Arguments:
+            template -- molecule with the atoms, charge and multiplicity of the beads
+            coordinates -- numpy array of shape (nbeads, natoms, 3)
+        """
+        return cls(*[Molecule.fromMolecule(template, c) for c in coordinates])
@@ -0,0 +1,295 @@
+""" Reading and writing of XYZ files
+
+    An XYZ file holds one or more frames. Each frame is made of a line
+    with the number of atoms, a comment line and a line with the label
+    and the Cartesian coordinates (in Angstrom) for each atom.
+
+    Typical use-case might look like:
+
+    >>> m1 = neb.io.moleculeFromXYZ('m1.xyz')
+    >>> for frame in neb.io.readXYZ('trajectory.xyz'):
+    ...     print frame.getName()
+    >>> frames = neb.io.XYZFrames('trajectory.xyz')
+    >>> last = frames[-1]
+"""
+import mmap
+
+import numpy
+
+import util
+from atom import Atom
+from molecule import Molecule
+from interpolate import Restart
+
+# labels are matched without regard to case (i.e. NA, Na and na)
+_LABEL2Z = dict((label.upper(), z) for label, z in util.LABEL2Z.items())
+
+def readXYZ(filename):
+    """ Reads the frames of an XYZ file one at a time
+
+        The file is read line by line so only a single frame is kept
+        in memory. Frames with the same atoms as the previous frame
+        share its atomic data (see Molecule.fromMolecule).
+
+        Arguments:
+        filename -- the XYZ file to read
+
+        Returns:
+        generator of molecules, one for each frame, named by the comment line
+    """
+    template = None
+    with open(filename, 'r') as xyzfile:
+        while True:
+            line = xyzfile.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+
+            natoms = _numAtoms(line, filename)
+            lines = [xyzfile.readline() for i in range(natoms + 1)]
+            template = _parseFrame(natoms, lines, template, filename)
+            yield template
+
+def moleculeFromXYZ(filename):
+    """ Returns the molecule in the first frame of an XYZ file
+
+        Arguments:
+        filename -- the XYZ file to read
+    """
+    for _molecule in readXYZ(filename):
+        return _molecule
+
+    raise ValueError("No frames in XYZ file '{0:s}'.".format(filename))
+
+def pathFromXYZ(filename):
+    """ Returns a path with a bead for each frame of an XYZ file
+
+        Arguments:
+        filename -- the XYZ file to read
+    """
+    return Restart(*readXYZ(filename))
+
+class XYZFrames(object):
+    """ Random access to the frames of a (large) XYZ file
+
+        The file is memory mapped and only the offsets of the frames
+        are found when the file is opened. A frame is parsed when it
+        is requested.
+
+        >>> with XYZFrames('trajectory.xyz') as frames:
+        ...     print len(frames), frames[-1].getName()
+
+        Arguments:
+        filename -- the XYZ file to read
+    """
+    def __init__(self, filename):
+        self._filename = filename
+        self._file = open(filename, 'rb')
+        self._map = None
+        self._offsets = numpy.zeros(0, dtype=int)
+        self._template = None
+        self._index()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        """ Returns the molecule of a frame
+
+            Arguments:
+            index -- the index of the frame (negative counts from the end)
+        """
+        n = len(self._offsets)
+        if index < 0:
+            index += n
+        if index < 0 or index >= n:
+            raise IndexError("Frame {0:d} is not in '{1:s}' with {2:d} frames.".format(index, self._filename, n))
+
+        start = self._offsets[index]
+        end = self._offsets[index + 1] if index + 1 < n else len(self._map)
+        lines = self._map[start:end].splitlines()
+        natoms = _numAtoms(lines[0], self._filename)
+        self._template = _parseFrame(natoms, lines[1:], self._template, self._filename)
+        return self._template
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def getPath(self, indices=None):
+        """ Returns a path with a bead for each of the frames requested
+
+            Keyword Arguments:
+            indices -- the frames to use. Default is all frames.
+        """
+        if indices is None:
+            indices = range(len(self))
+        return Restart(*[self[index] for index in indices])
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _index(self):
+        """ Finds the offset of the first line of each frame """
+        self._file.seek(0, 2)
+        if self._file.tell() == 0:
+            return
+
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        offsets = []
+        size = len(self._map)
+        position = 0
+        while position < size:
+            end = self._map.find(b"\n", position)
+            if end < 0:
+                end = size
+            line = self._map[position:end]
+            if not line.strip():
+                position = end + 1
+                continue
+
+            offsets.append(position)
+            natoms = _numAtoms(line, self._filename)
+            for i in range(natoms + 1):
+                start, end = end + 1, self._map.find(b"\n", end + 1)
+                if end < 0 and i == natoms and self._map[start:size].strip():
+                    # the last atom line of the file need not end with a newline
+                    end = size
+                if end < 0:
+                    raise ValueError("Last frame in XYZ file '{0:s}' is incomplete.".format(self._filename))
+            position = end + 1
+
+        self._offsets = numpy.array(offsets, dtype=int)
+
+class XYZWriter(object):
+    """ Appends frames to an XYZ file
+
+        Frames are formatted as they are written but collected in a
+        buffer that is only written to the file when it holds buffersize
+        frames, when flush is called or when the writer is closed.
+        The file is opened for appending so existing frames are kept.
+
+        >>> with XYZWriter('trajectory.xyz') as writer:
+        ...     writer.writeMolecule(m1)
+
+        Arguments:
+        filename -- the XYZ file to write to
+
+        Keyword Arguments:
+        buffersize -- number of frames to collect before writing them. Default is 100.
+        append -- append to an existing file. Default is True, otherwise the file is truncated.
+    """
+    def __init__(self, filename, buffersize=100, append=True):
+        self._filename = filename
+        self._buffersize = buffersize
+        self._buffer = []
+        self._file = open(filename, 'a' if append else 'w')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def writeMolecule(self, molecule, comment=None):
+        """ Writes a molecule as a frame
+
+            Arguments:
+            molecule -- the molecule to write
+
+            Keyword Arguments:
+            comment -- the comment line of the frame. Default is the name of the molecule.
+        """
+        if comment is None:
+            comment = molecule.getName()
+        labels = [util.Z2LABEL[z] for z in molecule.getNuclearCharges()]
+        s = "{0:d}\n{1:s}\n".format(len(labels), comment.replace("\n", " "))
+        for label, c in zip(labels, molecule.getCoordinates()):
+            s += "{0:<2s}{1[0]:16.9f}{1[1]:16.9f}{1[2]:16.9f}\n".format(label, c)
+
+        self._buffer.append(s)
+        if len(self._buffer) >= self._buffersize:
+            self.flush()
+
+    def writePath(self, path, comments=None):
+        """ Writes every bead of a path as a frame
+
+            Arguments:
+            path -- the path (or list of molecules) to write
+
+            Keyword Arguments:
+            comments -- the comment line of each bead. Default is the names of the beads.
+        """
+        for ibead, bead in enumerate(path):
+            comment = None
+            if comments is not None:
+                comment = comments[ibead]
+            self.writeMolecule(bead, comment)
+
+    def flush(self):
+        """ Writes the collected frames to the file """
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer = []
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+def _numAtoms(line, filename):
+    try:
+        return int(line.split()[0])
+    except (ValueError, IndexError):
+        raise ValueError("Expected the number of atoms in XYZ file '{0:s}' but got '{1:s}'.".format(filename, line.strip()))
+
+def _atomicNumber(label, filename):
+    if label.isdigit():
+        return int(label)
+    try:
+        return _LABEL2Z[label.upper()]
+    except KeyError:
+        raise ValueError("Unknown atom '{0:s}' in XYZ file '{1:s}'.".format(label, filename))
+
+def _parseFrame(natoms, lines, template, filename):
+    """ Returns the molecule of a frame
+
+        Arguments:
+        natoms -- the number of atoms in the frame
+        lines -- the comment line followed by a line for each atom
+        template -- molecule of the previous frame whose atomic data is
+                    shared if the atoms are the same or None
+        filename -- the file the frame was read from (for error messages)
+    """
+    if len(lines) < natoms + 1 or not lines[natoms]:
+        raise ValueError("Last frame in XYZ file '{0:s}' is incomplete.".format(filename))
+
+    z = numpy.zeros(natoms, dtype=int)
+    c = numpy.zeros((natoms, 3))
+    for iatom, line in enumerate(lines[1:natoms+1]):
+        tokens = line.split()
+        try:
+            z[iatom] = _atomicNumber(tokens[0], filename)
+            c[iatom] = [float(token) for token in tokens[1:4]]
+        except (ValueError, IndexError):
+            raise ValueError("Could not parse atom line '{0:s}' in XYZ file '{1:s}'.".format(line.strip(), filename))
+
+    if template is not None and numpy.array_equal(template.getNuclearCharges(), z):
+        _molecule = Molecule.fromMolecule(template, c)
+    else:
+        _molecule = Molecule()
+        _molecule.addAtoms(*[Atom(int(Z), xyz=xyz) for Z, xyz in zip(z, c)])
+
+    _molecule.setName(lines[0].strip())
+    return _molecule
@@ -1,2 +1,3 @@
 from leps import LEPSEnergyAndGradient
 from orca import OrcaEnergyAndGradient
+from cache import CachedEnergyAndGradient
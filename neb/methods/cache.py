@@ -0,0 +1,217 @@
+import collections
+import hashlib
+import inspect
+import shelve
+import threading
+
+import numpy
+
+from .. import parallel
+
+class CachedEnergyAndGradient(object):
+    """ Caches the results of an energy and gradient function
+
+        Results are stored with a key made from the coordinates (rounded
+        to a number of decimals), the nuclear charges, the charge and the
+        multiplicity of the molecule. A repeated geometry, i.e. an endpoint,
+        a bead that did not move or a restarted path, is therefore never
+        calculated twice.
+
+        The most recently used results are kept in memory up to maxsize
+        entries. Optionally, all results are also stored in a file so they
+        survive between runs.
+
+        Typical use-case might look like:
+
+        >>> eandg = CachedEnergyAndGradient(OrcaEnergyAndGradient(), filename='orca.cache')
+        >>> neb.minimize(100, 0.01, eandg, minimizer)
+        >>> print eandg.getHits(), eandg.getMisses()
+
+        If func can evaluate all beads of a band at once (bandEnergyAndGradient)
+        so can the cache, and only the beads not found are passed on to func.
+
+        NOTE: The cache is shared between threads but not between processes.
+              With a process executor every worker gets a copy of the results
+              kept in memory (but not of the file) and the results calculated
+              by the workers are not stored in the cache of the NEB.
+
+        Arguments:
+        func -- the function that returns energy and gradient for a molecule
+
+        Keyword Arguments:
+        maxsize -- maximum number of results kept in memory. Default is 1024.
+        decimals -- number of decimals the coordinates are rounded to. Default is 8.
+        filename -- file to store all results in. Default is to only keep results in memory.
+    """
+    def __init__(self, func, maxsize=1024, decimals=8, filename=None):
+        assert maxsize > 0, "The cache must be able to hold at least one result."
+        self._func = func
+        self._maxsize = maxsize
+        self._decimals = decimals
+        self._memory = collections.OrderedDict()
+        self._disk = None
+        if filename is not None:
+            self._disk = shelve.open(filename)
+        self._lock = threading.Lock()
+        # shared with the caches made by forBand
+        self._counts = collections.Counter()
+        if parallel.hasBandMethod(func):
+            self.bandEnergyAndGradient = self._bandEnergyAndGradient
+
+    def __call__(self, molecule):
+        key = self.getKey(molecule)
+        with self._lock:
+            result = self._lookup(key)
+
+        if result is None:
+            result = self._func(molecule)
+            with self._lock:
+                self._counts['misses'] += 1
+                self._store(key, result)
+                if self._disk is not None:
+                    self._disk[key] = result
+
+        return _copy(result)
+
+    def __getstate__(self):
+        """ Returns the state to pickle (i.e. for a process executor)
+
+            Locks, open files and bound methods can not be pickled so
+            they are left out.
+        """
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        state['_disk'] = None
+        state.pop('bandEnergyAndGradient', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        if parallel.hasBandMethod(self._func):
+            self.bandEnergyAndGradient = self._bandEnergyAndGradient
+
+    def forBand(self, index):
+        """ Returns the cache to evaluate the beads of band index of a batch with
+
+            When func keeps a state for every band (see parallel.functionForBand)
+            the returned cache calls func.forBand(index) but shares its results
+            and counts with this cache.
+
+            Arguments:
+            index -- the index of the band
+        """
+        func = parallel.functionForBand(self._func, index)
+        if func is self._func:
+            return self
+
+        band = object.__new__(CachedEnergyAndGradient)
+        band.__dict__.update(self.__dict__)
+        band._func = func
+        # the band method of this cache is bound to this cache
+        band.__dict__.pop('bandEnergyAndGradient', None)
+        if parallel.hasBandMethod(func):
+            band.bandEnergyAndGradient = band._bandEnergyAndGradient
+        return band
+
+    def _bandEnergyAndGradient(self, molecule, coordinates, indices=None):
+        """ Returns the energies and gradients of all beads of a band
+
+            Arguments:
+            molecule -- template molecule with the atoms, charge and multiplicity
+            coordinates -- numpy array of shape (nbeads, natoms, 3)
+            indices -- the positions of the beads in the band
+        """
+        keys = [self.getKey(molecule, c) for c in coordinates]
+        with self._lock:
+            results = [self._lookup(key) for key in keys]
+
+        missing = [k for k, result in enumerate(results) if result is None]
+        if missing:
+            missingindices = None
+            if indices is not None:
+                missingindices = [indices[k] for k in missing]
+            energies, gradients = self._func.bandEnergyAndGradient(molecule, coordinates[missing], missingindices)
+            with self._lock:
+                for k, e, g in zip(missing, energies, gradients):
+                    results[k] = (e, g)
+                    self._counts['misses'] += 1
+                    self._store(keys[k], results[k])
+                    if self._disk is not None:
+                        self._disk[keys[k]] = results[k]
+
+        return numpy.array([e for e, g in results]), numpy.array([g for e, g in results])
+
+    def getKey(self, molecule, coordinates=None):
+        """ Returns the key a molecule is stored under in the cache
+
+            Arguments:
+            molecule -- the molecule
+
+            Keyword Arguments:
+            coordinates -- use these coordinates instead of the ones of the molecule
+        """
+        if coordinates is None:
+            coordinates = molecule.getCoordinates()
+        c = numpy.round(coordinates, self._decimals) + 0.0 # turns -0.0 into 0.0
+        z = numpy.asarray(molecule.getNuclearCharges())
+        key = hashlib.sha1(numpy.ascontiguousarray(c).tostring())
+        key.update(z.tostring())
+        key.update("{0:d} {1:d}".format(molecule.getCharge(), molecule.getMultiplicity()))
+        return key.hexdigest()
+
+    def getHits(self):
+        """ Returns the number of results taken from the cache """
+        return self._counts['hits']
+
+    def getMisses(self):
+        """ Returns the number of results that had to be calculated """
+        return self._counts['misses']
+
+    def getSize(self):
+        """ Returns the number of results kept in memory """
+        return len(self._memory)
+
+    def clear(self):
+        """ Removes all results kept in memory. Results stored on disk are kept. """
+        with self._lock:
+            self._memory.clear()
+
+    def reset(self, *args, **kwargs):
+        """ Passes a reset (i.e. of the stored orbitals of ORCA) on to func
+
+            The results in the cache do not depend on the state of func
+            and are kept.
+        """
+        # a class (i.e. the ORCA class called like a function) has no state
+        if hasattr(self._func, 'reset') and not inspect.isclass(self._func):
+            self._func.reset(*args, **kwargs)
+
+    def close(self):
+        """ Writes all results to disk and closes the file """
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+    def _lookup(self, key):
+        """ Returns the result stored under key or None. Must hold the lock. """
+        if key in self._memory:
+            result = self._memory.pop(key)
+        elif self._disk is not None and key in self._disk:
+            result = self._disk[key]
+        else:
+            return None
+
+        self._counts['hits'] += 1
+        self._store(key, result)
+        return result
+
+    def _store(self, key, result):
+        """ Stores result as the most recently used. Must hold the lock. """
+        self._memory[key] = result
+        while len(self._memory) > self._maxsize:
+            self._memory.popitem(last=False)
+
+def _copy(result):
+    """ Copies the arrays in result so callers cannot modify the cache """
+    return tuple(numpy.copy(value) if isinstance(value, numpy.ndarray) else value for value in result)
@@ -1,30 +1,38 @@
 import numpy
 
-def VLeps(molecule):
-    """ Energy and gradient of the LEPS potential """
+def VLepsBatch(coordinates):
+    """ Energies and gradients of the LEPS potential for many geometries
+
+        Arguments:
+        coordinates -- numpy array of shape (N, 3, 3) with the coordinates
+                       of the atoms A, B and C for each of the N geometries
+
+        Returns:
+        rab, rbc, energies, gradients -- arrays of shape (N,), (N,), (N,) and (N, 3, 3)
+    """
 
     def Q(r,d,dr):
         alpha = 1.942
         value = alpha * (r - 0.742)
         energy_factor = 1.5 * numpy.exp(-2.0*value) - numpy.exp(-value)
-        gradient_factor = alpha*dr/r*(-3.0*numpy.exp(-2.0*value) + numpy.exp(-value))
-        return 0.5*d*energy_factor, 0.5*d*gradient_factor
+        gradient_factor = alpha/r*(-3.0*numpy.exp(-2.0*value) + numpy.exp(-value))
+        return 0.5*d*energy_factor, 0.5*d*gradient_factor[:,numpy.newaxis]*dr
 
     def J(r,d,dr):
         alpha = 1.942
         value = alpha * (r - 0.742)
         energy_factor = numpy.exp(-2.0*value) - 6.0*numpy.exp(-value)
-        gradient_factor = alpha*dr/r*(6.0*numpy.exp(-value) - 2.0*numpy.exp(-2.0*value))
-        return 0.25*d*energy_factor, 0.25*d*gradient_factor
+        gradient_factor = alpha/r*(6.0*numpy.exp(-value) - 2.0*numpy.exp(-2.0*value))
+        return 0.25*d*energy_factor, 0.25*d*gradient_factor[:,numpy.newaxis]*dr
 
-    c = molecule.getCoordinates()
-    drab = c[1]-c[0]
-    drbc = c[2]-c[1]
-    drac = c[2]-c[0]
+    c = numpy.asarray(coordinates, dtype=float)
+    drab = c[:,1]-c[:,0]
+    drbc = c[:,2]-c[:,1]
+    drac = c[:,2]-c[:,0]
 
-    rab = numpy.linalg.norm(drab)
-    rbc = numpy.linalg.norm(drbc)
-    rac = numpy.linalg.norm(drac)
+    rab = numpy.sqrt(numpy.sum(drab*drab, axis=1))
+    rbc = numpy.sqrt(numpy.sum(drbc*drbc, axis=1))
+    rac = numpy.sqrt(numpy.sum(drac*drac, axis=1))
 
     opai = 1.0 / (1.0 + 0.05)
     opbi = 1.0 / (1.0 + 0.30)
@@ -42,7 +50,6 @@ def VLeps(molecule):
     qac, gqac = Q(rac, dac, drac)
 
     qvalue = qab*opai + qbc*opbi + qac*opci
-    qgrad = gqab*opai + gqbc*opbi + gqac*opci
 
     jab, gjab = J(rab, dab, drab)
     jbc, gjbc = J(rbc, dbc, drbc)
@@ -55,21 +62,55 @@ def VLeps(molecule):
     jvalue -= jbc*jac*opbi*opci
     jvalue -= jab*jac*opai*opci
 
-    qgrad = numpy.zeros((3,3))
-    jgrad = numpy.zeros((3,3))
+    qgrad = numpy.zeros(numpy.shape(c))
+    jgrad = numpy.zeros(numpy.shape(c))
+
+    qgrad[:,0,:] = gqab*opai + gqac*opci
+    qgrad[:,1,:] = gqbc*opbi - gqab*opai
+    qgrad[:,2,:] =-gqbc*opbi - gqac*opci
+
+    djab = gjab*(opai*(2*jab*opai - jac*opci - jbc*opbi))[:,numpy.newaxis]
+    djbc = gjbc*(opbi*(2*jbc*opbi - jab*opai - jac*opci))[:,numpy.newaxis]
+    djac = gjac*(opci*(2*jac*opci - jbc*opbi - jab*opai))[:,numpy.newaxis]
+    jgrad[:,0,:] =  djab + djac
+    jgrad[:,1,:] =  djbc - djab
+    jgrad[:,2,:] = -djbc - djac
+
+    sqrtj = numpy.sqrt(jvalue)
+    return rab, rbc, qvalue - sqrtj, -(qgrad - (0.5/sqrtj)[:,numpy.newaxis,numpy.newaxis]*jgrad)
+
+def VLeps(molecule):
+    """ Energy and gradient of the LEPS potential """
+    rab, rbc, e, g = VLepsBatch(molecule.getCoordinates()[numpy.newaxis])
+    return rab[0], rbc[0], e[0], g[0]
 
-    qgrad[0,:] = gqab*opai + gqac*opci
-    qgrad[1,:] = gqbc*opbi - gqab*opai
-    qgrad[2,:] =-gqbc*opbi - gqac*opci
+def LEPSSurface(rab, rbc, angle=90.0):
+    """ Energies of the LEPS potential on a grid of rAB and rBC distances
 
-    djab = gjab*opai*(2*jab*opai - jac*opci - jbc*opbi)
-    djbc = gjbc*opbi*(2*jbc*opbi - jab*opai - jac*opci)
-    djac = gjac*opci*(2*jac*opci - jbc*opbi - jab*opai)
-    jgrad[0,:] =  djab + djac
-    jgrad[1,:] =  djbc - djab
-    jgrad[2,:] = -djbc - djac
+        Atom B is placed in the origin, atom A on the x-axis and atom C
+        in the xy-plane so that the angle ABC is the requested angle.
 
-    return rab, rbc, qvalue - numpy.sqrt(jvalue), -(qgrad - 0.5/numpy.sqrt(jvalue)*jgrad)
+        Arguments:
+        rab -- the distances between atom A and B
+        rbc -- the distances between atom B and C
+
+        Keyword Arguments:
+        angle -- the angle ABC in degrees. Default is 90.
+
+        Returns:
+        energies -- array of shape (len(rab), len(rbc))
+    """
+    rab = numpy.asarray(rab, dtype=float)
+    rbc = numpy.asarray(rbc, dtype=float)
+    theta = numpy.radians(angle)
+
+    c = numpy.zeros((len(rab), len(rbc), 3, 3))
+    c[:,:,0,0] = rab[:,numpy.newaxis]
+    c[:,:,2,0] = rbc[numpy.newaxis,:] * numpy.cos(theta)
+    c[:,:,2,1] = rbc[numpy.newaxis,:] * numpy.sin(theta)
+
+    r1, r2, e, g = VLepsBatch(numpy.reshape(c, (-1, 3, 3)))
+    return numpy.reshape(e, (len(rab), len(rbc)))
 
 def LEPSEnergyAndGradient(molecule):
     """ Wrapper for the LEPS potential
@@ -77,3 +118,16 @@ def LEPSEnergyAndGradient(molecule):
     """
     rab, rbc, e, g = VLeps(molecule)
     return e, g
+
+def LEPSBandEnergyAndGradient(molecule, coordinates, indices=None):
+    """ Energies and gradients of the LEPS potential for all beads at once
+
+        Arguments:
+        molecule -- template molecule of the beads (not used)
+        coordinates -- numpy array of shape (nbeads, 3, 3)
+        indices -- the positions of the beads in the band (not used)
+    """
+    rab, rbc, e, g = VLepsBatch(coordinates)
+    return e, g
+
+LEPSEnergyAndGradient.bandEnergyAndGradient = LEPSBandEnergyAndGradient
@@ -1,77 +1,401 @@
-def OrcaEnergyAndGradient(bead):
-    """ Calculates the energy and gradient of a bead using ORCA
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
 
-        NOTE:
-        This method requires a folder called orca_scratch
-        in the directory for scratch files.
+import numpy
 
-        Arguments:
-        bead -- the current bead / molecule to calculate
+from .. import util
+from ..molecule import Molecule
+
+class OrcaEnergyAndGradient(object):
+    """ Calculates the energy and gradient of beads using ORCA
+
+        Every calculation is carried out in its own scratch directory
+        below the scratch folder so that several beads can be computed
+        at the same time. A single bead is computed by calling the object
+        with the bead, the whole band at once through the evaluate method.
+
+        When evaluating a band, the orbitals (.gbw file) of each bead are
+        kept in its scratch directory and read as the initial guess (MORead)
+        the next time the bead is evaluated. Because geometries only change
+        slightly between NEB iterations this saves a lot of SCF cycles.
+
+        Typical use-case might look like:
+
+        >>> orca = OrcaEnergyAndGradient("PM3", maxjobs=4)
+        >>> energy, gradient = orca(bead)
+        >>> results = orca.evaluate(list(neb.innerBeads()))
+
+        A NEB evaluates all its beads at once through bandEnergyAndGradient.
+        The bands of a batch (see BatchNEB) each get a copy (forBand) that
+        keeps its scratch directories below scratch/bandNNN, while at most
+        maxjobs jobs run for all bands together.
+
+        Calling the class with a bead, as the function this class replaced,
+        still returns the energy and gradient with the default settings so
+
+        >>> n.minimize(100, 0.01, OrcaEnergyAndGradient, minimizer)
+        >>> n.minimize(100, 0.01, CachedEnergyAndGradient(OrcaEnergyAndGradient), minimizer)
+
+        keep working. The class is called for one bead at a time (through
+        the executor of the NEB) in a new scratch directory without reusing
+        orbitals.
+
+        Keyword Arguments:
+        method -- the method line (without ENGRAD) given to ORCA. Default is PM3.
+        scratch -- folder to put the scratch directories in. It is created if it does not exist.
+        executable -- the ORCA executable. Default is orca.
+        maxjobs -- maximum number of simultaneous ORCA jobs. Default is the number of cpus.
+        timeout -- wall time in seconds after which a job is killed. Default is no timeout.
+        retries -- number of times a failed or killed job is started again. Default is 0.
+        pollinterval -- time in seconds between checking the state of running jobs.
+        warmstart -- reuse the orbitals of the previous evaluation of a bead. Default is True.
     """
+    def __new__(cls, *args, **kwargs):
+        if args and isinstance(args[0], Molecule):
+            return cls()(args[0])
+
+        return super(OrcaEnergyAndGradient, cls).__new__(cls)
+
+    def __init__(self, method="PM3", **kwargs):
+        self._method = method
+        self._scratch = kwargs.get('scratch', 'orca_scratch')
+        self._executable = kwargs.get('executable', 'orca')
+        self._maxjobs = kwargs.get('maxjobs', multiprocessing.cpu_count())
+        self._timeout = kwargs.get('timeout', None)
+        self._retries = kwargs.get('retries', 0)
+        self._pollinterval = kwargs.get('pollinterval', 0.1)
+        self._warmstart = kwargs.get('warmstart', True)
+        assert self._maxjobs > 0, "At least one ORCA job must be allowed to run."
+        # shared with the copies made by forBand
+        self._slots = threading.Semaphore(self._maxjobs)
+
+    def __call__(self, bead):
+        """ Returns the energy and the gradient in Eh/angstrom of a single bead
+
+            Arguments:
+            bead -- the current bead / molecule to calculate
+        """
+        self._makeScratch()
+        directory = tempfile.mkdtemp(prefix='bead', dir=self._scratch)
+        try:
+            return self._runJobs([_OrcaJob(directory, self._input(bead), bead.getNumAtoms())])[0]
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def __getstate__(self):
+        """ Returns the state to pickle (i.e. for a process executor)
+
+            A semaphore can not be pickled so every process
+            limits the number of its own jobs.
+        """
+        state = self.__dict__.copy()
+        state['_slots'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._slots = threading.Semaphore(self._maxjobs)
+
+    def forBand(self, index):
+        """ Returns a copy that evaluates the beads of band index of a batch
+
+            The copy keeps the scratch directories (and orbitals) of its
+            beads in the folder bandNNN below scratch so bands do not
+            overwrite each other. It shares the limit of maxjobs simultaneous
+            jobs with this object and all its other copies.
+
+            Arguments:
+            index -- the index of the band
+        """
+        band = object.__new__(OrcaEnergyAndGradient)
+        band.__dict__.update(self.__dict__)
+        band._scratch = os.path.join(self._scratch, "band{0:03d}".format(index))
+        return band
+
+    def evaluate(self, beads, indices=None):
+        """ Returns the energies and gradients in Eh/angstrom of all beads
+
+            All beads are computed concurrently (at most maxjobs at a time)
+            in the scratch directories bead000, bead001, ... and the results
+            are returned in the order of the beads.
+
+            Arguments:
+            beads -- the beads / molecules to calculate
+
+            Keyword Arguments:
+            indices -- the positions of the beads in the band which selects
+                       the scratch directories (and orbitals) to use. Default
+                       is to number the beads from zero and to evict the
+                       orbitals of beads beyond the ones evaluated.
+
+            Returns:
+            list of (energy, gradient) tuples
+        """
+        evict = indices is None
+        if indices is None:
+            indices = range(len(beads))
+
+        self._makeScratch()
+        jobs = []
+        for ibead, bead in zip(indices, beads):
+            directory = self._beadDirectory(ibead)
+            if not os.path.exists(directory):
+                os.mkdir(directory)
+            job = _OrcaJob(directory, self._input(bead), bead.getNumAtoms())
+            if self._warmstart:
+                job.setWarmInput(self._input(bead, moread=True))
+            jobs.append(job)
+
+        results = self._runJobs(jobs)
+        for job in jobs:
+            job.clean(keepguess=self._warmstart)
+
+        ibead = len(jobs)
+        while evict and os.path.exists(self._beadDirectory(ibead)):
+            self.reset(ibead)
+            ibead += 1
+
+        return results
+
+    def bandEnergyAndGradient(self, molecule, coordinates, indices=None):
+        """ Returns the energies and gradients in Eh/angstrom of all beads
+
+            Arguments:
+            molecule -- template molecule with the atoms, charge and multiplicity
+            coordinates -- numpy array of shape (nbeads, natoms, 3)
+            indices -- the positions of the beads in the band
+        """
+        beads = [Molecule.fromMolecule(molecule, c) for c in coordinates]
+        results = self.evaluate(beads, indices)
+        return numpy.array([e for e, g in results]), numpy.array([g for e, g in results])
+
+    def reset(self, index=None):
+        """ Evicts the stored orbitals so the next evaluation starts from scratch
+
+            Arguments:
+            index -- the index of the bead to evict the orbitals of. Default is all beads.
+        """
+        if not os.path.exists(self._scratch):
+            return
 
-    def parse_gradient(file, n):
-        """ Gradient parser """
-        g = numpy.zeros((n,3))
-        for k in range(n):
-            tokens = (file.readline()).split()
-            try:
-                g[k] = numpy.array(map(float, tokens[3:]))
-            except ValueError:
-                print tokens
-                raise
+        if index is None:
+            directories = [os.path.join(self._scratch, d) for d in os.listdir(self._scratch) if d.startswith("bead")]
+        else:
+            directories = [self._beadDirectory(index)]
 
-        return g * util.aa2au  # Convert from Eh/bohr to Eh/AA
+        for directory in directories:
+            shutil.rmtree(directory, ignore_errors=True)
 
+    def _beadDirectory(self, index):
+        return os.path.join(self._scratch, "bead{0:03d}".format(index))
 
-    """ Returns the gradient in Eh/angstrom """
-    (n,k) = numpy.shape(bead.getCoordinates())
+    def _makeScratch(self):
+        if not os.path.exists(self._scratch):
+            os.makedirs(self._scratch)
 
-    if not os.path.exists('orca_scratch'):
-        raise ValueError("ORCA scratch directory 'orca_scratch' does not exist.")
+    def _input(self, bead, moread=False):
+        """ Returns the ORCA input for the bead
 
-    e = 0.0
-    g = numpy.zeros((n,k))
+            Arguments:
+            bead -- the bead to make the input for
+            moread -- read the initial guess from the orbitals of a previous run
+        """
+        if moread:
+            s = "! {0:s} ENGRAD MORead\n%moinp \"{1:s}\"\n".format(self._method, _GUESS)
+        else:
+            s = "! {0:s} ENGRAD\n".format(self._method)
+        s += "* xyz {0:d} {1:d}\n".format(bead.getCharge(), bead.getMultiplicity())
+        for _atom in bead.getAtoms():
+            s += "{0:6>s}{1[0]:16.9f}{1[1]:16.9f}{1[2]:16.9f}\n".format(_atom.getLabel(), _atom.getCoordinate())
+        s += "*\n"
+        return s
 
-    s = "! PM3 ENGRAD\n* xyz 0 1\n"
-    for _atom in bead.getAtoms():
-        s += "{0:6>s}{1[0]:16.9f}{1[1]:16.9f}{1[2]:16.9f}\n".format(_atom.getLabel(), _atom.getCoordinate())
-    s += "*"
-    with open('orca_scratch/bead.inp', 'w') as orcafile:
-        orcafile.write(s)
+    def _runJobs(self, jobs):
+        """ Runs the jobs with at most maxjobs running simultaneously
 
-    # go to scratch directory
-    os.chdir('orca_scratch')
-    orcacmd = shlex.split("orca bead.inp") # | grep -A16 \"The cartesian gradient:\"")
-    orcajob = subprocess.Popen(orcacmd, stdout=open('bead.out', 'w')) # subprocess.PIPE)
+            The limit holds for all copies made by forBand together.
+            Jobs that fail or exceed the timeout are restarted until
+            they have been attempted retries + 1 times.
 
-    # to avoid the python code continuing before
-    time.sleep(0.5)
+            Returns:
+            list of (energy, gradient) tuples in the order of the jobs
+        """
+        results = [None] * len(jobs)
+        pending = list(enumerate(jobs))
+        running = []
+        try:
+            while pending or running:
+                while pending and self._slots.acquire(False):
+                    index, job = pending.pop(0)
+                    try:
+                        job.start(self._executable)
+                    except:
+                        self._slots.release()
+                        raise
+                    running.append((index, job))
 
-    with open('bead.out', 'r') as orcafile:
+                time.sleep(self._pollinterval)
+
+                for index, job in running[:]:
+                    if not job.finished(self._timeout):
+                        continue
+
+                    running.remove((index, job))
+                    self._slots.release()
+                    try:
+                        results[index] = job.result()
+                    except RuntimeError:
+                        if job.attempts > self._retries:
+                            raise
+                        # the stored orbitals might be the culprit
+                        job.removeGuess()
+                        pending.append((index, job))
+        finally:
+            for index, job in running:
+                job.kill()
+                self._slots.release()
+
+        return results
+
+
+# orbitals of the previous run of a bead kept in its scratch directory
+_GUESS = "guess.gbw"
+
+class _OrcaJob(object):
+    """ A single ORCA calculation in a scratch directory """
+    def __init__(self, directory, inputstring, natoms):
+        self.directory = directory
+        self._natoms = natoms
+        self.attempts = 0
+        self._input = inputstring
+        self._warminput = None
+        self._process = None
+        self._output = None
+        self._started = 0.0
+        self._timedout = False
+
+    def _path(self, extension):
+        return os.path.join(self.directory, "bead." + extension)
+
+    def setWarmInput(self, inputstring):
+        """ Input to use instead when orbitals from a previous run exist """
+        self._warminput = inputstring
+
+    def removeGuess(self):
+        guess = os.path.join(self.directory, _GUESS)
+        if os.path.exists(guess):
+            os.remove(guess)
+
+    def start(self, executable):
+        inputstring = self._input
+        if self._warminput is not None and os.path.exists(os.path.join(self.directory, _GUESS)):
+            inputstring = self._warminput
+
+        with open(self._path("inp"), 'w') as orcafile:
+            orcafile.write(inputstring)
+
+        self.attempts += 1
+        self._timedout = False
+        self._output = open(self._path("out"), 'w')
+        try:
+            self._process = subprocess.Popen([executable, "bead.inp"], cwd=self.directory,
+                                             stdout=self._output, stderr=subprocess.STDOUT)
+        except OSError:
+            # i.e. the executable does not exist
+            self._output.close()
+            raise
+        self._started = time.time()
+
+    def finished(self, timeout):
+        """ Returns True if the job has ended. Jobs exceeding timeout are killed. """
+        if self._process.poll() is not None:
+            self._output.close()
+            return True
+
+        if timeout is not None and time.time() - self._started > timeout:
+            self.kill()
+            self._timedout = True
+            return True
+
+        return False
+
+    def kill(self):
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        self._output.close()
+
+    def result(self):
+        """ Returns the energy and gradient of a finished job
+
+            Raises RuntimeError if ORCA did not finish properly.
+        """
+        if self._timedout:
+            raise RuntimeError("ORCA job in '{0:s}' exceeded the time limit.".format(self.directory))
+
+        if self._process.returncode != 0:
+            raise RuntimeError("ORCA job in '{0:s}' exited with code {1:d}.".format(self.directory, self._process.returncode))
+
+        with open(self._path("out"), 'r') as orcafile:
+            return _parseOutput(orcafile, self._natoms, self.directory)
+
+    def clean(self, keepguess=False):
+        """ Removes the files written by the job
+
+            Arguments:
+            keepguess -- keep the orbitals as the initial guess for the next run
+        """
+        if keepguess and os.path.exists(self._path("gbw")):
+            os.rename(self._path("gbw"), os.path.join(self.directory, _GUESS))
+
+        for filename in os.listdir(self.directory):
+            if filename.startswith("bead."):
+                os.remove(os.path.join(self.directory, filename))
+
+
+def _parseGradient(orcafile, n):
+    """ Gradient parser """
+    g = numpy.zeros((n,3))
+    for k in range(n):
+        tokens = (orcafile.readline()).split()
+        try:
+            g[k] = numpy.array(map(float, tokens[3:]))
+        except ValueError:
+            raise RuntimeError("Could not parse ORCA gradient line '{0:s}'.".format(" ".join(tokens)))
+
+    return g * util.aa2au  # Convert from Eh/bohr to Eh/AA
+
+def _parseOutput(orcafile, n, directory):
+    """ Parses energy and gradient from a complete ORCA output """
+    e = None
+    g = None
+    while True:
         line = orcafile.readline()
-        while True:
-            line = orcafile.readline()
-            if "TOTAL RUN TIME:" in line:
-                break
-
-            tokens = line.split()
-
-            # Semi-Empirical gradient
-            if "The cartesian gradient:" in line:
-                g = parse_gradient(orcafile, n)
-
-            # HF or DFT gradient
-            if "CARTESIAN GRADIENT" in line:
-                line = orcafile.readline()
-                line = orcafile.readline()
-                g = parse_gradient(orcafile, n)
-
-            # energy
-            if "Total Energy       :" in line:
-                e = float(tokens[3])
-
-    cleancmd = shlex.split("rm -f bead.*")
-    subprocess.Popen(cleancmd)
-    os.chdir('..')
+        if not line or "TOTAL RUN TIME:" in line:
+            break
+
+        tokens = line.split()
+
+        # Semi-Empirical gradient
+        if "The cartesian gradient:" in line:
+            g = _parseGradient(orcafile, n)
+
+        # HF or DFT gradient
+        if "CARTESIAN GRADIENT" in line:
+            orcafile.readline()
+            orcafile.readline()
+            g = _parseGradient(orcafile, n)
+
+        # energy
+        if "Total Energy       :" in line:
+            e = float(tokens[3])
+
+    if e is None or g is None:
+        raise RuntimeError("Energy or gradient missing in ORCA output in '{0:s}'.".format(directory))
 
     return e, g
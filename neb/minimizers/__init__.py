@@ -1,3 +1,25 @@
-""" Different minimizers to take steps in NEB calculations """
+""" Different minimizers to take steps in NEB calculations
+
+    A minimizer either takes a step for a single bead through
+
+        step(energy, force)
+
+    or for the entire band at once through
+
+        stepBand(energies, forces, frozen=None)
+
+    where forces is an array of shape (nbeads, natoms, 3) and frozen marks
+    the beads that are not moved (the NEB only passes it when beads are
+    frozen). Both return the displacement. The NEB prefers stepBand when it
+    is available and calls reset() when the previous steps are no longer
+    meaningful.
+
+    Minimizers that remember previous steps return them as a dictionary
+    of arrays through getState() and restore them with setState(state)
+    so that a NEB can be continued from a checkpoint.
+"""
 
 from steepestdescent import SteepestDescent
+from fire import FIRE
+from quickmin import QuickMin
+from lbfgs import LBFGS
@@ -0,0 +1,99 @@
+import numpy
+
+from .. import util
+
+class FIRE(object):
+    """ The Fast Inertial Relaxation Engine
+
+        Molecular dynamics with a velocity that is mixed towards the
+        direction of the force. The time step grows while the band is
+        moving downhill and the velocity is quenched whenever it points
+        uphill.
+
+        The step is taken for the entire band at once.
+
+        See http://dx.doi.org/10.1103/PhysRevLett.97.170201 by Bitzek et al.
+
+        The defaults are more cautious than in the paper: a larger time
+        step or a weaker mixing lets the beads coast along the flat
+        directions of the surface (i.e. into dissociation channels) and
+        pull the band apart.
+
+        Keyword Arguments:
+        dt -- the initial time step
+        dtmax -- the maximum time step
+        maxstep -- the largest displacement of any atom in a single step
+        nmin -- number of downhill steps before the time step is increased
+        finc -- factor the time step is increased with
+        fdec -- factor the time step is decreased with
+        alpha -- the initial velocity mixing parameter
+        falpha -- factor the mixing parameter is decreased with
+    """
+    def __init__(self, dt=0.1, dtmax=0.2, maxstep=0.1, nmin=5, finc=1.1, fdec=0.5, alpha=0.5, falpha=0.99):
+        self._dt0 = dt
+        self._dtmax = dtmax
+        self._maxstep = maxstep
+        self._nmin = nmin
+        self._finc = finc
+        self._fdec = fdec
+        self._alpha0 = alpha
+        self._falpha = falpha
+        self.reset()
+
+    def reset(self):
+        """ Forgets the velocities and restores the initial time step """
+        self._v = None
+        self._dt = self._dt0
+        self._alpha = self._alpha0
+        self._ndownhill = 0
+
+    def getState(self):
+        """ Returns the velocities, time step and mixing parameter """
+        state = {'dt': self._dt, 'alpha': self._alpha, 'ndownhill': self._ndownhill}
+        if self._v is not None:
+            state['v'] = self._v.copy()
+        return state
+
+    def setState(self, state):
+        """ Restores a state returned by getState """
+        self.reset()
+        self._dt = float(state.get('dt', self._dt))
+        self._alpha = float(state.get('alpha', self._alpha))
+        self._ndownhill = int(state.get('ndownhill', self._ndownhill))
+        if 'v' in state:
+            self._v = numpy.array(state['v'], dtype=float)
+
+    def stepBand(self, energies, forces, frozen=None):
+        """ Returns the displacement of all beads
+
+            Arguments:
+            energies -- the energies of the beads
+            forces -- the forces of the beads as an array of shape (nbeads, natoms, 3)
+
+            Keyword Arguments:
+            frozen -- boolean array of the beads that are not moved
+        """
+        if frozen is not None:
+            forces = numpy.where(frozen[:,numpy.newaxis,numpy.newaxis], 0.0, forces)
+        if self._v is None:
+            self._v = numpy.zeros(numpy.shape(forces))
+        else:
+            if frozen is not None:
+                self._v[frozen] = 0.0
+            power = numpy.vdot(forces, self._v)
+            if power > 0.0:
+                fnorm = numpy.sqrt(numpy.vdot(forces, forces))
+                vnorm = numpy.sqrt(numpy.vdot(self._v, self._v))
+                self._v = (1.0 - self._alpha) * self._v + self._alpha * vnorm * forces / fnorm
+                if self._ndownhill > self._nmin:
+                    self._dt = min(self._dt * self._finc, self._dtmax)
+                    self._alpha *= self._falpha
+                self._ndownhill += 1
+            else:
+                self._v[:] = 0.0
+                self._dt *= self._fdec
+                self._alpha = self._alpha0
+                self._ndownhill = 0
+
+        self._v += self._dt * forces
+        return util.limitStep(self._dt * self._v, self._maxstep)
@@ -0,0 +1,118 @@
+import numpy
+
+from .. import util
+
+class LBFGS(object):
+    """ The limited memory Broyden-Fletcher-Goldfarb-Shanno method
+
+        A quasi-Newton step is taken for the force vector of the entire
+        band at once using the last memory displacements and force changes.
+        Because the NEB forces are not the gradient of any energy, the memory
+        is discarded whenever a step shows negative curvature, the force grew
+        during the last step (there is no energy for a line search), the
+        resulting step would point against the force or the frozen beads changed.
+
+        See http://dx.doi.org/10.1063/1.2841941 by Sheppard et al.
+
+        Keyword Arguments:
+        memory -- number of previous steps used to build the inverse Hessian
+        maxstep -- the largest displacement of any atom in a single step
+        stepsize -- the inverse Hessian used before any curvature is known
+    """
+    def __init__(self, memory=10, maxstep=0.2, stepsize=1.0e-2):
+        assert memory > 0, "The memory of L-BFGS must hold at least one step."
+        self._memory = memory
+        self._maxstep = maxstep
+        self._stepsize = stepsize
+        self.reset()
+
+    def reset(self):
+        """ Forgets all previous steps """
+        self._s = []
+        self._y = []
+        self._dr = None
+        self._f = None
+        self._frozen = None
+
+    def getState(self):
+        """ Returns the stored steps and force changes """
+        state = {'s': numpy.array(self._s), 'y': numpy.array(self._y)}
+        if self._f is not None:
+            state['dr'] = self._dr.copy()
+            state['f'] = self._f.copy()
+            state['frozen'] = self._frozen.copy()
+        return state
+
+    def setState(self, state):
+        """ Restores a state returned by getState """
+        self.reset()
+        self._s = [numpy.array(s, dtype=float) for s in state.get('s', [])]
+        self._y = [numpy.array(y, dtype=float) for y in state.get('y', [])]
+        if 'f' in state:
+            self._dr = numpy.array(state['dr'], dtype=float)
+            self._f = numpy.array(state['f'], dtype=float)
+            self._frozen = numpy.array(state.get('frozen', numpy.zeros(len(self._dr))), dtype=bool)
+
+    def stepBand(self, energies, forces, frozen=None):
+        """ Returns the displacement of all beads
+
+            Arguments:
+            energies -- the energies of the beads
+            forces -- the forces of the beads as an array of shape (nbeads, natoms, 3)
+
+            Keyword Arguments:
+            frozen -- boolean array of the beads that are not moved
+        """
+        if frozen is None:
+            frozen = numpy.zeros(len(forces), dtype=bool)
+        mask = frozen[:,numpy.newaxis,numpy.newaxis]
+        f = numpy.ravel(numpy.where(mask, 0.0, forces))
+        if self._f is not None and not numpy.array_equal(frozen, self._frozen):
+            # the force changes of beads that froze or thawed are meaningless
+            self._s = []
+            self._y = []
+        elif self._f is not None:
+            s = numpy.ravel(self._dr)
+            y = self._f - f
+            if numpy.dot(s, y) <= 0.0 or numpy.dot(f, f) > numpy.dot(self._f, self._f):
+                self._s = []
+                self._y = []
+            else:
+                self._s.append(s)
+                self._y.append(y)
+                if len(self._s) > self._memory:
+                    self._s.pop(0)
+                    self._y.pop(0)
+
+        d = self._direction(f)
+        if numpy.dot(d, f) <= 0.0:
+            self._s = []
+            self._y = []
+            d = self._stepsize * f
+
+        # the step of the frozen beads is not taken so it is not remembered either
+        self._f = f
+        self._frozen = frozen.copy()
+        self._dr = util.limitStep(numpy.where(mask, 0.0, numpy.reshape(d, numpy.shape(forces))), self._maxstep)
+        return self._dr.copy()
+
+    def _direction(self, f):
+        """ Two-loop recursion for the inverse Hessian times the force """
+        q = f.copy()
+        rho = [1.0 / numpy.dot(s, y) for s, y in zip(self._s, self._y)]
+        alpha = []
+        for s, y, r in reversed(zip(self._s, self._y, rho)):
+            a = r * numpy.dot(s, q)
+            q -= a * y
+            alpha.append(a)
+
+        if self._s:
+            q *= numpy.dot(self._s[-1], self._y[-1]) / numpy.dot(self._y[-1], self._y[-1])
+        else:
+            q *= self._stepsize
+
+        for s, y, r, a in zip(self._s, self._y, rho, reversed(alpha)):
+            b = r * numpy.dot(y, q)
+            q += (a - b) * s
+
+        return q
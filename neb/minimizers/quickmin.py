@@ -0,0 +1,64 @@
+import numpy
+
+from .. import util
+
+class QuickMin(object):
+    """ The Quick-Min method
+
+        Velocity Verlet dynamics where only the component of the velocity
+        along the force is kept. If the velocity points against the force
+        it is zeroed. The projection is carried out for the force vector
+        of the entire band at once.
+
+        Keyword Arguments:
+        dt -- the time step
+        maxstep -- the largest displacement of any atom in a single step
+    """
+    def __init__(self, dt=0.1, maxstep=0.2):
+        self._dt = dt
+        self._maxstep = maxstep
+        self.reset()
+
+    def reset(self):
+        """ Forgets the velocities """
+        self._v = None
+
+    def getState(self):
+        """ Returns the velocities """
+        if self._v is None:
+            return {}
+        return {'v': self._v.copy()}
+
+    def setState(self, state):
+        """ Restores a state returned by getState """
+        self.reset()
+        if 'v' in state:
+            self._v = numpy.array(state['v'], dtype=float)
+
+    def stepBand(self, energies, forces, frozen=None):
+        """ Returns the displacement of all beads
+
+            Arguments:
+            energies -- the energies of the beads
+            forces -- the forces of the beads as an array of shape (nbeads, natoms, 3)
+
+            Keyword Arguments:
+            frozen -- boolean array of the beads that are not moved
+        """
+        if frozen is not None:
+            forces = numpy.where(frozen[:,numpy.newaxis,numpy.newaxis], 0.0, forces)
+        if self._v is None:
+            self._v = numpy.zeros(numpy.shape(forces))
+        elif frozen is not None:
+            self._v[frozen] = 0.0
+
+        f2 = numpy.vdot(forces, forces)
+        power = numpy.vdot(forces, self._v)
+        if power > 0.0 and f2 > 0.0:
+            self._v = power / f2 * forces
+        else:
+            self._v = numpy.zeros(numpy.shape(forces))
+
+        dr = util.limitStep(self._dt * self._v + 0.5 * self._dt**2 * forces, self._maxstep)
+        self._v += self._dt * forces
+        return dr
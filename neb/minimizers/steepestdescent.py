@@ -15,3 +15,17 @@ class SteepestDescent(object):
 
     def step(self, energy, force):
         return self._stepsize * force
+
+    def stepBand(self, energies, forces, frozen=None):
+        if frozen is not None:
+            forces = numpy.where(frozen[:,numpy.newaxis,numpy.newaxis], 0.0, forces)
+        return self._stepsize * forces
+
+    def reset(self):
+        pass
+
+    def getState(self):
+        return {}
+
+    def setState(self, state):
+        pass
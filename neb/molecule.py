@@ -1,36 +1,62 @@
-import copy
 import numpy
 
 import atom
 import bond
-import angle
+import topology
 
 class Molecule(object):
     """ A molecule.
 
         A molecule is at the minimum a collection of atoms.
 
-        The molecule class can also be asked to identify all bonds. This can be
-        quite costly since we use a brute force approach.
+        The molecule class can also be asked to identify all bonds.
+
+        The data of the atoms is stored in arrays (coordinates, nuclear charges,
+        masses, radii and coordination numbers) so that the coordinates of the
+        entire molecule can be read and written at once. The atoms returned by
+        the molecule are views into these arrays.
     """
     _bond_threshold = 0.45 # Added threshold for bonds. Replicates openbabel
 
     def __init__(self):
         self._charge = 0
         self._multiplicity = 1
-        self._atoms = []
+        self._coordinates = numpy.zeros((0, 3))
+        self._z = _frozen(numpy.zeros(0, dtype=int))
+        self._masses = _frozen(numpy.zeros(0))
+        self._vdwradii = _frozen(numpy.zeros(0))
+        self._covradii = _frozen(numpy.zeros(0))
+        self._coordination = _frozen(numpy.zeros(0, dtype=int))
         self._bonds = []
+        self._topology = None
         self._name = ""
 
     # class methods
     @classmethod
-    def fromMolecule(cls, m):
+    def fromMolecule(cls, m, coordinates=None):
+        """ Returns a copy of the molecule m
+
+            The copy shares the (read-only) nuclear charges, masses and
+            radii of m and only the coordinates are copied.
+
+            Arguments:
+            m -- the molecule to copy
+
+            Keyword Arguments:
+            coordinates -- coordinates of the copy. Default is the coordinates of m.
+        """
         M = cls()
         M.setCharge(m.getCharge())
         M.setMultiplicity(m.getMultiplicity())
         M.setName(m.getName())
-        if m.getNumAtoms() > 0:
-            M.addAtoms(*m.getAtoms())
+        M._z = m._z
+        M._masses = m._masses
+        M._vdwradii = m._vdwradii
+        M._covradii = m._covradii
+        M._coordination = m._coordination
+        M._coordinates = m.getCoordinates()
+        if coordinates is not None:
+            M.setCoordinates(coordinates)
 
         # currently we do not transfer bond information
         return M
@@ -38,19 +64,31 @@ class Molecule(object):
     # getters and setters for various properties
     def addAtom(self, _atom):
         #assert isinstance(_atom, atom.Atom), "You attempted to add something that was not an atom."
-        self._atoms.append(copy.deepcopy(_atom))
+        self.addAtoms(_atom)
 
     def addAtoms(self, *args):
-        for _atom in args:
-            self.addAtom(_atom)
+        """ Adds atoms to the molecule. The data of the atoms is copied. """
+        if len(args) == 0:
+            return
+
+        # the connectivity has to be percieved again
+        self._bonds = []
+        self._topology = None
+
+        self._coordinates = numpy.concatenate((self._coordinates, [_atom.getCoordinate() for _atom in args]))
+        self._z = _append(self._z, [_atom.getNuclearCharge() for _atom in args])
+        self._masses = _append(self._masses, [_atom.getMass() for _atom in args])
+        self._vdwradii = _append(self._vdwradii, [_atom.getVDWRadius() for _atom in args])
+        self._covradii = _append(self._covradii, [_atom.getCovalentRadius() for _atom in args])
+        self._coordination = _append(self._coordination, [_atom.getCoordination() for _atom in args])
 
     def getNumAtoms(self):
         """ Returns the number of atoms in the molecule """
-        return len(self._atoms)
+        return len(self._z)
 
     def getAtoms(self):
-        for _atom in self._atoms:
-            yield _atom
+        for iat in range(self.getNumAtoms()):
+            yield atom.AtomView(self, iat)
 
     def getBonds(self):
         """ Returns all bonds (as an iterator) in the molecule
@@ -64,6 +102,25 @@ class Molecule(object):
         for _bond in self._bonds:
             yield _bond
 
+    def getTopology(self):
+        """ Returns the topology (connectivity) of the molecule
+
+            The topology is built from the bonds the first time it is
+            requested and kept until atoms are added to the molecule.
+        """
+        if self._topology is None:
+            self._topology = topology.Topology(self.getNumAtoms(), self.getBonds())
+
+        return self._topology
+
+    def getAngles(self):
+        """ Returns all angles (as an iterator) in the molecule """
+        return self.getTopology().getAngles()
+
+    def getDihedrals(self):
+        """ Returns all dihedrals (as an iterator) in the molecule """
+        return self.getTopology().getDihedrals()
+
     def getName(self):
         return self._name
 
@@ -85,50 +142,110 @@ class Molecule(object):
         assert isinstance(value, int)
         self._multiplicity = value
 
+    def getNuclearCharges(self):
+        """ Returns a (read-only) numpy array with the nuclear charges of all atoms """
+        return self._z
+
+    def getMasses(self):
+        """ Returns a (read-only) numpy array with the masses of all atoms """
+        return self._masses
+
+    def getCovalentRadii(self):
+        """ Returns a (read-only) numpy array with the covalent radii of all atoms """
+        return self._covradii
+
+    def getVDWRadii(self):
+        """ Returns a (read-only) numpy array with the van der Waals radii of all atoms """
+        return self._vdwradii
+
+    def _setCoordination(self, iat, value):
+        coordination = self._coordination.copy()
+        coordination[iat] = value
+        self._coordination = _frozen(coordination)
+
     # properties that are lazily evaluated such as bonds and angles
     def percieveBonds(self):
         """ This method attempts to percieve bonds
 
             It works by comparing atom distances to covalent radii of the atoms.
-            It is not optimized in any way.
+
+            The atoms are binned in cubic cells with the size of the longest
+            possible bond so only atoms in the same or neighbouring cells
+            have to be compared. The distances are evaluated for all
+            candidate pairs at once.
+
+            The bonds are returned ordered by the first and then the second
+            atom index with the first index being the largest.
         """
+        n = self.getNumAtoms()
+        if n < 2:
+            return
+
+        c = self._coordinates
+        r = self._covradii
+        cutoff = 2*numpy.max(r) + self._bond_threshold
+
+        # index of the cell of each atom padded by one cell on each side
+        # so that a neighbouring cell never wraps around
+        cells = numpy.floor((c - numpy.min(c, axis=0)) / cutoff).astype(numpy.int64) + 1
+        dims = numpy.max(cells, axis=0) + 2
+        strides = numpy.array([dims[1]*dims[2], dims[2], 1])
+        keys = cells.dot(strides)
+
+        order = numpy.argsort(keys, kind='mergesort')
+        sortedkeys = keys[order]
+
+        pairs = []
+        for offset in _HALF_SHELL:
+            # find the atoms in the neighbouring cell of every atom
+            target = keys + numpy.dot(offset, strides)
+            start = numpy.searchsorted(sortedkeys, target, side='left')
+            end = numpy.searchsorted(sortedkeys, target, side='right')
+            counts = end - start
+            total = numpy.sum(counts)
+            if total == 0:
+                continue
 
-        for iat, atom1 in enumerate(self.getAtoms()):
-            for jat, atom2 in enumerate(self.getAtoms()):
-                if iat <= jat: continue
-                dr = atom2.getCoordinate() - atom1.getCoordinate()
-                R2 = dr.dot(dr)
+            iat = numpy.repeat(numpy.arange(n), counts)
+            first = numpy.repeat(start - (numpy.cumsum(counts) - counts), counts)
+            jat = order[first + numpy.arange(total)]
 
-                dr_cov = atom1.getCovalentRadius() + atom2.getCovalentRadius() + self._bond_threshold
-                R2_cov = dr_cov**2
-                if R2 < R2_cov:
-                    yield bond.Bond(id1=iat, id2=jat)
+            # within the same cell every pair is found twice
+            if not numpy.any(offset):
+                mask = iat > jat
+                iat = iat[mask]
+                jat = jat[mask]
+
+            dr = c[iat] - c[jat]
+            R2 = numpy.einsum('ij,ij->i', dr, dr)
+            R2_cov = (r[iat] + r[jat] + self._bond_threshold)**2
+            mask = R2 < R2_cov
+            pairs.append(numpy.array([numpy.maximum(iat[mask], jat[mask]), numpy.minimum(iat[mask], jat[mask])]))
+
+        if len(pairs) == 0:
+            return
+
+        pairs = numpy.concatenate(pairs, axis=1)
+        for k in numpy.lexsort((pairs[1], pairs[0])):
+            yield bond.Bond(id1=int(pairs[0,k]), id2=int(pairs[1,k]))
 
     def percieveAngles(self):
         """ This method attemps to percieve angles
 
-            It works by iterating through all bonds in the molecule
+            It works by pairing the neighbours of every atom in the
+            topology of the molecule
         """
-        for ibd, bond1 in enumerate(self.getBonds()):
-            for jbd, bond2 in enumerate(self.getBonds()):
-                if ibd <= jbd: continue
-                jatm = bond1.sharesAtom(bond2)
-                if jatm >= 0:
-                    iatm = bond1.getNbrAtomIdx(jatm)
-                    katm = bond2.getNbrAtomIdx(jatm)
-                    yield angle.Angle(iatm, jatm, katm)
+        return self.getTopology().getAngles()
 
     # specialized options to extract information stored in
     # other classes related to molecule
     def getCoordinates(self):
         """ Returns a numpy array with all the coordinates
             of all the atoms in the molecule
-        """
-        c = numpy.zeros((self.getNumAtoms(), 3))
-        for iat, _atom in enumerate(self.getAtoms()):
-            c[iat] = _atom.getCoordinate()
 
-        return c
+            The array is a copy so changing it does not move the atoms.
+        """
+        return self._coordinates.copy()
 
     def setCoordinates(self, c):
         """ Sets the coordinates of all atoms in the molecule from
@@ -137,5 +254,17 @@ class Molecule(object):
         assert isinstance(c, numpy.ndarray)
         (n,k) = numpy.shape(c)
         assert n == self.getNumAtoms()
-        for iat, _atom in enumerate(self.getAtoms()):
-            _atom.setCoordinate(c[iat])
+        self._coordinates[:] = c
+
+# offsets to the cell itself and half of its 26 neighbouring
+# cells so every pair of neighbouring cells is visited once
+_HALF_SHELL = [numpy.array([i, j, k]) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1) if (i, j, k) >= (0, 0, 0)]
+
+def _frozen(a):
+    """ Marks an array read-only """
+    a.flags.writeable = False
+    return a
+
+def _append(a, values):
+    """ Returns a new read-only array with values appended to a """
+    return _frozen(numpy.concatenate((a, numpy.array(values, dtype=a.dtype))))
@@ -1,21 +1,34 @@
+import inspect
 import math
 
 import numpy
 
+import checkpoint as _checkpoint
+import parallel
+from io import XYZWriter
+from align import projectRigidBody
+from atom import Atom
+from molecule import Molecule
+from interpolate import Restart
+
 class NEB(object):
     """ A Nudged Elastic Band implementation
 
         This NEB implementation is based on http://dx.doi.org/10.1063/1.1323224
         by Henkelman et al.
+
+        All bead properties (coordinates, tangents, spring forces, gradients
+        and forces) are stored as contiguous arrays of shape (nbeads, natoms, 3)
+        so that they can be evaluated for the entire band at once.
     """
-    def __init__(self, path, k):
+    def __init__(self, path, k, executor=None, nworkers=None, freezetol=None, freezeiter=5, thawtol=1.0e-2, climb=False, climbiter=10, kmin=None, tangent='improved', rigid=False, maxbeads=None, growiter=10, reparametrizeiter=None):
         """ Initialize the NEB with a predefined path and force
             constants between images.
 
             Typical use-case might look like:
 
-            >>> m1 = molecule_from_xyz('m1.xyz')
-            >>> m2 = molecule_from_xyz('m2.xyz')
+            >>> m1 = neb.io.moleculeFromXYZ('m1.xyz')
+            >>> m2 = neb.io.moleculeFromXYZ('m2.xyz')
             >>> apath = neb.interpolate.Linear(m1, m2, 10)
             >>> neb = neb.Neb(apath, 5.0)
             >>> eandg = somefunction
@@ -24,32 +37,86 @@ class NEB(object):
 
             Arguments:
             path -- Path between two endpoints to be optimized
-            k -- force constant in units of eV / A^2 between each bead in the path
+            k -- force constant in units of eV / A^2 between each bead in the path.
+                 With variable springs this is the largest force constant.
+
+            Keyword Arguments:
+            executor -- evaluate the inner beads concurrently. Either 'thread',
+                        'process' or a concurrent.futures.Executor. Default is
+                        to evaluate the beads one after another.
+            nworkers -- maximum number of workers used by the executor
+            freezetol -- beads with an rms force below this value for freezeiter
+                         iterations are frozen: they are not moved and their last
+                         energy and gradient are reused. Default is no freezing.
+            freezeiter -- number of iterations below freezetol before a bead is frozen
+            thawtol -- a frozen bead thaws when the rms displacement of one of its
+                       neighbours since it was frozen exceeds this value (in A)
+            climb -- turn the highest energy bead into a climbing image that
+                     converges to the saddle point. Default is False.
+            climbiter -- number of iterations minimize carries out with the
+                         regular NEB forces before the climbing image is switched on
+            kmin -- use variable springs that are stiffer near the barrier. The
+                    force constant is k at the highest energy and kmin below the
+                    energy of the endpoints. Default is a constant force constant.
+            tangent -- 'improved' for the energy weighted tangent (default) or
+                       'bisection' for the simple bisection tangent
+            rigid -- project the overall translation and rotation of each bead
+                     out of its force so the beads do not drift or rotate.
+                     Default is False.
+            maxbeads -- start with the beads of path and let minimize insert a bead
+                        every growiter iterations (or when the band converges) where
+                        the energy or the distance between neighbouring beads is
+                        largest until there are maxbeads. Default is a fixed number of beads.
+            growiter -- number of iterations between inserting beads
+            reparametrizeiter -- let minimize redistribute the inner beads to equal
+                                 distances along the band every reparametrizeiter
+                                 iterations until the climbing image is switched on.
+                                 Default is never.
         """
         self._path = path
         self._k = k
-
-        # set bead energies, tangents, forces and spring forces to zero initially
-        self._tangents = []
-        self._beadgradients = []
-        self._springforces = []
-        self._forces = []
-        self._energies = []
+        self._kmin = kmin
+        if tangent not in ('improved', 'bisection'):
+            raise ValueError("Unknown tangent '{0:s}'. Use 'improved' or 'bisection'.".format(tangent))
+        self._tangent = tangent
+        self._rigid = rigid
+        self._executor = parallel.makeExecutor(executor, nworkers)
+        self._ownsexecutor = isinstance(executor, str)
+        self._freezetol = freezetol
+        self._freezeiter = freezeiter
+        self._thawtol = thawtol
+        self._climb = climb
+        self._climbiter = climbiter
+        self._climbing = False
+        self._maxbeads = maxbeads
+        self._growiter = growiter
+        self._reparametrizeiter = reparametrizeiter
+
+        # set bead coordinates, energies, tangents, forces and spring forces to zero initially
+        nbeads = path.getNumBeads()
+        (n, k) = numpy.shape(path[0].getCoordinates())
+        self._coordinates = numpy.zeros((nbeads, n, k))
+        self._tangents = numpy.zeros((nbeads, n, k))
+        self._gradients = numpy.zeros((nbeads, n, k))
+        self._beadgradients = numpy.zeros((nbeads, n, k))
+        self._springforces = numpy.zeros((nbeads, n, k))
+        self._forces = numpy.zeros((nbeads, n, k))
+        self._energies = numpy.zeros(nbeads)
 
         # accounting variables
-        self._grms = []
+        self._grms = -numpy.ones(nbeads)
+        self._nevaluations = 0
+        self._endpointsevaluated = False
+        self._iteration = 0
 
-        for bead in path:
-            (n, k) = numpy.shape(bead.getCoordinates())
-            self._tangents.append(numpy.zeros((n,k)))
-            self._springforces.append(numpy.zeros((n,k)))
-            self._beadgradients.append(numpy.zeros((n,k)))
-            self._forces.append(numpy.zeros((n,k)))
-            self._energies.append(0.0)
-            self._grms.append(-1.0)
+        # frozen beads and the coordinates of their neighbours when they froze
+        self._frozen = numpy.zeros(nbeads, dtype=bool)
+        self._nconverged = numpy.zeros(nbeads, dtype=int)
+        self._frozenneighbours = numpy.zeros((nbeads, 2, n, k))
 
         # now we calculate the tangents and springforces
         # for the initial beads
+        self._beadCoordinates()
         self._beadTangents()
         self._springForces()
 
@@ -65,146 +132,714 @@ class NEB(object):
         for i, bead in enumerate(self.innerBeads(), start=1):
             yield self._forces[i]
 
-    def _beadTangents(self):
-        """ Evaluates all tangents for all the inner beads """
+    @classmethod
+    def fromCheckpoint(cls, filename, minimizer=None, executor=None, nworkers=None):
+        """ Creates a NEB from a checkpoint written by minimize
+
+            The path is rebuilt from the coordinates in the checkpoint and
+            the NEB continues exactly where the checkpoint was written:
+
+            >>> n = neb.NEB.fromCheckpoint('neb.npz', minimizer)
+            >>> n.minimize(nsteps - n.getIteration(), 0.01, eandg, minimizer, checkpoint='neb.npz')
+
+            Arguments:
+            filename -- the checkpoint file
+
+            Keyword Arguments:
+            minimizer -- a minimizer whose state (velocities, memory, ...) is restored
+            executor -- see the constructor
+            nworkers -- see the constructor
+        """
+        state = _checkpoint.readCheckpoint(filename)
+        template = Molecule()
+        template.addAtoms(*[Atom(int(z)) for z in state['nuclearcharges']])
+        template.setCharge(int(state['charge']))
+        template.setMultiplicity(int(state['multiplicity']))
+        template.setName(str(state['name']))
+        path = Restart.fromCoordinates(template, state['coordinates'])
+
+        kwargs = dict(freezeiter=int(state['freezeiter']), thawtol=float(state['thawtol']),
+                      climb=bool(state['climb']), climbiter=int(state['climbiter']),
+                      tangent=str(state['tangent']), rigid=bool(state.get('rigid', False)),
+                      growiter=int(state.get('growiter', 10)))
+        for key in ('freezetol', 'kmin'):
+            if key in state:
+                kwargs[key] = float(state[key])
+        for key in ('maxbeads', 'reparametrizeiter'):
+            if key in state:
+                kwargs[key] = int(state[key])
+
+        neb = cls(path, float(state['k']), executor=executor, nworkers=nworkers, **kwargs)
+        neb.setState(state)
+        if minimizer is not None and hasattr(minimizer, 'setState'):
+            prefix = "minimizer_"
+            minimizer.setState(dict((key[len(prefix):], value) for key, value in state.items() if key.startswith(prefix)))
+
+        return neb
+
+    def getState(self):
+        """ Returns the parameters, coordinates, energies, gradients and
+            iteration number of the band as a dictionary of arrays
+        """
+        template = self._path[0]
+        state = {
+            'coordinates': self._coordinates.copy(),
+            'energies': self._energies.copy(),
+            'gradients': self._gradients.copy(),
+            'grms': self._grms.copy(),
+            'frozen': self._frozen.copy(),
+            'nconverged': self._nconverged.copy(),
+            'frozenneighbours': self._frozenneighbours.copy(),
+            'climbing': self._climbing,
+            'endpointsevaluated': self._endpointsevaluated,
+            'iteration': self._iteration,
+            'nevaluations': self._nevaluations,
+            'nuclearcharges': template.getNuclearCharges(),
+            'charge': template.getCharge(),
+            'multiplicity': template.getMultiplicity(),
+            'name': template.getName(),
+            'k': self._k,
+            'tangent': self._tangent,
+            'rigid': self._rigid,
+            'growiter': self._growiter,
+            'climb': self._climb,
+            'climbiter': self._climbiter,
+            'freezeiter': self._freezeiter,
+            'thawtol': self._thawtol,
+        }
+        if self._kmin is not None:
+            state['kmin'] = self._kmin
+        if self._freezetol is not None:
+            state['freezetol'] = self._freezetol
+        if self._maxbeads is not None:
+            state['maxbeads'] = self._maxbeads
+        if self._reparametrizeiter is not None:
+            state['reparametrizeiter'] = self._reparametrizeiter
+
+        return state
+
+    def setState(self, state):
+        """ Restores the band from a state returned by getState
+
+            The coordinates of the beads in the path are set as well.
+
+            Arguments:
+            state -- dictionary of arrays as returned by getState
+        """
+        c = numpy.array(state['coordinates'], dtype=float)
+        assert numpy.shape(c) == numpy.shape(self._coordinates), "The state does not match the band."
+        for ibead, bead in enumerate(self._path):
+            bead.setCoordinates(c[ibead])
+        self._coordinates[:] = c
+        self._energies[:] = state['energies']
+        self._gradients[:] = state['gradients']
+        self._grms[:] = state['grms']
+        self._frozen[:] = state['frozen']
+        self._nconverged[:] = state['nconverged']
+        self._frozenneighbours[:] = state['frozenneighbours']
+        self._climbing = bool(state['climbing'])
+        self._endpointsevaluated = bool(state['endpointsevaluated'])
+        self._iteration = int(state['iteration'])
+        self._nevaluations = int(state['nevaluations'])
+        self._beadTangents()
+        self._springForces()
+
+    def getIteration(self):
+        """ Returns the number of iterations carried out by all calls to minimize """
+        return self._iteration
+
+    def getNumEvaluations(self):
+        """ Returns the number of bead energy and gradient evaluations carried out """
+        return self._nevaluations
+
+    def getClimbingImage(self):
+        """ Returns the index of the climbing image or None if no bead is climbing """
+        if not self._climbing:
+            return None
+
+        return int(numpy.argmax(self._energies[1:-1])) + 1
+
+    def getFrozenBeads(self):
+        """ Returns the indices of the beads that are currently frozen """
+        return list(numpy.flatnonzero(self._frozen))
+
+    def shutdown(self):
+        """ Releases the workers of an executor created by this NEB
+
+            Executors supplied by the user are left running.
+        """
+        if self._ownsexecutor:
+            self._executor.shutdown()
+
+    def getPath(self):
+        """ Returns the path with the beads of the band """
+        return self._path
+
+    def getBandCoordinates(self):
+        """ Returns the coordinates of all beads in the band as
+            an array of shape (nbeads, natoms, 3)
+        """
+        return self._coordinates.copy()
+
+    def getEnergies(self):
+        """ Returns the energies of all beads from the last evaluation """
+        return self._energies.copy()
+
+    def getGradients(self):
+        """ Returns the gradients of all beads from the last evaluation
+            as an array of shape (nbeads, natoms, 3)
+        """
+        return self._gradients.copy()
+
+    def getRMSForces(self):
+        """ Returns the rms force of every bead from the last force calculation """
+        return self._grms.copy()
+
+    def getTangents(self):
+        """ Returns the unit tangents of the inner beads as an array of
+            shape (nbeads, natoms, 3). The tangents of the endpoints are zero.
+        """
+        return self._tangents.copy()
+
+    def setBandCoordinates(self, c):
+        """ Sets the coordinates of all inner beads from an array of
+            shape (nbeads, natoms, 3). The endpoints are not changed.
+        """
+        assert isinstance(c, numpy.ndarray)
+        assert numpy.shape(c) == numpy.shape(self._coordinates)
         for ibead, bead in enumerate(self.innerBeads(), start=1):
-            self._tangents[ibead] = self._beadTangent(bead, self._path[ibead-1], self._path[ibead+1])
+            bead.setCoordinates(c[ibead])
+        self._coordinates[1:-1] = c[1:-1]
 
-    def _beadTangent(self, ibead, mbead, pbead):
-        """ Calculates the tangent for ibead given the bead
-            indexed by i-1 (mbead) and i+1 (pbead).
+    def insertBead(self, index):
+        """ Inserts a new bead halfway between the beads index-1 and index
 
-            Calculated according to eq 2 in http://dx.doi.org/10.1063/1.1323224
+            The band arrays grow by one bead. Until the new bead is evaluated
+            its energy and gradient are the average of its neighbours.
+            All beads are thawed.
 
             Arguments:
-            ibead -- the current (i'th) bead
-            mbead -- the (i-1)'th bead to use in the calculation of the tanget
-            pbead -- the (i+1)'th bead to use in the calculation of the tanget
+            index -- the index of the new bead (between 1 and the number of beads - 1)
+        """
+        nbeads = len(self._energies)
+        assert 0 < index < nbeads, "Beads can only be inserted between two beads."
+        for name in _BANDARRAYS:
+            a = getattr(self, name)
+            value = 0.5 * (a[index-1] + a[index])
+            setattr(self, name, numpy.insert(a, index, numpy.asarray(value).astype(a.dtype), axis=0))
+
+        self._path.insertBead(index, Molecule.fromMolecule(self._path[index], self._coordinates[index]))
+        self._grms[index] = -1.0
+        self._frozen[:] = False
+        self._nconverged[:] = 0
+
+    def reparametrize(self):
+        """ Redistributes the inner beads to equal distances along the band
+
+            The band is followed through straight lines between the beads
+            and the energies and gradients of the moved beads are interpolated
+            along these lines until the beads are evaluated again.
+            All beads are thawed.
+        """
+        R = self._coordinates
+        nbeads = len(R)
+        d = _norms(R[1:] - R[:-1]).ravel()
+        s = numpy.concatenate(([0.0], numpy.cumsum(d)))
+        snew = numpy.linspace(0.0, s[-1], nbeads)[1:-1]
+        segment = numpy.clip(numpy.searchsorted(s, snew, side='right') - 1, 0, nbeads - 2)
+        f = (snew - s[segment]) / numpy.where(d[segment] > 0.0, d[segment], 1.0)
+
+        for name in ('_coordinates', '_gradients', '_energies'):
+            a = getattr(self, name)
+            x = numpy.reshape(f, (-1,) + (1,) * (a.ndim - 1))
+            a[1:-1] = (1.0 - x) * a[segment] + x * a[segment + 1]
+
+        for ibead, bead in enumerate(self.innerBeads(), start=1):
+            bead.setCoordinates(R[ibead])
+        self._frozen[:] = False
+        self._nconverged[:] = 0
+
+    def _adaptBand(self, i, converged, func, minimizer):
+        """ Inserts a bead or reparametrizes the band if it is due in iteration i
+
+            Arguments:
+            i -- the iteration
+            converged -- True if the band is converged which makes
+                         a bead insertion due right away
+            func -- energy and gradient function
+            minimizer -- the minimizer
 
             Returns:
-            tanget of the bead
+            True if the band was changed
         """
-        Ri = ibead.getCoordinates()
-        Rm = mbead.getCoordinates()
-        Rp = pbead.getCoordinates()
+        changed = False
+        if self._maxbeads is not None and len(self._energies) < self._maxbeads:
+            if converged or i % self._growiter == 0:
+                # the energy resolution matters most near the barrier so
+                # either the energy step or the distance may be the worst
+                d = _norms(self._coordinates[1:] - self._coordinates[:-1]).ravel()
+                dV = numpy.abs(numpy.diff(self._energies))
+                score = d / numpy.mean(d)
+                if numpy.mean(dV) > 0.0:
+                    score = numpy.maximum(score, dV / numpy.mean(dV))
+                self.insertBead(int(numpy.argmax(score)) + 1)
+                changed = True
+
+        # equal distances would pull the climbing image off the saddle point
+        if self._reparametrizeiter is not None and i % self._reparametrizeiter == 0 and not self._climbing:
+            self.reparametrize()
+            changed = True
+
+        if changed:
+            # previous steps, frozen beads and stored orbitals (i.e. of ORCA)
+            # no longer belong to the beads they were made for
+            if hasattr(minimizer, 'reset'):
+                minimizer.reset()
+            if hasattr(func, 'reset') and not inspect.isclass(func):
+                func.reset()
+            self.beadForces(None)
+
+        return changed
+
+    def _beadCoordinates(self):
+        """ Collects the coordinates of all beads in the path into the band array """
+        for ibead, bead in enumerate(self._path):
+            self._coordinates[ibead] = bead.getCoordinates()
+
+    def _beadTangents(self):
+        """ Evaluates the tangents for all the inner beads
 
-        vm = Ri - Rm
-        vp = Rp - Ri
-        ti = vm / numpy.linalg.norm(numpy.ravel(vm)) + vp / numpy.linalg.norm(numpy.ravel(vp));
-        return ti / numpy.linalg.norm(ti)
+            The improved tangent is calculated according to eqs 8-11 in
+            http://dx.doi.org/10.1063/1.1323224 using the bead indexed by
+            i-1 and i+1 for all inner beads at once. The tangent points
+            towards the neighbouring bead with the highest energy and is
+            only mixed at extrema of the energy.
+
+            The simple bisection tangent (eq 2) is used when requested or
+            when the energies do not tell the beads apart (i.e. before
+            they have been evaluated).
+        """
+        R = self._coordinates
+        tm = R[1:-1] - R[:-2]
+        tp = R[2:] - R[1:-1]
+        t = tm / _norms(tm) + tp / _norms(tp)
+
+        if self._tangent == 'improved':
+            V = self._energies
+            Vm = numpy.reshape(V[:-2], (-1, 1, 1))
+            Vi = numpy.reshape(V[1:-1], (-1, 1, 1))
+            Vp = numpy.reshape(V[2:], (-1, 1, 1))
+            dVmax = numpy.maximum(numpy.abs(Vp - Vi), numpy.abs(Vm - Vi))
+            dVmin = numpy.minimum(numpy.abs(Vp - Vi), numpy.abs(Vm - Vi))
+
+            ti = numpy.where(Vp > Vm, tp*dVmax + tm*dVmin, tp*dVmin + tm*dVmax)
+            ti = numpy.where(numpy.logical_and(Vp > Vi, Vi > Vm), tp, ti)
+            ti = numpy.where(numpy.logical_and(Vp < Vi, Vi < Vm), tm, ti)
+            t = numpy.where(_norms(ti) > 0.0, ti, t)
+
+        # a tangent with rigid body components would let the projection of
+        # the forces below leak the gradient along the path
+        if self._rigid:
+            t = projectRigidBody(R[1:-1], t)
+
+        self._tangents[1:-1] = t / _norms(t)
+
+    def _springConstants(self):
+        """ Returns the spring constant between each pair of neighbouring beads
+
+            With variable springs the constant is scaled according to eq 6 in
+            http://dx.doi.org/10.1063/1.1329672 from k for the highest energy
+            down to kmin for springs below the energy of the highest endpoint.
+        """
+        V = self._energies
+        if self._kmin is None:
+            return numpy.ones(len(V)-1) * self._k
+
+        Vspring = numpy.maximum(V[:-1], V[1:])
+        Vref = max(V[0], V[-1])
+        Vmax = numpy.max(Vspring)
+        if Vmax <= Vref:
+            return numpy.ones(len(V)-1) * self._kmin
+
+        dk = self._k - self._kmin
+        return numpy.where(Vspring > Vref, self._k - dk * (Vmax - Vspring) / (Vmax - Vref), self._kmin)
 
     def _springForces(self):
-        """ Evaluates all spring forces between the beads """
-        for ibead, bead in enumerate(self.innerBeads(), start=1):
-            self._springforces[ibead] = self._springForce(bead, self._path[ibead-1], self._path[ibead+1], self._tangents[ibead])
+        """ Evaluates all spring forces between the beads
+
+            The spring force is calculated from the distances to
+            the neighbouring beads according to eq 12 in
+            http://dx.doi.org/10.1063/1.1323224
+        """
+        R = self._coordinates
+        k = numpy.reshape(self._springConstants(), (-1, 1, 1))
+        dm = _norms(R[1:-1] - R[:-2])
+        dp = _norms(R[2:] - R[1:-1])
+        self._springforces[1:-1] = (k[1:]*dp - k[:-1]*dm) * self._tangents[1:-1]
 
-    def _springForce(self, ibead, mbead, pbead, tangent):
-        """ Calculates the spring force for ibead given the bead
-            indexed by i-1 (mbead) and i+1 (pbead).
+    def _evaluateBeads(self, func):
+        """ Calculates the energy and gradient of each bead using the func supplied
 
+            The endpoints are only evaluated once as they never move.
+            Frozen beads keep the energy and gradient of their last evaluation.
+            Functions that can evaluate all beads at once get them in a
+            single call, otherwise func is called for each bead.
 
+            Arguments:
+            func -- function that returns energy and gradient for a bead
         """
-        Ri = numpy.ravel(ibead.getCoordinates())
-        Rm = numpy.ravel(mbead.getCoordinates())
-        Rp = numpy.ravel(pbead.getCoordinates())
+        if func is None:
+            return
 
-        # old spring force calculated according
-        # to eq 5 in http://dx.doi.org/10.1063/1.1323224
-        r = numpy.dot(numpy.ravel(Rp + Rm - 2*Ri), numpy.ravel(tangent))
+        indices = [ibead for ibead in range(1, len(self._energies)-1) if not self._frozen[ibead]]
+        if not self._endpointsevaluated:
+            indices = [0, len(self._energies)-1] + indices
+            self._endpointsevaluated = True
 
-        return self._k * r * tangent
+        beads = [self._path[ibead] for ibead in indices]
+        results = parallel.evaluateBeads(func, beads, self._executor, indices)
+        for ibead, (energy, gradient) in zip(indices, results):
+            self._gradients[ibead] = gradient
+            self._energies[ibead] = energy
+        self._nevaluations += len(indices)
 
-    def _beadGradients(self, func):
-        """ Calculates the forces on each bead using the func supplied
+    def _beadGradients(self):
+        """ Projects the component parallel to the tangent out of the gradients
 
             Calculated according to eq 4 in http://dx.doi.org/10.1063/1.1323224
+        """
+        gradients = self._gradients[1:-1]
+        T = self._tangents[1:-1]
+        self._beadgradients[1:-1] = gradients - _dots(gradients, T) * T
 
-            Arguments:
-            bead -- the bead whose internal force is to be evaluated
-            func -- function that returns energy and forces for a bead
+    def _thawBeads(self):
+        """ Thaws frozen beads whose neighbours have moved more than thawtol
 
-            Returns:
-            e, g -- internal energy and force with component projected out
+            The tangent and spring force of a bead depend on its neighbours
+            so the last gradient can no longer be trusted when they move.
         """
-        if func is None:
+        if not numpy.any(self._frozen):
             return
 
-        for ibead, bead in enumerate(self.innerBeads(), start=1):
-            energy, gradient = func(bead)
-            tangent = self._tangents[ibead]
+        R = self._coordinates
+        neighbours = numpy.concatenate((R[:-2,numpy.newaxis], R[2:,numpy.newaxis]), axis=1)
+        dr = neighbours - self._frozenneighbours[1:-1]
+        rms = numpy.sqrt(numpy.mean(numpy.reshape(dr*dr, (len(dr), 2, -1)), axis=2))
+        moved = numpy.any(rms > self._thawtol, axis=1)
+        self._frozen[1:-1] &= numpy.logical_not(moved)
 
-            grad_perp = numpy.dot(numpy.ravel(gradient), numpy.ravel(tangent))
+    def _freezeBeads(self):
+        """ Freezes beads that have had a small force for freezeiter iterations
 
-            # calculate regular NEB bead gradient
-            self._beadgradients[ibead] = gradient - grad_perp * tangent
+            Frozen beads whose force (with the reused gradient) has grown
+            above freezetol are thawed again.
+        """
+        if self._freezetol is None:
+            return
 
-            self._energies[ibead] = energy
+        converged = self._grms < self._freezetol
+        converged[0] = converged[-1] = False
+        if self._climbing:
+            converged[self.getClimbingImage()] = False
+        self._nconverged = numpy.where(converged, self._nconverged + 1, 0)
+        self._frozen &= converged
+
+        freeze = numpy.logical_and(numpy.logical_not(self._frozen), self._nconverged >= self._freezeiter)
+        for ibead in numpy.flatnonzero(freeze):
+            self._frozenneighbours[ibead,0] = self._coordinates[ibead-1]
+            self._frozenneighbours[ibead,1] = self._coordinates[ibead+1]
+        self._frozen |= freeze
 
     def beadForces(self, func):
         """ Calculates the forces of all 'inner' beads
 
             Arguments:
-            func -- function that returns energy and forces for a bead
+            func -- function that returns energy and gradient for a bead
         """
+        self._beadCoordinates()
+        self._thawBeads()
+        self._evaluateBeads(func)
         self._beadTangents()
         self._springForces()
-        self._beadGradients(func)
+        self._beadGradients()
 
-        for ibead, bead in enumerate(self.innerBeads(), start=1):
-            bead_force = - self._beadgradients[ibead]
+        self._forces[1:-1] = self._springforces[1:-1] - self._beadgradients[1:-1]
 
-            bead_force += self._springforces[ibead]
+        # the climbing image feels no springs and climbs up along the tangent
+        # according to eq 5 in http://dx.doi.org/10.1063/1.1329672
+        if self._climbing:
+            ibead = self.getClimbingImage()
+            g = self._gradients[ibead]
+            t = self._tangents[ibead]
+            self._forces[ibead] = -g + 2.0 * numpy.vdot(g, t) * t
 
-            self._forces[ibead] = bead_force[:]
+        if self._rigid:
+            self._forces[1:-1] = projectRigidBody(self._coordinates[1:-1], self._forces[1:-1])
 
-            # Accounting and statistics
-            f = numpy.ravel(bead_force)
-            self._grms[ibead] = math.sqrt(f.dot(f)/len(f))
+        # Accounting and statistics
+        F = self._forces[1:-1]
+        self._grms[1:-1] = numpy.sqrt(_dots(F, F) / F[0].size).ravel()
 
-    def minimize(self, nsteps, opttol, func, minimizer):
+    def minimize(self, nsteps, opttol, func, minimizer, maxforce=None, energytol=None, verbose=True, checkpoint=None, checkpointiter=10, trajectory=None):
         """ Minimizes the NEB path
 
-            The minimization is carried out for nsteps to a tolerance
-            of opttol with the energy and gradients calculated
+            The minimization is carried out for nsteps or until the
+            path is converged with the energy and gradients calculated
             for each bead by func. The minimizer used is suppplied
             via the minimizers argument.
 
+            The path is converged when all the requested criteria
+            (opttol, maxforce and energytol) are fulfilled. A criterion
+            is ignored if it is None. The minimization stops as diverged
+            when an energy or force is not a finite number.
+
             When the method ends, one can iterate over all the beads
             in this class to get the states and continue from there.
 
-            NOTE: The opttol argument is not active
-
             Arguments:
-            nstesp -- perform a maximum of nsteps steps
-            opttol -- the maximum rms gradient shall be below this value
+            nsteps -- perform a maximum of nsteps steps
+            opttol -- the maximum rms force of any bead shall be below this value
             func -- energy and gradient function
             minimizer -- a minimizer
+
+            Keyword Arguments:
+            maxforce -- the largest force component shall be below this value
+            energytol -- the largest change in bead energy between two iterations shall be below this value
+            verbose -- print the energies and forces of every iteration. Default is True.
+            checkpoint -- file to write checkpoints to (see fromCheckpoint). They are
+                          written in the background every checkpointiter iterations and
+                          when the minimization ends. Default is no checkpoints.
+            checkpointiter -- number of iterations between checkpoints
+            trajectory -- XYZ file to append the beads of every iteration to.
+                          Default is not to write a trajectory.
+
+            Returns:
+            a MinimizationResult with the outcome of the minimization
+        """
+        iteration = 0
+        reason = MinimizationResult.MAXSTEPS
+        energies = None
+        writer = None
+        if checkpoint is not None:
+            writer = _checkpoint.CheckpointWriter(checkpoint)
+        xyzwriter = None
+        if trajectory is not None:
+            xyzwriter = XYZWriter(trajectory, buffersize=len(self._energies))
+
+        try:
+            for i in range(self._iteration + 1, self._iteration + nsteps + 1):
+                iteration += 1
+                if self._climb and not self._climbing and i > self._climbiter:
+                    self._startClimbing(minimizer)
+
+                self.beadForces(func)
+
+                if verbose:
+                    self._printIteration(i)
+
+                if xyzwriter is not None:
+                    comments = ["I={0:d} BEAD={1:d} E={2:.9f}".format(i, ibead, e) for ibead, e in enumerate(self._energies)]
+                    xyzwriter.writePath(self._path, comments)
+
+                if not self._isFinite():
+                    reason = MinimizationResult.DIVERGED
+                    self._iteration = i
+                    break
+
+                converged = self._isConverged(energies, opttol, maxforce, energytol)
+                changed = self._adaptBand(i, converged, func, minimizer)
+                if converged and not changed:
+                    if not self._climb or self._climbing:
+                        reason = MinimizationResult.CONVERGED
+                        self._iteration = i
+                        break
+
+                    # the regular band converged during warm up so
+                    # we can start climbing right away
+                    self._startClimbing(minimizer)
+                    self.beadForces(None)
+
+                # the checkpoint holds the band before the step so a restart
+                # repeats this iteration exactly (which it would not if the
+                # band was just changed)
+                if writer is not None and iteration % checkpointiter == 0 and not changed:
+                    writer.write(self._checkpointState(minimizer))
+
+                energies = self._energies[1:-1].copy()
+                self._freezeBeads()
+                self._step(minimizer)
+                self._iteration = i
+
+            # a diverged band is not worth continuing from
+            if writer is not None and reason != MinimizationResult.DIVERGED:
+                writer.write(self._checkpointState(minimizer))
+        finally:
+            if writer is not None:
+                writer.wait()
+            if xyzwriter is not None:
+                xyzwriter.close()
+
+        result = MinimizationResult(iteration, self, reason)
+        if verbose:
+            print "-"*89
+            print "NEB stopped after {0:d} iterations: {1:s}".format(result.getIterations(), result.getReason())
+
+        return result
+
+    def _checkpointState(self, minimizer):
+        """ Returns the state of the band and the minimizer to write to a checkpoint """
+        state = self.getState()
+        if hasattr(minimizer, 'getState'):
+            for key, value in minimizer.getState().items():
+                state["minimizer_" + key] = value
+
+        return state
+
+    def _startClimbing(self, minimizer):
+        """ Switches on the climbing image
+
+            The forces change discontinuously so previous steps of
+            the minimizer are forgotten.
+        """
+        self._climbing = True
+        self._frozen[self.getClimbingImage()] = False
+        if hasattr(minimizer, 'reset'):
+            minimizer.reset()
+
+    def _step(self, minimizer):
+        """ Moves all inner beads that are not frozen using the minimizer
+
+            Minimizers that can take a step for the entire band at once
+            (stepBand) are preferred over taking a step for each bead.
         """
-        for i in range(1, nsteps):
-            self.beadForces(func)
-
-            s  = "-"*89 + "\nI={0:3d} ENERGY={1:12.6f} G RMS={2:13.9f}"
-            s2 = " E     ="
-            s3 = " F RMS ="
-            s4 = " F SPR ="
-
-            maxerg = max(self._energies[1:-1])
-            grms = 0.0
-            grmsnrm = 0
-            for ibead, bead in enumerate(self.innerBeads(), start=1):
-                c = bead.getCoordinates()
-                (n, k) = numpy.shape(c)
-                bead.setCoordinates(c + minimizer.step(self._energies[ibead], self._forces[ibead]))
-
-                f = numpy.ravel(self._forces[ibead])
-                grms += numpy.linalg.norm(f)
-                grmsnrm += len(f)
-
-                s2 += "{0:9.4f}".format(self._energies[ibead])
-                s3 += "{0:9.4f}".format(self._grms[ibead])
-                s4 += "{0:9.4f}".format(numpy.max(self._springforces[ibead]))
-
-            print s.format(i, maxerg, math.sqrt(grms/grmsnrm))
-            print s2
-            print s3
-            print s4
+        frozen = self._frozen[1:-1]
+        if hasattr(minimizer, 'stepBand'):
+            # the minimizer must know which beads stay put or it
+            # remembers velocities and steps that were never taken
+            if numpy.any(frozen):
+                dR = minimizer.stepBand(self._energies[1:-1], self._forces[1:-1], frozen.copy())
+            else:
+                dR = minimizer.stepBand(self._energies[1:-1], self._forces[1:-1])
+        else:
+            dR = numpy.zeros(numpy.shape(self._forces[1:-1]))
+            for ibead in range(1, len(self._energies)-1):
+                if not self._frozen[ibead]:
+                    dR[ibead-1] = minimizer.step(self._energies[ibead], self._forces[ibead])
+
+        R = self._coordinates.copy()
+        R[1:-1] += numpy.where(frozen[:,numpy.newaxis,numpy.newaxis], 0.0, dR)
+        self.setBandCoordinates(R)
+
+    def _isConverged(self, energies, opttol, maxforce, energytol):
+        """ Returns True if the current forces and energies fulfill the criteria
+
+            Arguments:
+            energies -- energies of the inner beads in the previous iteration or None
+            opttol -- the maximum rms force of any bead or None
+            maxforce -- the largest force component or None
+            energytol -- the largest change in bead energy or None
+        """
+        if opttol is None and maxforce is None and energytol is None:
+            return False
+
+        # written so that NaN never counts as converged
+        if opttol is not None and not numpy.all(self._grms[1:-1] < opttol):
+            return False
+
+        if maxforce is not None and not numpy.all(numpy.abs(self._forces[1:-1]) < maxforce):
+            return False
+
+        if energytol is not None:
+            if energies is None:
+                return False
+            if not numpy.all(numpy.abs(self._energies[1:-1] - energies) < energytol):
+                return False
+
+        return True
+
+    def _isFinite(self):
+        """ Returns True if all energies and forces are finite numbers """
+        return numpy.all(numpy.isfinite(self._energies)) and numpy.all(numpy.isfinite(self._forces))
+
+    def _printIteration(self, i):
+        """ Prints energies and forces of all beads for iteration i """
+        s  = "-"*89 + "\nI={0:3d} ENERGY={1:12.6f} G RMS={2:13.9f}"
+        s2 = " E     ="
+        s3 = " F RMS ="
+        s4 = " F SPR ="
+
+        maxerg = max(self._energies[1:-1])
+        F = self._forces[1:-1]
+        grms = numpy.sum(numpy.sqrt(_dots(F, F)))
+        grmsnrm = F.size
+        for ibead in range(1, len(self._energies)-1):
+            s2 += "{0:9.4f}".format(self._energies[ibead])
+            s3 += "{0:9.4f}".format(self._grms[ibead])
+            s4 += "{0:9.4f}".format(numpy.max(self._springforces[ibead]))
+
+        print s.format(i, maxerg, math.sqrt(grms/grmsnrm))
+        print s2
+        print s3
+        print s4
+
+class MinimizationResult(object):
+    """ The outcome of a NEB minimization
+
+        Arguments:
+        iterations -- the number of iterations carried out
+        neb -- the NEB that was minimized
+        reason -- why the minimization stopped
+    """
+    CONVERGED = "converged"
+    MAXSTEPS = "maximum number of steps reached"
+    DIVERGED = "energies or forces are not finite"
+
+    def __init__(self, iterations, neb, reason):
+        self._iterations = iterations
+        self._reason = reason
+        self._energies = neb._energies.copy()
+        self._forces = neb._forces.copy()
+        self._grms = neb._grms.copy()
+
+    def getIterations(self):
+        return self._iterations
+
+    def getReason(self):
+        return self._reason
+
+    def isConverged(self):
+        return self._reason == self.CONVERGED
+
+    def getEnergies(self):
+        """ Returns the energies of all beads """
+        return self._energies
+
+    def getForces(self):
+        """ Returns the forces of all beads as an array of shape (nbeads, natoms, 3) """
+        return self._forces
+
+    def getMaxForce(self):
+        """ Returns the largest force component of the inner beads """
+        return numpy.max(numpy.abs(self._forces[1:-1]))
+
+    def getRMSForces(self):
+        """ Returns the rms force of every bead """
+        return self._grms
+
+# the arrays of the NEB which hold a value for every bead
+_BANDARRAYS = ('_coordinates', '_tangents', '_gradients', '_beadgradients', '_springforces', '_forces',
+               '_energies', '_grms', '_frozen', '_nconverged', '_frozenneighbours')
+
+def _dots(a, b):
+    """ Bead-wise dot product of two arrays of shape (nbeads, natoms, 3)
+
+        Returns:
+        array of shape (nbeads, 1, 1) so that it broadcasts against the beads
+    """
+    nbeads = numpy.shape(a)[0]
+    d = numpy.einsum('ij,ij->i', numpy.reshape(a, (nbeads, -1)), numpy.reshape(b, (nbeads, -1)))
+    return numpy.reshape(d, (nbeads, 1, 1))
+
+def _norms(a):
+    """ Bead-wise norm of an array of shape (nbeads, natoms, 3) """
+    return numpy.sqrt(_dots(a, a))
@@ -0,0 +1,109 @@
+""" Concurrent evaluation of energies and gradients for several beads
+
+    The executors are taken from the concurrent.futures module which,
+    under python 2, is provided by the 'futures' backport.
+
+    Functions that can evaluate many geometries at once declare it by
+    providing a band method
+
+        func.bandEnergyAndGradient(molecule, coordinates, indices=None)
+
+    where molecule is a template for the atoms, charge and multiplicity,
+    coordinates is an array of shape (nbeads, natoms, 3) and indices are
+    the positions of the beads in the band. It returns the energies with
+    shape (nbeads,) and the gradients with shape (nbeads, natoms, 3).
+
+    Functions that keep a state for the beads of a band (i.e. the orbitals
+    of ORCA) can provide
+
+        func.forBand(index)
+
+    which returns the function the band index of a batch (see BatchNEB)
+    is evaluated with, so that the bands do not share the state.
+"""
+
+import inspect
+
+import numpy
+
+try:
+    import concurrent.futures as futures
+except ImportError:
+    futures = None
+
+
+def makeExecutor(executor=None, nworkers=None):
+    """ Returns an executor to evaluate beads with
+
+        Arguments:
+        executor -- either None (serial evaluation), 'thread', 'process' or
+                    an already constructed concurrent.futures.Executor
+        nworkers -- the maximum number of workers for 'thread' and 'process'
+                    executors. Default lets concurrent.futures decide.
+
+        Returns:
+        an executor or None for serial evaluation
+    """
+    if executor is None or not isinstance(executor, str):
+        return executor
+
+    if futures is None:
+        raise ImportError("The '{0:s}' executor requires the concurrent.futures module.".format(executor))
+
+    if executor == 'thread':
+        return futures.ThreadPoolExecutor(max_workers=nworkers)
+
+    if executor == 'process':
+        return futures.ProcessPoolExecutor(max_workers=nworkers)
+
+    raise ValueError("Unknown executor '{0:s}'. Use 'thread' or 'process'.".format(executor))
+
+def evaluateBeads(func, beads, executor=None, indices=None):
+    """ Evaluates func for all beads, possibly concurrently
+
+        The band method of func is used when it exists. Otherwise func is
+        called for every bead. The results are always returned in the same
+        order as the beads so the outcome does not depend on which worker
+        finished first.
+
+        Arguments:
+        func -- function that returns energy and gradient for a bead
+        beads -- the beads to evaluate
+        executor -- an executor from makeExecutor or None
+        indices -- the positions of the beads in the band
+
+        Returns:
+        list of (energy, gradient) tuples in bead order
+    """
+    beads = list(beads)
+    if hasBandMethod(func):
+        if len(beads) == 0:
+            return []
+        coordinates = numpy.array([bead.getCoordinates() for bead in beads])
+        energies, gradients = func.bandEnergyAndGradient(beads[0], coordinates, indices)
+        return zip(energies, gradients)
+
+    if executor is None:
+        return [func(bead) for bead in beads]
+
+    return list(executor.map(func, beads))
+
+def hasBandMethod(func):
+    """ Returns True if func can evaluate all beads of a band at once
+
+        A class is called with every bead like a function even when its
+        instances have a band method (which is unbound on the class).
+    """
+    return not inspect.isclass(func) and hasattr(func, 'bandEnergyAndGradient')
+
+def functionForBand(func, index):
+    """ Returns the function to evaluate the beads of band index of a batch with
+
+        Arguments:
+        func -- function that returns energy and gradient for a bead
+        index -- the index of the band
+    """
+    if inspect.isclass(func) or not hasattr(func, 'forBand'):
+        return func
+
+    return func.forBand(index)
@@ -0,0 +1,266 @@
+""" Refinement of saddle points from a band
+"""
+import math
+
+import numpy
+
+from molecule import Molecule
+from minimizers import LBFGS
+from align import projectRigidBody
+
+class Dimer(object):
+    """ The dimer method for a single saddle point
+
+        A dimer is two images R0 and R1 = R0 + separation * N a small
+        distance apart along a unit mode N. The dimer is rotated towards
+        the lowest curvature mode and the center is moved with the force
+        along N inverted so it climbs up along the mode and goes down in
+        all other directions.
+
+        Every step costs two gradient calls (in R0 and R1) plus one for
+        the trial rotation while the mode is not yet converged.
+
+        Overall translation and rotation of a molecule do not change its
+        energy so their curvature is (almost) zero. Near a minimum that is
+        the lowest curvature and the dimer would rotate into them and never
+        leave. They are therefore projected out of the mode and the forces,
+        and the saddle point is only converged when the curvature is below
+        -curvaturetol.
+
+        See http://dx.doi.org/10.1063/1.480097 by Henkelman and Jonsson and
+        http://dx.doi.org/10.1063/1.1809574 by Heyden et al. for the rotation.
+
+        Typical use-case might look like:
+
+        >>> n.minimize(50, 0.1, eandg, minimizer)
+        >>> dimer = neb.saddle.Dimer.fromNEB(n, eandg)
+        >>> dimer.minimize(100, 0.001)
+        >>> saddle = dimer.getMolecule()
+
+        Arguments:
+        molecule -- the starting geometry. The molecule is not changed.
+        mode -- the starting mode with the same shape as the coordinates
+        func -- energy and gradient function
+
+        Keyword Arguments:
+        minimizer -- minimizer with a stepBand method for the center. Default is
+                     L-BFGS with a largest displacement of 0.1 A.
+        separation -- the distance between the two images of the dimer
+        angletol -- the mode is only rotated when the estimated rotation angle
+                    (in radians) is larger than this value
+        curvaturetol -- the curvature along the mode must be below -curvaturetol
+                        at the saddle point
+        convexstep -- the length of the step up along the mode while the curvature
+                      is not below -curvaturetol
+        rigid -- remove overall translation and rotation from the mode and the
+                 forces. Default is True. Switch it off for model potentials that
+                 are not invariant to them (i.e. a single atom on a surface).
+    """
+    def __init__(self, molecule, mode, func, minimizer=None, separation=1.0e-2, angletol=2.0e-2, curvaturetol=1.0e-3, convexstep=0.1, rigid=True):
+        self._molecule = Molecule.fromMolecule(molecule)
+        self._rigid = rigid
+        N = self._project(self._molecule.getCoordinates(), numpy.array(mode, dtype=float))
+        norm = numpy.sqrt(numpy.vdot(N, N))
+        assert norm > 1.0e-8, "The mode of a dimer can not be zero (or only move the molecule as a whole)."
+        self._mode = N / norm
+        self._func = func
+        self._minimizer = minimizer
+        if minimizer is None:
+            self._minimizer = LBFGS(maxstep=0.1)
+        self._separation = separation
+        self._angletol = angletol
+        self._curvaturetol = curvaturetol
+        self._convexstep = convexstep
+        self._concave = True
+        self._curvature = None
+        self._energy = None
+        self._forces = None
+        self._nevaluations = 0
+
+    @classmethod
+    def fromNEB(cls, neb, func, **kwargs):
+        """ Returns a dimer at the highest bead of a band with the tangent as its mode
+
+            The climbing image is used when there is one.
+
+            Arguments:
+            neb -- the NEB
+            func -- energy and gradient function
+            kwargs -- keyword arguments of the Dimer
+        """
+        ibead = neb.getClimbingImage()
+        if ibead is None:
+            ibead = int(numpy.argmax(neb.getEnergies()[1:-1])) + 1
+        bead = list(neb.innerBeads())[ibead-1]
+        return cls(bead, neb.getTangents()[ibead], func, **kwargs)
+
+    def getMolecule(self):
+        """ Returns (a copy of) the center of the dimer """
+        return Molecule.fromMolecule(self._molecule)
+
+    def getMode(self):
+        """ Returns the unit mode of the dimer """
+        return self._mode.copy()
+
+    def getCurvature(self):
+        """ Returns the curvature along the mode from the last step or None """
+        return self._curvature
+
+    def getEnergy(self):
+        """ Returns the energy of the center from the last step or None """
+        return self._energy
+
+    def getNumEvaluations(self):
+        """ Returns the number of energy and gradient evaluations carried out """
+        return self._nevaluations
+
+    def minimize(self, nsteps, opttol, verbose=True):
+        """ Moves the dimer to the saddle point
+
+            The saddle point is converged when the rms force of the center
+            is below opttol and the curvature along the mode is below
+            -curvaturetol.
+
+            Arguments:
+            nsteps -- perform a maximum of nsteps steps
+            opttol -- the rms force of the center shall be below this value
+
+            Keyword Arguments:
+            verbose -- print energy, curvature and force of every step. Default is True.
+
+            Returns:
+            a DimerResult with the outcome of the minimization
+        """
+        iteration = 0
+        reason = DimerResult.MAXSTEPS
+        for i in range(1, nsteps + 1):
+            iteration = i
+            R0 = self._molecule.getCoordinates()
+            # the rigid body motions change as the center moves
+            N = self._project(R0, self._mode)
+            self._mode = N / math.sqrt(numpy.vdot(N, N))
+            e0, g0 = self._evaluate(R0)
+            e1, g1 = self._evaluate(R0 + self._separation * self._mode)
+            self._rotate(R0, g0, g1)
+
+            self._energy = e0
+            self._forces = self._project(R0, -g0)
+            grms = math.sqrt(numpy.vdot(g0, g0) / g0.size)
+            if verbose:
+                print "I={0:3d} ENERGY={1:12.6f} CURVATURE={2:12.6f} F RMS={3:13.9f}".format(i, e0, self._curvature, grms)
+
+            if grms < opttol and self._curvature < -self._curvaturetol:
+                reason = DimerResult.CONVERGED
+                break
+
+            # the minimizer only knows the inverted forces of the region
+            # with negative curvature and starts over when it gets there
+            concave = self._curvature < -self._curvaturetol
+            if concave != self._concave and hasattr(self._minimizer, 'reset'):
+                self._minimizer.reset()
+            self._concave = concave
+
+            Fpar = numpy.vdot(self._forces, self._mode)
+            if concave:
+                F = self._forces - 2.0 * Fpar * self._mode
+                dR = self._minimizer.stepBand(numpy.array([e0]), F[numpy.newaxis])[0]
+            else:
+                # far from the saddle point take a fixed step up along the
+                # mode. The force along it vanishes at a minimum along the
+                # mode so a step following the force could get stuck.
+                dR = -math.copysign(self._convexstep, Fpar) * self._mode
+            self._molecule.setCoordinates(R0 + dR)
+
+        result = DimerResult(iteration, self, reason)
+        if verbose:
+            print "Dimer stopped after {0:d} iterations: {1:s}".format(result.getIterations(), result.getReason())
+
+        return result
+
+    def _project(self, R, v):
+        """ Returns v without overall translation and rotation of coordinates R """
+        if not self._rigid:
+            return v
+        return projectRigidBody(R[numpy.newaxis], v[numpy.newaxis])[0]
+
+    def _evaluate(self, c):
+        """ Returns energy and gradient of the geometry with coordinates c """
+        self._nevaluations += 1
+        energy, gradient = self._func(Molecule.fromMolecule(self._molecule, c))
+        return energy, numpy.asarray(gradient, dtype=float)
+
+    def _rotate(self, R0, g0, g1):
+        """ Rotates the mode towards the lowest curvature mode
+
+            The curvature is fitted to C(a) = c0 + c1 cos 2a + d1 sin 2a in
+            the plane of the rotation using the rotational force and a trial
+            rotation by 45 degrees, and the mode is rotated to the minimum.
+
+            Arguments:
+            R0 -- the coordinates of the center
+            g0 -- the gradient at the center
+            g1 -- the gradient at the other image of the dimer
+        """
+        N = self._mode
+        HN = self._project(R0, (g1 - g0) / self._separation)
+        C = numpy.vdot(HN, N)
+        HNperp = HN - C * N
+        b = math.sqrt(numpy.vdot(HNperp, HNperp))
+        self._curvature = C
+        if b == 0.0 or 0.5 * math.atan2(b, abs(C)) < self._angletol:
+            return
+
+        # rotating towards theta lowers the curvature
+        theta = -HNperp / b
+        trial = 0.25 * math.pi
+        Ntrial = math.cos(trial) * N + math.sin(trial) * theta
+        e, gtrial = self._evaluate(R0 + self._separation * Ntrial)
+        Ctrial = numpy.vdot(gtrial - g0, Ntrial) / self._separation
+
+        d1 = -b
+        c1 = (C - Ctrial + d1 * math.sin(2.0*trial)) / (1.0 - math.cos(2.0*trial))
+        c0 = C - c1
+        angle = 0.5 * math.atan2(-d1, -c1)
+
+        N = math.cos(angle) * N + math.sin(angle) * theta
+        self._mode = N / math.sqrt(numpy.vdot(N, N))
+        self._curvature = c0 + c1*math.cos(2.0*angle) + d1*math.sin(2.0*angle)
+
+class DimerResult(object):
+    """ The outcome of a dimer minimization
+
+        Arguments:
+        iterations -- the number of iterations carried out
+        dimer -- the dimer that was minimized
+        reason -- why the minimization stopped
+    """
+    CONVERGED = "converged"
+    MAXSTEPS = "maximum number of steps reached"
+
+    def __init__(self, iterations, dimer, reason):
+        self._iterations = iterations
+        self._reason = reason
+        self._energy = dimer.getEnergy()
+        self._curvature = dimer.getCurvature()
+        self._nevaluations = dimer.getNumEvaluations()
+
+    def getIterations(self):
+        return self._iterations
+
+    def getReason(self):
+        return self._reason
+
+    def isConverged(self):
+        return self._reason == self.CONVERGED
+
+    def getEnergy(self):
+        """ Returns the energy of the saddle point """
+        return self._energy
+
+    def getCurvature(self):
+        """ Returns the (negative) curvature along the mode at the saddle point """
+        return self._curvature
+
+    def getNumEvaluations(self):
+        """ Returns the number of energy and gradient evaluations carried out """
+        return self._nevaluations
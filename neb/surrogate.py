@@ -0,0 +1,374 @@
+""" Gaussian process surrogates to save energy and gradient evaluations
+
+    The band is relaxed on a Gaussian process model fitted to the energies
+    and gradients calculated so far. Only the beads for which the model is
+    most uncertain are calculated with the real (expensive) function.
+
+    See http://dx.doi.org/10.1063/1.4986787 by Koistinen et al. and
+    http://dx.doi.org/10.1103/PhysRevLett.122.156001 by Garrido Torres et al.
+"""
+import numpy
+
+import parallel
+import util
+from neb import MinimizationResult
+
+class GaussianProcess(object):
+    """ Gaussian process regression of energies and gradients
+
+        The squared exponential covariance
+
+            k(x, x') = variance * exp(-|x - x'|^2 / (2 lengthscale^2))
+
+        is used for the energies and its derivatives for the gradients, so
+        every observation holds the energy and all gradient components of
+        a geometry. The prior mean is the highest energy observed which
+        keeps the model from predicting low energies far from the data.
+
+        By default x holds the inverse distances between all atoms, see
+        http://dx.doi.org/10.1021/acs.jctc.8b00788 by Koistinen et al.
+        They do not change when the molecule is translated or rotated and
+        they resolve the short distances where the energy changes the most.
+        Model potentials that are not invariant (i.e. a single atom on a
+        surface) use the Cartesian coordinates instead.
+
+        Every observation adds natoms*3+1 rows to the covariance matrix of
+        all observations. Its Cholesky factor is extended as observations
+        arrive so adding a geometry costs O(M^2) rather than O(M^3) time
+        for a matrix of M rows. The factor takes O(M^2) memory though: a
+        thousand geometries of ten atoms need 8 GB.
+
+        Keyword Arguments:
+        lengthscale -- distance over which energies are correlated (in 1/Angstrom for
+                       inverse distances or Angstrom for Cartesian coordinates)
+        variance -- the prior variance of the energies
+        noise -- variance of the noise on the energies
+        gradientnoise -- variance of the noise on the gradient components
+        descriptor -- 'inverse' for the inverse distances (default) or 'cartesian'
+    """
+    def __init__(self, lengthscale=0.5, variance=1.0, noise=1.0e-8, gradientnoise=1.0e-10, descriptor='inverse'):
+        if descriptor not in ('inverse', 'cartesian'):
+            raise ValueError("Unknown descriptor '{0:s}'. Use 'inverse' or 'cartesian'.".format(descriptor))
+        self._lengthscale = lengthscale
+        self._variance = variance
+        self._noise = noise
+        self._gradientnoise = gradientnoise
+        self._descriptor = descriptor
+        self._X = None
+        self._J = None
+        self._E = numpy.zeros(0)
+        self._G = None
+        self._L = numpy.zeros((0, 0))
+        self._alpha = None
+        self._mean = 0.0
+
+    def getNumObservations(self):
+        return len(self._E)
+
+    def addObservations(self, coordinates, energies, gradients):
+        """ Adds energies and gradients of geometries to the training data
+
+            Arguments:
+            coordinates -- the geometries as an array of shape (n, natoms, 3)
+            energies -- the energies as an array of shape (n,)
+            gradients -- the gradients as an array of shape (n, natoms, 3)
+        """
+        n = len(energies)
+        X, J = self._describe(coordinates)
+        G = numpy.reshape(numpy.asarray(gradients, dtype=float), (n, -1))
+        if len(self._E) == 0:
+            self._L = numpy.linalg.cholesky(self._covariance(X, J, X, J, noise=True))
+            self._X, self._J, self._G = X, J, G
+        else:
+            # extend the factor of the old observations with the new ones
+            K21 = self._covariance(X, J, self._X, self._J)
+            K22 = self._covariance(X, J, X, J, noise=True)
+            L21 = _solveLower(self._L, K21.T).T
+            L22 = numpy.linalg.cholesky(K22 - numpy.dot(L21, L21.T))
+            m = len(self._L)
+            L = numpy.zeros((m + len(L22), m + len(L22)))
+            L[:m,:m] = self._L
+            L[m:,:m] = L21
+            L[m:,m:] = L22
+            self._L = L
+            self._X = numpy.concatenate((self._X, X))
+            if J is not None:
+                self._J = numpy.concatenate((self._J, J))
+            self._G = numpy.concatenate((self._G, G))
+        self._E = numpy.concatenate((self._E, numpy.asarray(energies, dtype=float)))
+
+        self._mean = numpy.max(self._E)
+        y = numpy.ravel(numpy.concatenate(((self._E - self._mean)[:,numpy.newaxis], self._G), axis=1))
+        self._alpha = _solveLower(self._L, _solveLower(self._L, y), transpose=True)
+
+    def predict(self, coordinates, variances=True):
+        """ Returns the predicted energies, gradients and energy variances
+
+            Arguments:
+            coordinates -- the geometries as an array of shape (n, natoms, 3)
+
+            Keyword Arguments:
+            variances -- also predict the variances. Default is True, otherwise None is returned for them.
+
+            Returns:
+            energies (n,), gradients (n, natoms, 3) and variances (n,)
+        """
+        shape = numpy.shape(coordinates)
+        n = shape[0]
+        if len(self._E) == 0:
+            return numpy.zeros(n), numpy.zeros(shape), self._variance * numpy.ones(n)
+
+        Xs, Js = self._describe(coordinates)
+        ks = numpy.reshape(self._covariance(Xs, Js, self._X, self._J), (n, -1, len(self._alpha)))
+        mean = numpy.dot(ks, self._alpha)
+        energies = self._mean + mean[:,0]
+        gradients = numpy.reshape(mean[:,1:], shape)
+        if not variances:
+            return energies, gradients, None
+
+        # covariance of the predicted energies with all observations
+        v = _solveLower(self._L, ks[:,0].T)
+        return energies, gradients, numpy.maximum(self._variance - numpy.sum(v*v, axis=0), 0.0)
+
+    def _describe(self, coordinates):
+        """ Returns the descriptors x of geometries and their derivatives
+
+            Arguments:
+            coordinates -- the geometries as an array of shape (n, natoms, 3)
+
+            Returns:
+            x as an array of shape (n, p) and the derivatives dx/dR as an array
+            of shape (n, p, natoms*3) or None if x are the coordinates
+        """
+        c = numpy.asarray(coordinates, dtype=float)
+        n, natoms = numpy.shape(c)[:2]
+        if self._descriptor == 'cartesian':
+            return numpy.reshape(c, (n, -1)), None
+
+        i, j = numpy.triu_indices(natoms, 1)
+        dr = c[:,i] - c[:,j]
+        x = 1.0 / numpy.sqrt(numpy.sum(dr*dr, axis=-1))
+        dx = -dr * (x**3)[:,:,numpy.newaxis]
+        pairs = numpy.arange(len(i))
+        J = numpy.zeros((n, len(i), natoms, 3))
+        J[:,pairs,i] = dx
+        J[:,pairs,j] = -dx
+        return x, numpy.reshape(J, (n, len(i), -1))
+
+    def _covariance(self, X1, J1, X2, J2, noise=False):
+        """ Returns the covariance of the energies and gradients of two sets of geometries
+
+            The energy and the gradient of each geometry are next to each other.
+            The gradients are taken with respect to the Cartesian coordinates
+            by the chain rule through the derivatives J of the descriptors.
+
+            Keyword Arguments:
+            noise -- add the noise of the observations. Both sets must be the same.
+        """
+        m1, m2 = len(X1), len(X2)
+        l2 = self._lengthscale**2
+        r = X1[:,numpy.newaxis,:] - X2[numpy.newaxis,:,:]
+        k = self._variance * numpy.exp(-0.5 * numpy.sum(r*r, axis=-1) / l2)
+
+        # the derivatives of k with respect to the descriptors of the
+        # geometries in the second set (r2) and the first set (r1)
+        r1 = r2 = r
+        JJ = numpy.eye(numpy.shape(r)[-1])[numpy.newaxis,numpy.newaxis]
+        if J1 is not None:
+            r1 = numpy.einsum('ijp,ipa->ija', r, J1)
+            r2 = numpy.einsum('ijp,jpb->ijb', r, J2)
+            JJ = numpy.einsum('ipa,jpb->ijab', J1, J2)
+        d1, d2 = numpy.shape(r1)[-1], numpy.shape(r2)[-1]
+
+        K = numpy.zeros((m1, d1+1, m2, d2+1))
+        K[:,0,:,0] = k
+        K[:,0,:,1:] = k[:,:,numpy.newaxis] * r2 / l2
+        K[:,1:,:,0] = numpy.transpose(-k[:,:,numpy.newaxis] * r1 / l2, (0, 2, 1))
+        KGG = k[:,:,numpy.newaxis,numpy.newaxis] * (JJ / l2 - r1[:,:,:,numpy.newaxis] * r2[:,:,numpy.newaxis,:] / l2**2)
+        K[:,1:,:,1:] = numpy.transpose(KGG, (0, 2, 1, 3))
+        K = numpy.reshape(K, (m1*(d1+1), m2*(d2+1)))
+
+        if noise:
+            K[numpy.diag_indices(len(K))] += numpy.tile([self._noise] + [self._gradientnoise] * d1, m1)
+        return K
+
+class SurrogateNEB(object):
+    """ Minimizes a NEB on a Gaussian process surrogate
+
+        Every iteration the band is relaxed on the surrogate fitted to all
+        energies and gradients calculated so far. Then only the nevaluate
+        inner beads with the largest predicted uncertainty are calculated
+        with the real function and added to the surrogate. When the
+        uncertainty of all inner beads is below stdtol the entire band is
+        calculated to check that the real forces are converged.
+
+        The endpoints are calculated once at the start.
+
+        Typical use-case might look like:
+
+        >>> n = neb.NEB(path, 1.0, climb=True)
+        >>> result = neb.surrogate.SurrogateNEB(n).minimize(100, 0.01, eandg, minimizer)
+        >>> print result.isConverged()
+
+        NOTE: Frozen beads keep the energies and gradients of the surrogate
+              so freezing (freezetol) should not be used with the NEB.
+
+        Arguments:
+        neb -- the NEB to minimize
+
+        Keyword Arguments:
+        gp -- the Gaussian process. Default is a GaussianProcess with default settings
+              which needs a potential that does not change when the molecule is rotated.
+        nevaluate -- number of beads calculated with the real function every iteration
+        innersteps -- maximum number of NEB iterations on the surrogate every iteration
+        stdtol -- the standard deviation of the predicted energies (in the units of
+                  the energy) below which the band is checked with the real function
+        maxstep -- the largest distance (in Angstrom) any atom may move on the
+                   surrogate between two evaluations with the real function
+    """
+    def __init__(self, neb, gp=None, nevaluate=1, innersteps=100, stdtol=1.0e-3, maxstep=0.2):
+        self._neb = neb
+        self._gp = gp
+        if gp is None:
+            self._gp = GaussianProcess()
+        self._nevaluate = nevaluate
+        self._innersteps = innersteps
+        self._stdtol = stdtol
+        self._maxstep = maxstep
+        self._nevaluations = 0
+
+    def getGaussianProcess(self):
+        return self._gp
+
+    def getNumEvaluations(self):
+        """ Returns the number of evaluations of the real function """
+        return self._nevaluations
+
+    def minimize(self, nsteps, opttol, func, minimizer, verbose=True):
+        """ Minimizes the NEB path with as few calls of func as possible
+
+            Arguments:
+            nsteps -- perform a maximum of nsteps iterations, each with nevaluate calls of func
+            opttol -- the maximum real rms force of any bead shall be below this value
+            func -- energy and gradient function
+            minimizer -- a minimizer
+
+            Keyword Arguments:
+            verbose -- print the surrogate and real evaluations of every iteration. Default is True.
+
+            Returns:
+            a MinimizationResult with the outcome of the minimization
+        """
+        path = self._neb.getPath()
+        nbeads = path.getNumBeads()
+        surrogate = _SurrogateEnergyAndGradient(self._gp)
+        recorder = _RecordingEnergyAndGradient(func, self)
+        if self._gp.getNumObservations() == 0:
+            self._evaluate(recorder, path, [0, nbeads-1])
+
+        iteration = 0
+        reason = MinimizationResult.MAXSTEPS
+        for i in range(1, nsteps + 1):
+            iteration = i
+            if hasattr(minimizer, 'reset'):
+                minimizer.reset()
+            c0 = self._neb.getBandCoordinates()
+            inner = self._neb.minimize(self._innersteps, opttol, surrogate, minimizer, verbose=False)
+
+            # the surrogate can not be trusted far from the data so the
+            # beads are pulled back when they moved more than maxstep
+            dR = self._neb.getBandCoordinates() - c0
+            if not numpy.all(numpy.isfinite(dR)):
+                dR = numpy.zeros(numpy.shape(dR))
+            limited = util.limitStep(dR, self._maxstep)
+            trusted = limited is dR
+            c = c0 + limited
+            if not trusted:
+                self._neb.setBandCoordinates(c)
+
+            e, g, variances = self._gp.predict(c[1:-1])
+            std = numpy.sqrt(numpy.max(variances))
+            if verbose:
+                print "I={0:3d} SURROGATE ITERATIONS={1:4d} MAX STD={2:12.6f} EVALUATIONS={3:5d}".format(i, inner.getIterations(), std, self._nevaluations)
+
+            if trusted and inner.isConverged() and std < self._stdtol:
+                # the real forces of the entire band decide
+                self._neb.beadForces(recorder)
+                if numpy.max(self._neb.getRMSForces()[1:-1]) < opttol:
+                    reason = MinimizationResult.CONVERGED
+                    break
+                continue
+
+            indices = numpy.argsort(variances)[::-1][:self._nevaluate] + 1
+            self._evaluate(recorder, path, list(indices))
+
+        result = MinimizationResult(iteration, self._neb, reason)
+        if verbose:
+            print "-"*89
+            print "Surrogate NEB stopped after {0:d} iterations and {1:d} evaluations: {2:s}".format(result.getIterations(), self._nevaluations, result.getReason())
+
+        return result
+
+    def _evaluate(self, func, path, indices):
+        """ Evaluates the beads of the path with func """
+        parallel.evaluateBeads(func, [path[ibead] for ibead in indices], None, indices)
+
+    def _record(self, coordinates, energies, gradients):
+        """ Adds real energies and gradients to the surrogate """
+        self._nevaluations += len(energies)
+        self._gp.addObservations(coordinates, energies, gradients)
+
+class _SurrogateEnergyAndGradient(object):
+    """ The surrogate as an energy and gradient function for the NEB """
+    def __init__(self, gp):
+        self._gp = gp
+
+    def __call__(self, molecule):
+        energies, gradients = self.bandEnergyAndGradient(molecule, molecule.getCoordinates()[numpy.newaxis])
+        return energies[0], gradients[0]
+
+    def bandEnergyAndGradient(self, molecule, coordinates, indices=None):
+        energies, gradients, variances = self._gp.predict(coordinates, variances=False)
+        return energies, gradients
+
+class _RecordingEnergyAndGradient(object):
+    """ Calls the real function and adds the results to the surrogate """
+    def __init__(self, func, owner):
+        self._func = func
+        self._owner = owner
+        if parallel.hasBandMethod(func):
+            self.bandEnergyAndGradient = self._bandEnergyAndGradient
+
+    def __call__(self, molecule):
+        energy, gradient = self._func(molecule)
+        self._owner._record(molecule.getCoordinates()[numpy.newaxis], [energy], [gradient])
+        return energy, gradient
+
+    def _bandEnergyAndGradient(self, molecule, coordinates, indices=None):
+        energies, gradients = self._func.bandEnergyAndGradient(molecule, coordinates, indices)
+        self._owner._record(coordinates, energies, gradients)
+        return energies, gradients
+
+def _solveLower(L, B, transpose=False):
+    """ Solves L X = B (or L^T X = B) for a lower triangular matrix L
+
+        The rows are eliminated in blocks so it costs O(n^2) time
+        for each column of B instead of O(n^3) for a general solve.
+    """
+    n = len(L)
+    X = numpy.array(B, dtype=float)
+    blocks = range(0, n, _BLOCKSIZE)
+    if transpose:
+        blocks = blocks[::-1]
+    for start in blocks:
+        end = min(start + _BLOCKSIZE, n)
+        if transpose:
+            X[start:end] -= numpy.dot(L[end:,start:end].T, X[end:])
+            X[start:end] = numpy.linalg.solve(L[start:end,start:end].T, X[start:end])
+        else:
+            X[start:end] -= numpy.dot(L[start:end,:start], X[:start])
+            X[start:end] = numpy.linalg.solve(L[start:end,start:end], X[start:end])
+    return X
+
+# number of rows of a triangular factor that are eliminated at once
+_BLOCKSIZE = 64
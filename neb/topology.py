@@ -0,0 +1,63 @@
+import angle
+import dihedral
+
+class Topology(object):
+    """ The connectivity of a molecule
+
+        The topology stores the neighbours of every atom (an adjacency list)
+        built once from the bonds. Angles and dihedrals are enumerated from
+        the neighbours of the central atom(s) so the cost is linear in the
+        number of angles and dihedrals instead of quadratic in the number
+        of bonds.
+
+        Arguments:
+        natoms -- the number of atoms in the molecule
+        bonds -- the bonds of the molecule
+    """
+    def __init__(self, natoms, bonds):
+        self._bonds = list(bonds)
+        self._neighbours = [[] for iat in range(natoms)]
+        for _bond in self._bonds:
+            (iat, jat) = _bond.getAtomIndices()
+            self._neighbours[iat].append(jat)
+            self._neighbours[jat].append(iat)
+
+        for nbrs in self._neighbours:
+            nbrs.sort()
+
+    def getNumAtoms(self):
+        return len(self._neighbours)
+
+    def getNeighbours(self, iat):
+        """ Returns the indices of the atoms bonded to atom iat """
+        return self._neighbours[iat]
+
+    def getBonds(self):
+        """ Returns all bonds (as an iterator) """
+        for _bond in self._bonds:
+            yield _bond
+
+    def getAngles(self):
+        """ Returns all angles (as an iterator)
+
+            The angles are ordered by the central atom.
+        """
+        for jat, nbrs in enumerate(self._neighbours):
+            for k, iat in enumerate(nbrs):
+                for kat in nbrs[k+1:]:
+                    yield angle.Angle(iat, jat, kat)
+
+    def getDihedrals(self):
+        """ Returns all proper dihedrals (as an iterator)
+
+            The dihedrals are ordered by the central bond.
+        """
+        for _bond in self._bonds:
+            (jat, kat) = _bond.getAtomIndices()
+            for iat in self._neighbours[jat]:
+                if iat == kat:
+                    continue
+                for lat in self._neighbours[kat]:
+                    if lat == jat or lat == iat:
+                        continue
+                    yield dihedral.Dihedral(iat, jat, kat, lat)
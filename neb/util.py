@@ -88,3 +88,20 @@ def idamin(a):
             v = value
 
     return idx
+
+def limitStep(dr, maxstep):
+    """ Scales a displacement so no atom is moved more than maxstep
+
+        Arguments:
+        dr -- a numpy array of displacements with the Cartesian
+              components of each atom along the last axis
+        maxstep -- the largest allowed displacement of any atom
+
+        Returns:
+        the (possibly scaled) displacement
+    """
+    drmax = numpy.max(numpy.sqrt(numpy.sum(dr*dr, axis=-1)))
+    if drmax > maxstep:
+        return dr * (maxstep / drmax)
+
+    return dr
@@ -0,0 +1,86 @@
+""" Systems shared by the tests """
+import os
+import stat
+import sys
+
+import numpy
+
+import neb
+from neb.util import idamax
+from neb.methods import LEPSEnergyAndGradient
+from neb.interpolate import Linear
+
+def lepsMolecule(xa, yc):
+    """ Returns the three atoms of the LEPS potential as in example.py """
+    m = neb.Molecule()
+    m.addAtoms(
+        neb.Atom(1, xyz=[xa, 0.0, 0.0]),
+        neb.Atom(1, xyz=[0.0, 0.0, 0.0]),
+        neb.Atom(1, xyz=[0.0, yc, 0.0])
+    )
+    return m
+
+def lepsEndpoints():
+    """ Returns the reactant and product minimized as in example.py """
+    endpoints = []
+    for xa, yc in ((0.6, 2.0), (2.0, 0.8)):
+        m = lepsMolecule(xa, yc)
+        for k in range(1000):
+            e, g = LEPSEnergyAndGradient(m)
+            m.setCoordinates(m.getCoordinates() - 0.01 * g)
+            gval = numpy.ravel(g)
+            grms = numpy.sqrt(gval.dot(gval)/9)
+            if grms < 0.02 or gval[idamax(gval)]/3 >= grms:
+                break
+        endpoints.append(m)
+    return endpoints
+
+def lepsPath(nbeads=10):
+    """ Returns the linear path between the endpoints of example.py """
+    m1, m2 = lepsEndpoints()
+    return Linear(m1, m2, nbeads)
+
+# The fake executable writes an ORCA-like output for the energy
+# E = sum(x^2) with the gradient 2x (in Eh/bohr). Its behaviour is
+# controlled through environment variables:
+#
+# FAKEORCA_LOG -- file to append the scratch directory and whether the
+#                 input reads the orbitals of a previous run to
+# FAKEORCA_TIMES -- file to append the start and end time of the run to
+# FAKEORCA_DELAY -- time in seconds the calculation takes
+# FAKEORCA_FAILONCE -- exit with an error the first time in every directory
+FAKEORCA = """#!{0:s}
+import os
+import sys
+import time
+
+started = time.time()
+lines = open(sys.argv[1]).read().splitlines()
+start = [i for i, line in enumerate(lines) if line.startswith("* xyz")][0]
+atoms = [line.split() for line in lines[start+1:] if line.strip() not in ("", "*")]
+moread = any("MORead" in line for line in lines)
+if os.environ.get("FAKEORCA_LOG"):
+    with open(os.environ["FAKEORCA_LOG"], "a") as log:
+        log.write("{{0:s}} {{1:d}} {{2:d}}\\n".format(os.path.basename(os.getcwd()), moread, os.path.exists("guess.gbw")))
+if os.environ.get("FAKEORCA_FAILONCE") and not os.path.exists("failed.once"):
+    open("failed.once", "w").close()
+    sys.exit(3)
+time.sleep(float(os.environ.get("FAKEORCA_DELAY", "0.0")))
+print("Total Energy       :  {{0:.8f}} Eh  0 eV".format(sum(float(x)**2 for atom in atoms for x in atom[1:4])))
+print("CARTESIAN GRADIENT\\n-----\\n")
+for i, atom in enumerate(atoms):
+    print("{{0:4d}} {{1:s}}   :  {{2:s}}".format(i+1, atom[0], " ".join("{{0:.8f}}".format(2.0*float(x)) for x in atom[1:4])))
+open("bead.gbw", "w").write("orbitals")
+if os.environ.get("FAKEORCA_TIMES"):
+    with open(os.environ["FAKEORCA_TIMES"], "a") as times:
+        times.write("{{0:.6f}} {{1:.6f}}\\n".format(started, time.time()))
+print("TOTAL RUN TIME: 0 days")
+""".format(sys.executable)
+
+def writeFakeOrca(directory):
+    """ Writes the fake orca executable to directory and returns its filename """
+    executable = os.path.join(directory, "fakeorca")
+    with open(executable, 'w') as f:
+        f.write(FAKEORCA)
+    os.chmod(executable, stat.S_IRWXU)
+    return executable
@@ -0,0 +1,138 @@
+""" Tests of growing the band and reparametrizing it to equal arc length """
+import unittest
+
+import numpy
+
+import neb
+from neb.interpolate import Restart
+from neb.methods import LEPSEnergyAndGradient
+from neb.minimizers import FIRE, LBFGS
+
+from helpers import lepsEndpoints, lepsMolecule, lepsPath
+
+# the arrays of the band with one entry for every bead
+BEADARRAYS = ('coordinates', 'energies', 'gradients', 'grms', 'frozen', 'nconverged', 'frozenneighbours')
+
+def bandFromCoordinates(coordinates, **kwargs):
+    """ Returns a NEB of the LEPS atoms with the given coordinates of all beads """
+    return neb.NEB(Restart.fromCoordinates(lepsMolecule(1.0, 1.0), coordinates), 1.0, **kwargs)
+
+def arcLengths(points, polyline):
+    """ Returns the distance along polyline of every point on it """
+    d = numpy.sqrt(numpy.sum(numpy.reshape(numpy.diff(polyline, axis=0)**2, (len(polyline) - 1, -1)), axis=1))
+    s0 = numpy.concatenate(([0.0], numpy.cumsum(d)))
+    s = []
+    for p in points:
+        for k in range(len(d)):
+            a, b = polyline[k], polyline[k+1]
+            t = numpy.vdot(p - a, b - a) / d[k]**2
+            if -1.0e-12 <= t <= 1.0 + 1.0e-12 and numpy.max(numpy.abs(a + t*(b - a) - p)) < 1.0e-10:
+                s.append(s0[k] + t*d[k])
+                break
+        else:
+            raise AssertionError("The point is not on the polyline.")
+    return numpy.array(s)
+
+class TestInsertBead(unittest.TestCase):
+
+    def testArrays(self):
+        n = neb.NEB(lepsPath(6), 1.0, freezetol=1.0, freezeiter=1)
+        n.minimize(3, 1.0e-6, LEPSEnergyAndGradient, FIRE(), verbose=False)
+        self.assertTrue(len(n.getFrozenBeads()) > 0)
+        before = n.getState()
+
+        n.insertBead(3)
+        state = n.getState()
+        for key in BEADARRAYS:
+            self.assertEqual(len(state[key]), 7)
+            if key not in ('frozen', 'nconverged'):
+                numpy.testing.assert_array_equal(numpy.delete(state[key], 3, axis=0), before[key])
+        self.assertEqual(len(n.getTangents()), 7)
+        self.assertEqual(len(n._springConstants()), 6)
+
+        # the new bead lies halfway between its neighbours
+        numpy.testing.assert_allclose(state['coordinates'][3], 0.5*(before['coordinates'][2] + before['coordinates'][3]))
+        self.assertEqual(state['energies'][3], 0.5*(before['energies'][2] + before['energies'][3]))
+        self.assertEqual(state['grms'][3], -1.0)
+        self.assertEqual(n.getPath().getNumBeads(), 7)
+        numpy.testing.assert_array_equal(numpy.array([bead.getCoordinates() for bead in n.getPath()]), state['coordinates'])
+
+        # all beads thaw
+        self.assertEqual(n.getFrozenBeads(), [])
+        self.assertFalse(numpy.any(state['nconverged']))
+
+    def testMaxBeads(self):
+        m1, m2 = lepsEndpoints()
+        for minimizer in (FIRE(), LBFGS()):
+            n = neb.NEB(lepsPath(6), 1.0, maxbeads=9, growiter=2, freezetol=0.05)
+            n.minimize(5, 1.0e-6, LEPSEnergyAndGradient, minimizer, verbose=False)
+            self.assertEqual(len(n.getEnergies()), 8)
+
+            # the minimizer starts over with the beads of the grown band
+            state = minimizer.getState()
+            self.assertEqual(numpy.shape(state.get('v', state.get('dr'))), (6, 3, 3))
+            for key in ('s', 'y'):
+                for value in state.get(key, []):
+                    self.assertEqual(numpy.size(value), 6*3*3)
+
+            n.minimize(20, 1.0e-6, LEPSEnergyAndGradient, minimizer, verbose=False)
+            self.assertEqual(len(n.getEnergies()), 9)
+            self.assertEqual(n.getPath().getNumBeads(), 9)
+            c = n.getBandCoordinates()
+            numpy.testing.assert_array_equal(c[0], m1.getCoordinates())
+            numpy.testing.assert_array_equal(c[-1], m2.getCoordinates())
+
+    def testConverged(self):
+        # a converged band that may grow does so right away
+        n = neb.NEB(lepsPath(6), 1.0, maxbeads=8, growiter=1000)
+        result = n.minimize(1000, 0.05, LEPSEnergyAndGradient, FIRE(), verbose=False)
+        self.assertTrue(result.isConverged())
+        self.assertEqual(len(n.getEnergies()), 8)
+
+class TestReparametrize(unittest.TestCase):
+
+    def checkEqualArcLengths(self, c):
+        n = bandFromCoordinates(c)
+        n.beadForces(LEPSEnergyAndGradient)
+        before = n.getState()
+        n.reparametrize()
+        R = n.getBandCoordinates()
+        numpy.testing.assert_array_equal(R[[0, -1]], c[[0, -1]])
+        s = arcLengths(R, c)
+        numpy.testing.assert_allclose(numpy.diff(s), s[-1] / (len(c) - 1), rtol=1.0e-10)
+
+        # the energies are interpolated along the straight lines as well
+        numpy.testing.assert_allclose(n.getEnergies(), numpy.interp(s, arcLengths(c, c), before['energies']), rtol=1.0e-10)
+        numpy.testing.assert_array_equal(numpy.array([bead.getCoordinates() for bead in n.getPath()]), R)
+        return n
+
+    def testStraightLine(self):
+        m1, m2 = lepsEndpoints()
+        f = numpy.array([0.0, 0.02, 0.05, 0.1, 0.3, 0.35, 0.7, 1.0])[:,numpy.newaxis,numpy.newaxis]
+        c = m1.getCoordinates() + f * (m2.getCoordinates() - m1.getCoordinates())
+        self.checkEqualArcLengths(c)
+
+    def testCurve(self):
+        angles = numpy.radians([0.0, 5.0, 10.0, 40.0, 45.0, 80.0, 90.0])
+        c = numpy.array([lepsMolecule(1.0, 1.0).getCoordinates() for a in angles])
+        c[:,0,0] = 0.7 + numpy.cos(angles)
+        c[:,2,1] = 0.7 + numpy.sin(angles)
+        n = self.checkEqualArcLengths(c)
+        self.assertEqual(n.getFrozenBeads(), [])
+
+    def testClimbing(self):
+        # the band is reparametrized when due until the climbing image starts
+        c = numpy.array([bead.getCoordinates() for bead in lepsPath(8)])
+        c[1:-1] += 0.05 * numpy.random.RandomState(0).randn(6, 3, 3)
+        n = bandFromCoordinates(c, reparametrizeiter=5)
+        n.beadForces(LEPSEnergyAndGradient)
+        self.assertFalse(n._adaptBand(4, False, LEPSEnergyAndGradient, FIRE()))
+        self.assertTrue(n._adaptBand(5, False, LEPSEnergyAndGradient, FIRE()))
+        s = arcLengths(n.getBandCoordinates(), c)
+        numpy.testing.assert_allclose(numpy.diff(s), s[-1] / 7, rtol=1.0e-10)
+
+        n._startClimbing(FIRE())
+        self.assertFalse(n._adaptBand(10, False, LEPSEnergyAndGradient, FIRE()))
+
+if __name__ == '__main__':
+    unittest.main()
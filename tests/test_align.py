@@ -0,0 +1,111 @@
+""" Tests of the rigid body alignment and the projection of rigid body motion """
+import unittest
+
+import numpy
+
+import neb
+from neb.align import alignCoordinates, alignMolecule, projectRigidBody
+from neb.methods import LEPSEnergyAndGradient
+
+from helpers import lepsEndpoints, lepsPath
+
+def randomRotation(random):
+    """ Returns a random rotation matrix (without reflection) """
+    q, r = numpy.linalg.qr(random.randn(3, 3))
+    q *= numpy.sign(numpy.diag(r))
+    if numpy.linalg.det(q) < 0.0:
+        q[:,0] *= -1.0
+    return q
+
+def netForceAndTorque(coordinates, forces):
+    """ Returns the sum of the forces and of their torques about the
+        geometric center of each bead, both with shape (nbeads, 3)
+    """
+    r = coordinates - numpy.mean(coordinates, axis=1)[:,numpy.newaxis]
+    return numpy.sum(forces, axis=1), numpy.sum(numpy.cross(r, forces), axis=1)
+
+class TestAlign(unittest.TestCase):
+
+    def testRotationAndTranslation(self):
+        random = numpy.random.RandomState(0)
+        c = random.randn(6, 3)
+        for k in range(5):
+            moved = c.dot(randomRotation(random).T) + 10.0 * random.randn(3)
+            numpy.testing.assert_allclose(alignCoordinates(c, moved), c, atol=1.0e-10)
+            numpy.testing.assert_allclose(alignCoordinates(c, moved, weights=random.uniform(1.0, 16.0, 6)), c, atol=1.0e-10)
+
+    def testBand(self):
+        random = numpy.random.RandomState(1)
+        c = random.randn(6, 3)
+        band = numpy.array([c.dot(randomRotation(random).T) + random.randn(3) for k in range(4)])
+        aligned = alignCoordinates(c, band)
+        self.assertEqual(numpy.shape(aligned), (4, 6, 3))
+        for bead in aligned:
+            numpy.testing.assert_allclose(bead, c, atol=1.0e-10)
+
+    def testNoReflection(self):
+        # the mirror image of a chiral molecule can not be rotated onto it
+        random = numpy.random.RandomState(2)
+        c = random.randn(5, 3)
+        mirror = c * [1.0, 1.0, -1.0]
+        aligned = alignCoordinates(c, mirror)
+        self.assertTrue(numpy.max(numpy.abs(aligned - c)) > 0.1)
+        # the distances between the atoms are kept
+        d = lambda x: numpy.sqrt(numpy.sum((x[:,numpy.newaxis] - x[numpy.newaxis])**2, axis=2))
+        numpy.testing.assert_allclose(d(aligned), d(mirror), atol=1.0e-10)
+
+    def testMolecule(self):
+        m1, m2 = lepsEndpoints()
+        c = m2.getCoordinates()
+        moved = neb.Molecule.fromMolecule(m2, c.dot(randomRotation(numpy.random.RandomState(3)).T) + 1.0)
+        aligned = alignMolecule(m2, moved)
+        numpy.testing.assert_allclose(aligned.getCoordinates(), c, atol=1.0e-10)
+        # the molecule itself is not moved
+        self.assertFalse(numpy.allclose(moved.getCoordinates(), c))
+
+class TestProjectRigidBody(unittest.TestCase):
+
+    def testNoNetForceOrTorque(self):
+        random = numpy.random.RandomState(0)
+        c = random.randn(4, 5, 3)
+        f = random.randn(4, 5, 3)
+        p = projectRigidBody(c, f)
+        force, torque = netForceAndTorque(c, p)
+        numpy.testing.assert_allclose(force, 0.0, atol=1.0e-10)
+        numpy.testing.assert_allclose(torque, 0.0, atol=1.0e-10)
+
+        # the internal part of the forces is kept
+        numpy.testing.assert_allclose(projectRigidBody(c, p), p, atol=1.0e-10)
+
+    def testRigidBodyMotion(self):
+        random = numpy.random.RandomState(1)
+        c = random.randn(3, 4, 3)
+        r = c - numpy.mean(c, axis=1)[:,numpy.newaxis]
+        motion = random.randn(3) + numpy.cross(random.randn(3), r)
+        numpy.testing.assert_allclose(projectRigidBody(c, motion), 0.0, atol=1.0e-10)
+
+    def testLinear(self):
+        # a linear bead can only rotate about two axes
+        random = numpy.random.RandomState(2)
+        c = numpy.zeros((1, 3, 3))
+        c[0,:,0] = [0.0, 1.0, 2.5]
+        f = random.randn(1, 3, 3)
+        p = projectRigidBody(c, f)
+        force, torque = netForceAndTorque(c, p)
+        numpy.testing.assert_allclose(force, 0.0, atol=1.0e-10)
+        numpy.testing.assert_allclose(torque, 0.0, atol=1.0e-10)
+        # two stretches and two bends are left
+        self.assertTrue(numpy.linalg.norm(p[0,:,0]) > 0.1)
+        numpy.testing.assert_allclose(projectRigidBody(c, p), p, atol=1.0e-10)
+
+    def testNEB(self):
+        n = neb.NEB(lepsPath(), 1.0, rigid=True)
+        n.beadForces(LEPSEnergyAndGradient)
+        c = n.getBandCoordinates()[1:-1]
+        for vectors in (n.getTangents()[1:-1], numpy.array(list(n.innerBeadForces()))):
+            force, torque = netForceAndTorque(c, vectors)
+            numpy.testing.assert_allclose(force, 0.0, atol=1.0e-10)
+            numpy.testing.assert_allclose(torque, 0.0, atol=1.0e-10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+""" Tests of the energy profile interpolated along a band """
+import unittest
+
+import numpy
+
+import neb
+from neb.analysis import EnergyProfile
+from neb.methods import LEPSEnergyAndGradient
+from neb.minimizers import FIRE
+
+from helpers import lepsPath
+
+# the saddle point of the LEPS potential between the endpoints
+SADDLE = -2.9805
+
+def cubic(s):
+    """ Returns the energy and slope of a cubic with its maximum 4 at s = 2 """
+    return -s**3 + 3.0*s**2, -3.0*s**2 + 6.0*s
+
+class TestEnergyProfile(unittest.TestCase):
+
+    def cubicProfile(self):
+        # a single atom moving along a line with uneven steps
+        s = numpy.array([0.0, 0.4, 1.5, 1.7, 2.6, 3.0])
+        coordinates = numpy.zeros((len(s), 1, 3))
+        coordinates[:,0,0] = s
+        coordinates[:,0,1] = 1.0
+        energies, slopes = cubic(s)
+        gradients = numpy.zeros(numpy.shape(coordinates))
+        gradients[:,0,0] = slopes
+        return EnergyProfile(coordinates, energies, gradients)
+
+    def testCubic(self):
+        # the spline is exact for a cubic
+        profile = self.cubicProfile()
+        numpy.testing.assert_allclose(profile.getReactionCoordinates(), [0.0, 0.4, 1.5, 1.7, 2.6, 3.0], atol=1.0e-12)
+        s = numpy.linspace(0.0, 3.0, 61)
+        numpy.testing.assert_allclose(profile.getEnergy(s), cubic(s)[0], atol=1.0e-12)
+        x, e = profile.getProfile(npoints=31)
+        numpy.testing.assert_allclose(e, cubic(x)[0], atol=1.0e-12)
+
+        # the maximum is found between the beads
+        s, e = profile.getMaximum()
+        self.assertAlmostEqual(s, 2.0, places=10)
+        self.assertAlmostEqual(e, 4.0, places=10)
+        self.assertAlmostEqual(profile.getBarrier(), 4.0, places=10)
+        self.assertAlmostEqual(profile.getBarrier(reverse=True), 4.0, places=10)
+
+    def testTangents(self):
+        # given tangents are used instead of the directions between the beads
+        coordinates = numpy.zeros((5, 1, 3))
+        coordinates[:,0,0] = numpy.arange(5)
+        t = numpy.zeros((5, 1, 3))
+        t[1:-1,0,1] = 1.0
+        gradients = numpy.zeros((5, 1, 3))
+        gradients[:,0,:2] = [2.0, 1.0]
+        slopes = EnergyProfile(coordinates, numpy.zeros(5), gradients, tangents=t).getSlopes()
+        # the endpoints have no tangent
+        numpy.testing.assert_allclose(slopes, [2.0, 1.0, 1.0, 1.0, 2.0])
+
+    def testLEPS(self):
+        n = neb.NEB(lepsPath(), 1.0, climb=True)
+        result = n.minimize(1000, 0.01, LEPSEnergyAndGradient, FIRE(), verbose=False)
+        self.assertTrue(result.isConverged())
+        profile = EnergyProfile.fromNEB(n)
+
+        s, e = profile.getMaximum()
+        self.assertAlmostEqual(e, SADDLE, places=3)
+        self.assertTrue(e >= numpy.max(n.getEnergies()))
+        # the climbing image sits on the saddle point
+        ci = n.getClimbingImage()
+        self.assertAlmostEqual(s, profile.getReactionCoordinates()[ci], places=2)
+        energies = n.getEnergies()
+        self.assertAlmostEqual(profile.getBarrier(), e - energies[0])
+        self.assertAlmostEqual(profile.getBarrier(reverse=True), e - energies[-1])
+
+        # the spline passes through the beads
+        numpy.testing.assert_allclose(profile.getEnergy(profile.getReactionCoordinates()), energies, atol=1.0e-12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+""" Tests of minimizing many bands at once and continuing the batch """
+import json
+import os
+import shutil
+import tempfile
+import thread
+import threading
+import time
+import unittest
+import warnings
+
+import neb
+from neb import NEB
+from neb.batch import BatchNEB
+from neb.methods import CachedEnergyAndGradient, LEPSEnergyAndGradient, OrcaEnergyAndGradient
+from neb.minimizers import FIRE, SteepestDescent
+
+from helpers import lepsEndpoints, writeFakeOrca
+
+def plainLEPS(molecule):
+    """ The LEPS potential without the band method so the executor is used """
+    return LEPSEnergyAndGradient(molecule)
+
+def slowLEPS(molecule):
+    time.sleep(0.01)
+    return LEPSEnergyAndGradient(molecule)
+
+def nanLEPS(molecule):
+    e, g = LEPSEnergyAndGradient(molecule)
+    return float('nan'), g * float('nan')
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.reactions = [lepsEndpoints()] * 2
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def batch(self, func=plainLEPS, **kwargs):
+        return BatchNEB(self.reactions, func, FIRE, self.directory, nworkers=4, **kwargs)
+
+    def readSummary(self):
+        with open(os.path.join(self.directory, BatchNEB.SUMMARY)) as summaryfile:
+            return json.load(summaryfile)
+
+    def testContinue(self):
+        summary = self.batch().run(5, 1.0e-6, verbose=False)
+        self.assertEqual(sorted(summary.keys()), ['0', '1'])
+        for entry in summary.values():
+            self.assertEqual(entry['status'], 'maxsteps')
+            self.assertEqual((entry['iterations'], entry['nsteps']), (5, 5))
+
+        # all iterations used, so nothing runs again
+        summary = self.batch().run(5, 1.0e-6, verbose=False)
+        self.assertEqual(summary['0']['evaluations'], 2 + 5*8)
+
+        # more iterations continue from the checkpoints
+        summary = self.batch().run(8, 1.0e-6, verbose=False)
+        for entry in summary.values():
+            self.assertEqual(entry['status'], 'maxsteps')
+            self.assertEqual((entry['iterations'], entry['nsteps']), (8, 8))
+
+    def testConverged(self):
+        summary = self.batch().run(1000, 0.05, verbose=False)
+        for entry in summary.values():
+            self.assertEqual(entry['status'], 'converged')
+            self.assertTrue(entry['maxrmsforce'] < 0.05)
+            self.assertTrue(entry['barrier'] > 0.0)
+
+        # converged bands do not run again even with more iterations
+        self.assertEqual(self.batch().run(2000, 0.05, verbose=False), summary)
+
+    def testTighterCriteria(self):
+        loose = self.batch().run(1000, 0.05, verbose=False)
+
+        # converged bands continue with stricter criteria
+        summary = self.batch().run(1000, 0.02, verbose=False)
+        for index, entry in summary.items():
+            self.assertEqual(entry['status'], 'converged')
+            self.assertEqual(entry['opttol'], 0.02)
+            self.assertTrue(entry['maxrmsforce'] < 0.02)
+            self.assertTrue(entry['iterations'] > loose[index]['iterations'])
+        self.assertEqual(self.batch().run(1000, 0.05, verbose=False), summary)
+
+        summary = self.batch().run(1000, 0.05, maxforce=0.02, verbose=False)
+        for entry in summary.values():
+            self.assertEqual((entry['opttol'], entry['maxforce']), (0.05, 0.02))
+            self.assertEqual(entry['status'], 'converged')
+
+    def testDiverged(self):
+        # the bands run in other threads which do not share numpy.errstate
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            summary = self.batch(nanLEPS).run(5, 0.05, verbose=False)
+        for entry in summary.values():
+            self.assertEqual(entry['status'], 'diverged')
+        self.assertEqual(self.batch(nanLEPS).run(10, 0.05, verbose=False), summary)
+
+    def testInterrupted(self):
+        # Ctrl-C while the bands run
+        timer = threading.Timer(0.5, thread.interrupt_main)
+        timer.start()
+        start = time.time()
+        try:
+            self.assertRaises(KeyboardInterrupt, self.batch(slowLEPS, maxbands=1).run, 1000, 1.0e-6,
+                              checkpointiter=2, verbose=False)
+        finally:
+            timer.cancel()
+        self.assertTrue(time.time() - start < 5.0)
+
+        # the running band stops before its next step and the other never starts
+        for k in range(100):
+            summary = self.readSummary()
+            if summary['0']['status'] != 'running':
+                break
+            time.sleep(0.05)
+        self.assertEqual(summary['0']['status'], 'interrupted')
+        self.assertFalse('1' in summary)
+
+        # the batch continues from the checkpoint of the interrupted band
+        iteration = NEB.fromCheckpoint(self.batch().getCheckpointFilename(0)).getIteration()
+        self.assertTrue(iteration > 0)
+        summary = self.batch().run(iteration + 3, 1.0e-6, verbose=False)
+        for entry in summary.values():
+            self.assertEqual(entry['iterations'], iteration + 3)
+
+class TestBatchOrca(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.scratch = os.path.join(self.directory, "scratch")
+        self.times = os.path.join(self.directory, "times")
+        self.environ = dict(os.environ)
+        os.environ["FAKEORCA_TIMES"] = self.times
+        os.environ["FAKEORCA_DELAY"] = "0.05"
+        self.orca = OrcaEnergyAndGradient(executable=writeFakeOrca(self.directory), scratch=self.scratch,
+                                          maxjobs=2, pollinterval=0.01)
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def reactions(self):
+        reactions = []
+        for x in (0.0, 1.0, 2.0):
+            molecules = []
+            for dx in (0.0, 0.4):
+                m = neb.Molecule()
+                m.addAtoms(neb.Atom(1, xyz=[x + dx, 0.0, 0.0]), neb.Atom(8, xyz=[0.0, 0.0, 1.0]))
+                molecules.append(m)
+            reactions.append(molecules)
+        return reactions
+
+    def checkBands(self, func):
+        reactions = self.reactions()
+        batch = BatchNEB(reactions, func, SteepestDescent, os.path.join(self.directory, "batch"), nbeads=5)
+        summary = batch.run(3, 1.0e-6, verbose=False)
+        for index, (initial, final) in enumerate(reactions):
+            entry = summary[str(index)]
+            self.assertEqual(entry['status'], 'maxsteps')
+            for e, m in ((entry['energies'][0], initial), (entry['energies'][-1], final)):
+                self.assertAlmostEqual(e, (m.getCoordinates()**2).sum())
+
+        # the bands keep their orbitals apart
+        self.assertEqual(sorted(os.listdir(self.scratch)), ["band000", "band001", "band002"])
+        for band in os.listdir(self.scratch):
+            beads = sorted(os.listdir(os.path.join(self.scratch, band)))
+            self.assertEqual(beads, ["bead{0:03d}".format(i) for i in range(5)])
+
+        # the bands run no more than maxjobs jobs together
+        with open(self.times) as timesfile:
+            times = [map(float, line.split()) for line in timesfile]
+        self.assertEqual(len(times), 3 * (2 + 3*3))
+        self.assertTrue(max(sum(start <= t < end for start, end in times) for t, e in times) <= 2)
+
+    def testOrca(self):
+        self.checkBands(self.orca)
+
+    def testCachedOrca(self):
+        self.checkBands(CachedEnergyAndGradient(self.orca))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+""" Tests of the bond perception against comparing all pairs of atoms """
+import unittest
+
+import numpy
+
+import neb
+from neb.bond import Bond
+
+def bruteForceBonds(_mol):
+    """ Reference bond perception comparing all pairs of atoms """
+    bonds = []
+    for iat, atom1 in enumerate(_mol.getAtoms()):
+        for jat, atom2 in enumerate(_mol.getAtoms()):
+            if iat <= jat: continue
+            dr = atom2.getCoordinate() - atom1.getCoordinate()
+            R2 = dr.dot(dr)
+
+            dr_cov = atom1.getCovalentRadius() + atom2.getCovalentRadius() + _mol._bond_threshold
+            if R2 < dr_cov**2:
+                bonds.append(Bond(id1=iat, id2=jat))
+    return bonds
+
+def waterBox(n, density=0.0334):
+    """ Returns a cubic box of n randomly oriented water molecules """
+    random = numpy.random.RandomState(42)
+    ngrid = int(numpy.ceil(n**(1.0/3.0)))
+    spacing = (1.0/density)**(1.0/3.0)
+    atoms = []
+    for k in range(n):
+        center = spacing * numpy.array([k % ngrid, (k // ngrid) % ngrid, k // ngrid**2])
+        q, r = numpy.linalg.qr(random.randn(3, 3))
+        oh1 = q.dot([0.9572, 0.0, 0.0])
+        oh2 = q.dot([0.9572*numpy.cos(1.824), 0.9572*numpy.sin(1.824), 0.0])
+        atoms.append(neb.Atom(8, xyz=center))
+        atoms.append(neb.Atom(1, xyz=center + oh1))
+        atoms.append(neb.Atom(1, xyz=center + oh2))
+    _mol = neb.Molecule()
+    _mol.addAtoms(*atoms)
+    return _mol
+
+def randomCloud(n, length, seed):
+    """ Returns n atoms of mixed elements at random positions in a box """
+    random = numpy.random.RandomState(seed)
+    _mol = neb.Molecule()
+    _mol.addAtoms(*[neb.Atom(int(Z), xyz=xyz) for Z, xyz in zip(random.choice([1, 6, 7, 8, 16], n),
+                                                                length * (random.rand(n, 3) - 0.5))])
+    return _mol
+
+class TestBonds(unittest.TestCase):
+
+    def assertSameBonds(self, _mol):
+        bonds = list(_mol.percieveBonds())
+        self.assertEqual([repr(b) for b in bonds], [repr(b) for b in bruteForceBonds(_mol)])
+        return bonds
+
+    def testWaterBox(self):
+        bonds = self.assertSameBonds(waterBox(125))
+        self.assertEqual(len(bonds), 250)
+
+    def testRandomClouds(self):
+        # dense clouds have many bonds across the cells, also at negative coordinates
+        for seed, (n, length) in enumerate([(50, 6.0), (200, 10.0), (300, 30.0)]):
+            self.assertSameBonds(randomCloud(n, length, seed))
+
+    def testFlat(self):
+        # all atoms in a single plane and on a line
+        _mol = randomCloud(100, 12.0, 7)
+        c = _mol.getCoordinates()
+        c[:,2] = 0.0
+        _mol.setCoordinates(c)
+        self.assertSameBonds(_mol)
+        c[:,1] = 0.0
+        _mol.setCoordinates(c)
+        self.assertSameBonds(_mol)
+
+    def testSmall(self):
+        self.assertEqual(list(randomCloud(1, 1.0, 0).percieveBonds()), [])
+        _mol = neb.Molecule()
+        _mol.addAtoms(neb.Atom(1, xyz=[0.0, 0.0, 0.0]), neb.Atom(1, xyz=[0.74, 0.0, 0.0]))
+        self.assertEqual([b.getAtomIndices() for b in _mol.percieveBonds()], [(1, 0)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+""" Tests of the coordinate-keyed cache of energies and gradients """
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import neb
+from neb.methods import CachedEnergyAndGradient, LEPSEnergyAndGradient
+from neb.minimizers import SteepestDescent
+
+from helpers import lepsMolecule, lepsPath
+
+def plainLEPS(molecule):
+    """ The LEPS potential without the band method """
+    return LEPSEnergyAndGradient(molecule)
+
+class TestCache(unittest.TestCase):
+
+    def testHitsAndMisses(self):
+        cache = CachedEnergyAndGradient(plainLEPS)
+        m1 = lepsMolecule(0.8, 2.0)
+        m2 = lepsMolecule(2.0, 0.8)
+        e1, g1 = cache(m1)
+        cache(m2)
+        e, g = cache(neb.Molecule.fromMolecule(m1))
+        self.assertEqual((cache.getHits(), cache.getMisses()), (1, 2))
+        self.assertEqual(e, e1)
+        numpy.testing.assert_array_equal(g, g1)
+
+        # callers can not modify the cached gradient
+        g[:] = 0.0
+        numpy.testing.assert_array_equal(cache(m1)[1], g1)
+
+    def testRounding(self):
+        cache = CachedEnergyAndGradient(plainLEPS, decimals=4)
+        m = lepsMolecule(0.8, 2.0)
+        cache(m)
+        cache(neb.Molecule.fromMolecule(m, m.getCoordinates() + 1.0e-6))
+        cache(neb.Molecule.fromMolecule(m, m.getCoordinates() + 1.0e-3))
+        self.assertEqual((cache.getHits(), cache.getMisses()), (1, 2))
+
+    def testChargeAndMultiplicity(self):
+        cache = CachedEnergyAndGradient(plainLEPS)
+        m = lepsMolecule(0.8, 2.0)
+        cache(m)
+        m2 = neb.Molecule.fromMolecule(m)
+        m2.setMultiplicity(3)
+        cache(m2)
+        self.assertEqual(cache.getMisses(), 2)
+
+    def testEviction(self):
+        cache = CachedEnergyAndGradient(plainLEPS, maxsize=2)
+        molecules = [lepsMolecule(0.8 + 0.1*i, 2.0) for i in range(3)]
+        for m in molecules:
+            cache(m)
+        self.assertEqual(cache.getSize(), 2)
+        cache(molecules[2])
+        cache(molecules[0])
+        self.assertEqual((cache.getHits(), cache.getMisses()), (1, 4))
+
+    def testFile(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "leps.cache")
+            cache = CachedEnergyAndGradient(plainLEPS, filename=filename)
+            cache(lepsMolecule(0.8, 2.0))
+            cache.close()
+
+            cache = CachedEnergyAndGradient(plainLEPS, filename=filename)
+            cache(lepsMolecule(0.8, 2.0))
+            self.assertEqual((cache.getHits(), cache.getMisses()), (1, 0))
+            cache.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def testBand(self):
+        cache = CachedEnergyAndGradient(LEPSEnergyAndGradient)
+        template = lepsMolecule(0.8, 2.0)
+        c = numpy.array([lepsMolecule(0.8 + 0.1*i, 2.0).getCoordinates() for i in range(4)])
+        cache.bandEnergyAndGradient(template, c[:2])
+        energies, gradients = cache.bandEnergyAndGradient(template, c)
+        self.assertEqual((cache.getHits(), cache.getMisses()), (2, 4))
+        reference = LEPSEnergyAndGradient.bandEnergyAndGradient(template, c)
+        numpy.testing.assert_allclose(energies, reference[0])
+        numpy.testing.assert_allclose(gradients, reference[1])
+
+    def testPickle(self):
+        cache = CachedEnergyAndGradient(LEPSEnergyAndGradient)
+        m = lepsMolecule(0.8, 2.0)
+        cache(m)
+        copy = pickle.loads(pickle.dumps(cache, pickle.HIGHEST_PROTOCOL))
+        copy(m)
+        self.assertEqual(copy.getHits(), 1)
+        self.assertTrue(hasattr(copy, 'bandEnergyAndGradient'))
+
+    def testReset(self):
+        resets = []
+        class Resettable(object):
+            def __call__(self, molecule):
+                return LEPSEnergyAndGradient(molecule)
+            def reset(self, index=None):
+                resets.append(index)
+
+        cache = CachedEnergyAndGradient(Resettable())
+        m = lepsMolecule(0.8, 2.0)
+        cache(m)
+        cache.reset()
+        cache.reset(3)
+        self.assertEqual(resets, [None, 3])
+        cache(m)
+        self.assertEqual(cache.getHits(), 1)
+
+        # functions without a state to reset
+        CachedEnergyAndGradient(plainLEPS).reset()
+
+    def testForBand(self):
+        bands = []
+        class PerBand(object):
+            def __init__(self, index=None):
+                self.index = index
+            def __call__(self, molecule):
+                bands.append(self.index)
+                return LEPSEnergyAndGradient(molecule)
+            def forBand(self, index):
+                return PerBand(index)
+
+        cache = CachedEnergyAndGradient(PerBand())
+        band = cache.forBand(3)
+        m = lepsMolecule(0.8, 2.0)
+        band(m)
+        cache(m)
+        band(lepsMolecule(2.0, 0.8))
+        self.assertEqual(bands, [3, 3])
+        self.assertEqual((cache.getHits(), cache.getMisses()), (1, 2))
+
+        # functions without a state for every band
+        cache = CachedEnergyAndGradient(plainLEPS)
+        self.assertTrue(cache.forBand(3) is cache)
+
+    def testProcessExecutor(self):
+        cache = CachedEnergyAndGradient(plainLEPS)
+        n = neb.NEB(lepsPath(), 1.0, executor='process', nworkers=2)
+        try:
+            result = n.minimize(5, 0.01, cache, SteepestDescent(stepsize=0.01), verbose=False)
+        finally:
+            n.shutdown()
+        self.assertTrue(numpy.all(numpy.isfinite(result.getEnergies())))
+        self.assertTrue(numpy.any(result.getEnergies() != 0.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+""" Tests that a NEB continued from a checkpoint is the same as one that never stopped """
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import neb
+from neb.methods import LEPSEnergyAndGradient
+from neb.minimizers import FIRE, LBFGS
+
+from helpers import lepsPath
+
+class Interrupted(Exception):
+    pass
+
+class InterruptedLEPS(object):
+    """ The LEPS potential that raises after a number of evaluations """
+    def __init__(self, nevaluations):
+        self._nevaluations = nevaluations
+
+    def __call__(self, molecule):
+        self._nevaluations -= 1
+        if self._nevaluations < 0:
+            raise Interrupted()
+        return LEPSEnergyAndGradient(molecule)
+
+class TestCheckpoint(unittest.TestCase):
+    NSTEPS = 30
+    KWARGS = dict(climb=True, climbiter=15, freezetol=0.05)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.directory, "neb.npz")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def reference(self, minimizer):
+        n = neb.NEB(lepsPath(), 1.0, **self.KWARGS)
+        n.minimize(self.NSTEPS, 1.0e-6, LEPSEnergyAndGradient, minimizer(), verbose=False)
+        return n
+
+    def assertSameBand(self, n, reference, nrepeated=0):
+        self.assertEqual(n.getIteration(), reference.getIteration())
+        self.assertEqual(n.getNumEvaluations(), reference.getNumEvaluations() + nrepeated)
+        state, expected = n.getState(), reference.getState()
+        for key in ('coordinates', 'energies', 'gradients', 'frozen'):
+            numpy.testing.assert_array_equal(state[key], expected[key])
+
+    def continued(self, minimizer):
+        m = minimizer()
+        n = neb.NEB.fromCheckpoint(self.checkpoint, m)
+        n.minimize(self.NSTEPS - n.getIteration(), 1.0e-6, LEPSEnergyAndGradient, m, verbose=False)
+        return n
+
+    def checkStopped(self, minimizer):
+        # the checkpoint written when the minimization ends
+        n = neb.NEB(lepsPath(), 1.0, **self.KWARGS)
+        n.minimize(12, 1.0e-6, LEPSEnergyAndGradient, minimizer(), verbose=False, checkpoint=self.checkpoint)
+        self.assertSameBand(self.continued(minimizer), self.reference(minimizer))
+
+    def checkInterrupted(self, minimizer):
+        # the last checkpoint written before the minimization died
+        n = neb.NEB(lepsPath(), 1.0, **self.KWARGS)
+        self.assertRaises(Interrupted, n.minimize, self.NSTEPS, 1.0e-6, InterruptedLEPS(100), minimizer(),
+                          verbose=False, checkpoint=self.checkpoint, checkpointiter=4)
+        stopped = neb.NEB.fromCheckpoint(self.checkpoint)
+        self.assertEqual(stopped.getIteration() % 4, 3)
+
+        # the iteration of the checkpoint is evaluated again
+        nrepeated = numpy.sum(~stopped.getState()['frozen'][1:-1])
+        self.assertSameBand(self.continued(minimizer), self.reference(minimizer), nrepeated)
+
+    def testFIREStopped(self):
+        self.checkStopped(FIRE)
+
+    def testFIREInterrupted(self):
+        self.checkInterrupted(FIRE)
+
+    def testLBFGSStopped(self):
+        self.checkStopped(LBFGS)
+
+    def testLBFGSInterrupted(self):
+        self.checkInterrupted(LBFGS)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+""" Tests of the image dependent pair potential (IDPP) interpolation """
+import unittest
+
+import numpy
+
+import neb
+from neb.interpolate import IDPP, Linear
+from neb.interpolate.idpp import IDPPObjective
+
+def molecule(coordinates, z=6):
+    m = neb.Molecule()
+    m.addAtoms(*[neb.Atom(z, xyz=c) for c in coordinates])
+    return m
+
+def distances(c):
+    """ Returns the distances between all pairs of atoms of each bead """
+    i, j = numpy.triu_indices(numpy.shape(c)[1], 1)
+    return numpy.sqrt(numpy.sum((c[:,i] - c[:,j])**2, axis=2))
+
+def rotated(c, angle):
+    ca, sa = numpy.cos(angle), numpy.sin(angle)
+    return numpy.dot(c, [[ca, sa, 0.0], [-sa, ca, 0.0], [0.0, 0.0, 1.0]])
+
+class TestIDPP(unittest.TestCase):
+
+    def testGradient(self):
+        random = numpy.random.RandomState(0)
+        initial = molecule(random.randn(4, 3))
+        final = molecule(random.randn(4, 3))
+        objective = IDPPObjective(initial, final, 7)
+        c = random.randn(3, 4, 3)
+        indices = [1, 3, 5]
+        energies, gradients = objective.bandEnergyAndGradient(initial, c, indices)
+        h = 1.0e-6
+        numerical = numpy.zeros(numpy.shape(c))
+        for index in numpy.ndindex(4, 3):
+            dx = numpy.zeros(numpy.shape(c))
+            dx[(slice(None),) + index] = h
+            ep = objective.bandEnergyAndGradient(initial, c + dx, indices)[0]
+            em = objective.bandEnergyAndGradient(initial, c - dx, indices)[0]
+            numerical[(slice(None),) + index] = (ep - em) / (2.0*h)
+        numpy.testing.assert_allclose(gradients, numerical, rtol=1.0e-5, atol=1.0e-8)
+
+    def testTargets(self):
+        # the endpoints have the lowest possible objective
+        random = numpy.random.RandomState(1)
+        initial = molecule(random.randn(4, 3))
+        final = molecule(random.randn(4, 3))
+        objective = IDPPObjective(initial, final, 5)
+        c = numpy.array([initial.getCoordinates(), final.getCoordinates()])
+        energies, gradients = objective.bandEnergyAndGradient(initial, c, [0, 4])
+        numpy.testing.assert_allclose(energies, 0.0, atol=1.0e-12)
+        numpy.testing.assert_allclose(gradients, 0.0, atol=1.0e-12)
+
+    def testCloserToInterpolatedDistances(self):
+        # turning the molecule half way around squeezes the atoms of
+        # the linear path together in the middle of the path
+        c = numpy.array([[0.0, 0.0, 0.0], [1.5, 0.0, 0.0], [-0.5, 1.4, 0.0], [-0.5, -0.7, 1.2]])
+        initial = molecule(c)
+        final = molecule(rotated(c, numpy.radians(160.0)) + [0.2, 0.1, 0.0])
+        nbeads = 9
+
+        linear = Linear(initial, final, nbeads)
+        idpp = IDPP(initial, final, nbeads)
+        self.assertTrue(idpp.isConverged())
+
+        d0 = distances(initial.getCoordinates()[numpy.newaxis])
+        dn = distances(final.getCoordinates()[numpy.newaxis])
+        f = numpy.linspace(0.0, 1.0, nbeads)[:,numpy.newaxis]
+        target = d0 + f * (dn - d0)
+
+        deviations = []
+        for path in (linear, idpp):
+            c = numpy.array([bead.getCoordinates() for bead in path])
+            d = distances(c)
+            numpy.testing.assert_array_equal(c[[0, -1]], [initial.getCoordinates(), final.getCoordinates()])
+            deviations.append(numpy.sqrt(numpy.mean((d - target)**2)))
+        self.assertTrue(deviations[1] < 0.25 * deviations[0])
+
+        # no atoms pass close to each other
+        self.assertTrue(numpy.min(distances(numpy.array([bead.getCoordinates() for bead in idpp]))) > 0.9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+""" Tests of reading and writing XYZ files """
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from neb.io import readXYZ, moleculeFromXYZ, pathFromXYZ, XYZFrames, XYZWriter
+
+from helpers import lepsPath
+
+WATER = """3
+water
+O   0.000000000   0.000000000   0.117300000
+h   0.000000000   0.757200000  -0.469200000
+H   0.000000000  -0.757200000  -0.469200000"""
+
+class TestXYZ(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "frames.xyz")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, text):
+        with open(self.filename, 'w') as f:
+            f.write(text)
+
+    def writePath(self):
+        path = lepsPath(5)
+        with XYZWriter(self.filename, append=False) as writer:
+            writer.writePath(path, comments=["bead {0:d}".format(i) for i in range(5)])
+        return path
+
+    def assertSameMolecule(self, m1, m2):
+        numpy.testing.assert_array_equal(m1.getNuclearCharges(), m2.getNuclearCharges())
+        numpy.testing.assert_allclose(m1.getCoordinates(), m2.getCoordinates(), atol=1.0e-9)
+
+    def testRoundTrip(self):
+        path = self.writePath()
+        frames = list(readXYZ(self.filename))
+        self.assertEqual(len(frames), 5)
+        for i, (bead, frame) in enumerate(zip(path, frames)):
+            self.assertSameMolecule(bead, frame)
+            self.assertEqual(frame.getName(), "bead {0:d}".format(i))
+
+        self.assertEqual(pathFromXYZ(self.filename).getNumBeads(), 5)
+        self.assertSameMolecule(moleculeFromXYZ(self.filename), path[0])
+
+    def testFrames(self):
+        path = self.writePath()
+        with XYZFrames(self.filename) as frames:
+            self.assertEqual(len(frames), 5)
+            self.assertSameMolecule(frames[-1], path[4])
+            self.assertSameMolecule(frames[1], path[1])
+            self.assertEqual(frames[2].getName(), "bead 2")
+            self.assertRaises(IndexError, frames.__getitem__, 5)
+            self.assertEqual(frames.getPath([0, 4]).getNumBeads(), 2)
+
+    def testAppend(self):
+        path = self.writePath()
+        with XYZWriter(self.filename) as writer:
+            writer.writeMolecule(path[2], "appended")
+        with XYZFrames(self.filename) as frames:
+            self.assertEqual(len(frames), 6)
+            self.assertEqual(frames[-1].getName(), "appended")
+
+    def testNoTrailingNewline(self):
+        self.write(WATER + "\n" + WATER)
+        self.assertEqual(len(list(readXYZ(self.filename))), 2)
+        with XYZFrames(self.filename) as frames:
+            self.assertEqual(len(frames), 2)
+            m = frames[-1]
+        numpy.testing.assert_array_equal(m.getNuclearCharges(), [8, 1, 1])
+        self.assertAlmostEqual(m.getCoordinates()[2][1], -0.7572)
+
+    def testIncomplete(self):
+        self.write(WATER + "\n" + "\n".join(WATER.splitlines()[:-1]) + "\n")
+        self.assertRaises(ValueError, XYZFrames, self.filename)
+        self.assertRaises(ValueError, list, readXYZ(self.filename))
+
+    def testEmpty(self):
+        self.write("")
+        with XYZFrames(self.filename) as frames:
+            self.assertEqual(len(frames), 0)
+        self.assertRaises(ValueError, moleculeFromXYZ, self.filename)
+
+if __name__ == '__main__':
+    unittest.main()
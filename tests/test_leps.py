@@ -0,0 +1,127 @@
+""" Tests of the vectorized LEPS potential against the original implementation """
+import unittest
+
+import numpy
+
+import neb
+from neb.methods import LEPSEnergyAndGradient
+from neb.methods.leps import LEPSSurface, VLeps, VLepsBatch
+
+from helpers import lepsMolecule
+
+def scalarVLeps(molecule):
+    """ Reference LEPS potential: the original implementation for a single molecule """
+
+    def Q(r,d,dr):
+        alpha = 1.942
+        value = alpha * (r - 0.742)
+        energy_factor = 1.5 * numpy.exp(-2.0*value) - numpy.exp(-value)
+        gradient_factor = alpha*dr/r*(-3.0*numpy.exp(-2.0*value) + numpy.exp(-value))
+        return 0.5*d*energy_factor, 0.5*d*gradient_factor
+
+    def J(r,d,dr):
+        alpha = 1.942
+        value = alpha * (r - 0.742)
+        energy_factor = numpy.exp(-2.0*value) - 6.0*numpy.exp(-value)
+        gradient_factor = alpha*dr/r*(6.0*numpy.exp(-value) - 2.0*numpy.exp(-2.0*value))
+        return 0.25*d*energy_factor, 0.25*d*gradient_factor
+
+    c = molecule.getCoordinates()
+    drab = c[1]-c[0]
+    drbc = c[2]-c[1]
+    drac = c[2]-c[0]
+
+    rab = numpy.linalg.norm(drab)
+    rbc = numpy.linalg.norm(drbc)
+    rac = numpy.linalg.norm(drac)
+
+    opai = 1.0 / (1.0 + 0.05)
+    opbi = 1.0 / (1.0 + 0.30)
+    opci = 1.0 / (1.0 + 0.05)
+    opai2 = opai*opai
+    opbi2 = opbi*opbi
+    opci2 = opci*opci
+
+    dab = 4.476
+    dbc = 4.476
+    dac = 3.445
+
+    qab, gqab = Q(rab, dab, drab)
+    qbc, gqbc = Q(rbc, dbc, drbc)
+    qac, gqac = Q(rac, dac, drac)
+
+    qvalue = qab*opai + qbc*opbi + qac*opci
+    qgrad = gqab*opai + gqbc*opbi + gqac*opci
+
+    jab, gjab = J(rab, dab, drab)
+    jbc, gjbc = J(rbc, dbc, drbc)
+    jac, gjac = J(rac, dac, drac)
+
+    jvalue  = jab*jab*opai2
+    jvalue += jbc*jbc*opbi2
+    jvalue += jac*jac*opci2
+    jvalue -= jab*jbc*opai*opbi
+    jvalue -= jbc*jac*opbi*opci
+    jvalue -= jab*jac*opai*opci
+
+    qgrad = numpy.zeros((3,3))
+    jgrad = numpy.zeros((3,3))
+
+    qgrad[0,:] = gqab*opai + gqac*opci
+    qgrad[1,:] = gqbc*opbi - gqab*opai
+    qgrad[2,:] =-gqbc*opbi - gqac*opci
+
+    djab = gjab*opai*(2*jab*opai - jac*opci - jbc*opbi)
+    djbc = gjbc*opbi*(2*jbc*opbi - jab*opai - jac*opci)
+    djac = gjac*opci*(2*jac*opci - jbc*opbi - jab*opai)
+    jgrad[0,:] =  djab + djac
+    jgrad[1,:] =  djbc - djab
+    jgrad[2,:] = -djbc - djac
+
+    return rab, rbc, qvalue - numpy.sqrt(jvalue), -(qgrad - 0.5/numpy.sqrt(jvalue)*jgrad)
+
+def randomGeometries(n, seed):
+    """ Returns n geometries of the three atoms with distances between about 0.5 and 4 """
+    random = numpy.random.RandomState(seed)
+    c = numpy.zeros((n, 3, 3))
+    c[:,0] = random.uniform(0.5, 3.0, (n, 3))
+    c[:,2] = random.uniform(-3.0, 3.0, (n, 3))
+    return c
+
+def molecules(coordinates):
+    template = lepsMolecule(1.0, 1.0)
+    return [neb.Molecule.fromMolecule(template, c) for c in coordinates]
+
+class TestLEPS(unittest.TestCase):
+
+    def assertSameResults(self, results, references):
+        for value, expected in zip(results, references):
+            numpy.testing.assert_allclose(value, expected, rtol=1.0e-12, atol=1.0e-12)
+
+    def testBatch(self):
+        c = randomGeometries(50, 0)
+        references = zip(*[scalarVLeps(m) for m in molecules(c)])
+        self.assertSameResults(VLepsBatch(c), references)
+        self.assertSameResults(LEPSEnergyAndGradient.bandEnergyAndGradient(None, c), references[2:])
+
+    def testSingleGeometry(self):
+        for m in molecules(randomGeometries(10, 1)):
+            reference = scalarVLeps(m)
+            self.assertSameResults(VLeps(m), reference)
+            self.assertSameResults(LEPSEnergyAndGradient(m), reference[2:])
+
+    def testSurface(self):
+        rab = numpy.linspace(0.5, 3.0, 7)
+        rbc = numpy.linspace(0.6, 3.5, 5)
+        for angle in (90.0, 120.0):
+            theta = numpy.radians(angle)
+            reference = numpy.zeros((len(rab), len(rbc)))
+            for ia, xa in enumerate(rab):
+                for ic, xc in enumerate(rbc):
+                    m = lepsMolecule(xa, 0.0)
+                    m.setCoordinates(numpy.array([[xa, 0.0, 0.0], [0.0, 0.0, 0.0], [xc*numpy.cos(theta), xc*numpy.sin(theta), 0.0]]))
+                    reference[ia,ic] = scalarVLeps(m)[2]
+            numpy.testing.assert_allclose(LEPSSurface(rab, rbc, angle), reference, rtol=1.0e-12)
+
+if __name__ == '__main__':
+    unittest.main()
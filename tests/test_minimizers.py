@@ -0,0 +1,77 @@
+""" Tests of the band minimizers on the LEPS band of example.py """
+import unittest
+
+import numpy
+
+import neb
+from neb.methods import LEPSEnergyAndGradient
+from neb.minimizers import FIRE, LBFGS, QuickMin, SteepestDescent
+
+from helpers import lepsEndpoints, lepsPath
+
+MINIMIZERS = (FIRE, LBFGS, QuickMin)
+
+class TestDefaults(unittest.TestCase):
+    """ The default settings must converge the band without pulling it apart """
+
+    def setUp(self):
+        self.product = LEPSEnergyAndGradient(lepsEndpoints()[1])[0]
+
+    def check(self, nbeads, opttol, climb=False):
+        for minimizer in MINIMIZERS:
+            n = neb.NEB(lepsPath(nbeads), 1.0, climb=climb)
+            result = n.minimize(1000, opttol, LEPSEnergyAndGradient, minimizer(), verbose=False)
+            emax = numpy.max(result.getEnergies()[1:-1])
+            self.assertTrue(result.isConverged(), minimizer.__name__)
+            # the band still crosses the barrier
+            self.assertTrue(self.product < emax < -2.9, "{0:s} {1:f}".format(minimizer.__name__, emax))
+            if climb:
+                self.assertAlmostEqual(emax, -2.981, 2)
+
+    def testTenBeads(self):
+        self.check(10, 0.05)
+
+    def testTenBeadsTight(self):
+        self.check(10, 0.01)
+
+    def testExample(self):
+        self.check(20, 0.05)
+
+    def testClimb(self):
+        self.check(10, 0.01, climb=True)
+
+class TestFrozen(unittest.TestCase):
+    """ Frozen beads must not leave traces in the state of the minimizers """
+
+    def setUp(self):
+        numpy.random.seed(7)
+        self.forces = [numpy.random.randn(4, 3, 3) * 0.1 for k in range(3)]
+        self.frozen = numpy.array([False, True, False, False])
+
+    def testNoDisplacement(self):
+        for minimizer in MINIMIZERS + (SteepestDescent,):
+            m = minimizer()
+            for F in self.forces:
+                dR = m.stepBand(numpy.zeros(4), F, self.frozen)
+                self.assertTrue(numpy.all(dR[1] == 0.0), minimizer.__name__)
+
+    def testVelocities(self):
+        for minimizer in (FIRE, QuickMin):
+            m = minimizer()
+            m.stepBand(numpy.zeros(4), self.forces[0])
+            m.stepBand(numpy.zeros(4), self.forces[1], self.frozen)
+            self.assertTrue(numpy.all(m.getState()['v'][1] == 0.0), minimizer.__name__)
+
+    def testLBFGSMemory(self):
+        m = LBFGS()
+        m.stepBand(numpy.zeros(4), self.forces[0], self.frozen)
+        self.assertTrue(numpy.all(m.getState()['dr'][1] == 0.0))
+
+        # the memory only holds steps that were taken with the same frozen beads
+        m.stepBand(numpy.zeros(4), self.forces[0] * 0.5, self.frozen)
+        self.assertEqual(len(m.getState()['s']), 1)
+        m.stepBand(numpy.zeros(4), self.forces[0] * 0.25)
+        self.assertEqual(len(m.getState()['s']), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+""" Tests of the convergence control of NEB.minimize """
+import unittest
+
+import numpy
+
+import neb
+from neb.methods import LEPSEnergyAndGradient
+from neb.minimizers import SteepestDescent
+
+from helpers import lepsPath
+
+def nanLEPS(molecule):
+    """ The LEPS potential that breaks down into NaN """
+    e, g = LEPSEnergyAndGradient(molecule)
+    return float('nan'), g * float('nan')
+
+class TestMinimize(unittest.TestCase):
+
+    def testIterations(self):
+        n = neb.NEB(lepsPath(), 1.0)
+        result = n.minimize(7, 1.0e-6, LEPSEnergyAndGradient, SteepestDescent(stepsize=0.01), verbose=False)
+        self.assertEqual(result.getReason(), neb.MinimizationResult.MAXSTEPS)
+        self.assertEqual(result.getIterations(), 7)
+        self.assertEqual(n.getIteration(), 7)
+        self.assertEqual(n.getNumEvaluations(), 2 + 7*8)
+
+        n.minimize(3, 1.0e-6, LEPSEnergyAndGradient, SteepestDescent(stepsize=0.01), verbose=False)
+        self.assertEqual(n.getIteration(), 10)
+
+    def testConverged(self):
+        n = neb.NEB(lepsPath(), 1.0)
+        result = n.minimize(2000, 0.05, LEPSEnergyAndGradient, SteepestDescent(stepsize=0.01), verbose=False)
+        self.assertTrue(result.isConverged())
+        self.assertTrue(numpy.all(result.getRMSForces()[1:-1] < 0.05))
+        iterations = result.getIterations()
+        self.assertTrue(iterations < 2000)
+        self.assertEqual(n.getIteration(), iterations)
+
+        # the converged band converges again in the next iteration
+        result = n.minimize(10, 0.05, LEPSEnergyAndGradient, SteepestDescent(stepsize=0.01), verbose=False)
+        self.assertTrue(result.isConverged())
+        self.assertEqual(result.getIterations(), 1)
+        self.assertEqual(n.getIteration(), iterations + 1)
+
+    def testMaxForce(self):
+        n = neb.NEB(lepsPath(), 1.0)
+        result = n.minimize(2000, None, LEPSEnergyAndGradient, SteepestDescent(stepsize=0.01), maxforce=0.05, verbose=False)
+        self.assertTrue(result.isConverged())
+        self.assertTrue(result.getMaxForce() < 0.05)
+
+    def testEnergyTolerance(self):
+        n = neb.NEB(lepsPath(), 1.0)
+        result = n.minimize(2000, None, LEPSEnergyAndGradient, SteepestDescent(stepsize=0.01), energytol=1.0e-4, verbose=False)
+        self.assertTrue(result.isConverged())
+        self.assertTrue(result.getIterations() > 1)
+
+    def testNoCriteria(self):
+        n = neb.NEB(lepsPath(), 1.0)
+        result = n.minimize(5, None, LEPSEnergyAndGradient, SteepestDescent(stepsize=0.01), verbose=False)
+        self.assertFalse(result.isConverged())
+
+    def testNaN(self):
+        n = neb.NEB(lepsPath(), 1.0)
+        with numpy.errstate(invalid='ignore'):
+            result = n.minimize(10, 0.05, nanLEPS, SteepestDescent(stepsize=0.01), maxforce=0.05, energytol=1.0, verbose=False)
+        self.assertFalse(result.isConverged())
+        self.assertEqual(result.getReason(), neb.MinimizationResult.DIVERGED)
+        self.assertEqual(result.getIterations(), 1)
+        self.assertEqual(n.getIteration(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+""" Tests of the ORCA backend with a fake orca executable (see helpers) """
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import neb
+from neb import util
+from neb.interpolate import Linear
+from neb.methods import CachedEnergyAndGradient, OrcaEnergyAndGradient
+from neb.minimizers import SteepestDescent
+
+from helpers import writeFakeOrca
+
+def makeBeads(nbeads):
+    beads = []
+    for i in range(nbeads):
+        m = neb.Molecule()
+        m.addAtoms(neb.Atom(1, xyz=[0.1*i, 0.0, 0.0]), neb.Atom(8, xyz=[0.0, 0.0, 1.0]))
+        beads.append(m)
+    return beads
+
+class TestOrca(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.executable = writeFakeOrca(self.directory)
+        self.scratch = os.path.join(self.directory, "scratch")
+        self.log = os.path.join(self.directory, "log")
+        self.environ = dict(os.environ)
+        os.environ["FAKEORCA_LOG"] = self.log
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def orca(self, **kwargs):
+        return OrcaEnergyAndGradient(executable=self.executable, scratch=self.scratch, pollinterval=0.01, **kwargs)
+
+    def readLog(self):
+        with open(self.log) as log:
+            return [line.split() for line in log]
+
+    def testEnergyAndGradient(self):
+        bead = makeBeads(3)[2]
+        energy, gradient = self.orca()(bead)
+        c = bead.getCoordinates()
+        self.assertAlmostEqual(energy, numpy.sum(c*c))
+        numpy.testing.assert_allclose(gradient, 2.0 * c * util.aa2au)
+
+    def testScratchDirectories(self):
+        beads = makeBeads(4)
+        results = self.orca(maxjobs=2).evaluate(beads)
+        self.assertEqual([numpy.sum(b.getCoordinates()**2) for b in beads], [round(e, 8) for e, g in results])
+        self.assertEqual(sorted(os.listdir(self.scratch)), ["bead000", "bead001", "bead002", "bead003"])
+        # only the orbitals are kept
+        self.assertEqual(os.listdir(os.path.join(self.scratch, "bead001")), ["guess.gbw"])
+
+    def testMORead(self):
+        orca = self.orca()
+        beads = makeBeads(2)
+        orca.evaluate(beads)
+        orca.evaluate(beads)
+        self.assertEqual(sorted(self.readLog()), [["bead000", "0", "0"], ["bead000", "1", "1"],
+                                                  ["bead001", "0", "0"], ["bead001", "1", "1"]])
+
+        orca.reset(1)
+        orca.evaluate(beads)
+        self.assertEqual(sorted(self.readLog()[4:]), [["bead000", "1", "1"], ["bead001", "0", "0"]])
+
+    def testNoWarmStart(self):
+        orca = self.orca(warmstart=False)
+        orca.evaluate(makeBeads(2))
+        orca.evaluate(makeBeads(2))
+        self.assertTrue(all(moread == "0" for d, moread, guess in self.readLog()))
+
+    def testEvictBeadsBeyondBand(self):
+        orca = self.orca()
+        orca.evaluate(makeBeads(3))
+        orca.evaluate(makeBeads(2))
+        self.assertEqual(sorted(os.listdir(self.scratch)), ["bead000", "bead001"])
+
+    def testTimeout(self):
+        os.environ["FAKEORCA_DELAY"] = "5.0"
+        self.assertRaises(RuntimeError, self.orca(timeout=0.2), makeBeads(1)[0])
+
+    def testRetries(self):
+        os.environ["FAKEORCA_FAILONCE"] = "1"
+        self.assertRaises(RuntimeError, self.orca().evaluate, makeBeads(2))
+        shutil.rmtree(self.scratch)
+        nruns = len(self.readLog())
+        results = self.orca(retries=1).evaluate(makeBeads(2))
+        self.assertEqual(len(results), 2)
+        self.assertEqual(len(self.readLog()) - nruns, 4)
+
+    def testMissingExecutable(self):
+        orca = OrcaEnergyAndGradient(executable=os.path.join(self.directory, "missing"), scratch=self.scratch)
+        self.assertRaises(OSError, orca.evaluate, makeBeads(1))
+
+    def legacyEnvironment(self):
+        """ Runs the fake executable as orca from the default scratch folder """
+        shutil.copy(self.executable, os.path.join(self.directory, "orca"))
+        os.environ["PATH"] = self.directory + os.pathsep + os.environ.get("PATH", "")
+        os.chdir(self.directory)
+
+    def testFunctionCall(self):
+        # the backend used to be a function that is called with the bead
+        cwd = os.getcwd()
+        try:
+            self.legacyEnvironment()
+            bead = makeBeads(2)[1]
+            energy, gradient = OrcaEnergyAndGradient(bead)
+        finally:
+            os.chdir(cwd)
+        self.assertAlmostEqual(energy, numpy.sum(bead.getCoordinates()**2))
+
+    def testFunctionCallNEB(self):
+        # the class is called for every bead instead of using its band method
+        beads = makeBeads(5)
+        cwd = os.getcwd()
+        try:
+            self.legacyEnvironment()
+            n = neb.NEB(Linear(beads[0], beads[4], 5), 1.0)
+            c = n.getBandCoordinates()
+            result = n.minimize(1, 1.0e-6, OrcaEnergyAndGradient, SteepestDescent(), verbose=False)
+
+            # the band is changed so the cache is reset
+            cache = CachedEnergyAndGradient(OrcaEnergyAndGradient)
+            m = neb.NEB(Linear(beads[0], beads[4], 5), 1.0, reparametrizeiter=1)
+            m.minimize(2, 1.0e-6, cache, SteepestDescent(), verbose=False)
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(n.getNumEvaluations(), 2 + 3)
+        numpy.testing.assert_allclose(result.getEnergies(), numpy.sum(numpy.reshape(c*c, (5, -1)), axis=1), atol=1.0e-6)
+        self.assertEqual(cache.getMisses(), 2 + 2*3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+""" Tests of the refinement of saddle points with the dimer method """
+import unittest
+
+import numpy
+
+import neb
+from neb.align import projectRigidBody
+from neb.methods import LEPSEnergyAndGradient
+from neb.minimizers import FIRE
+from neb.saddle import Dimer
+
+from helpers import lepsEndpoints, lepsPath
+
+# the saddle point of the LEPS potential between the endpoints
+SADDLE = -2.9805
+
+class TestDimer(unittest.TestCase):
+
+    def assertSaddle(self, result):
+        self.assertTrue(result.isConverged())
+        self.assertAlmostEqual(result.getEnergy(), SADDLE, places=3)
+        self.assertTrue(result.getCurvature() < -1.0)
+
+    def testFromBand(self):
+        for nbeads, nsteps in ((8, 20), (10, 50)):
+            n = neb.NEB(lepsPath(nbeads), 1.0)
+            n.minimize(nsteps, 0.05, LEPSEnergyAndGradient, FIRE(), verbose=False)
+            dimer = Dimer.fromNEB(n, LEPSEnergyAndGradient)
+            self.assertSaddle(dimer.minimize(200, 1.0e-3, verbose=False))
+
+    def testLeavesMinimum(self):
+        # rotations of the molecule have (almost) zero curvature which is
+        # the lowest curvature at a minimum. The dimer must not rotate into
+        # them and take the minimum for a saddle point.
+        m1, m2 = lepsEndpoints()
+        for seed in range(2):
+            mode = numpy.random.RandomState(seed).randn(3, 3)
+            dimer = Dimer(m2, mode, LEPSEnergyAndGradient)
+            result = dimer.minimize(200, 1.0e-3, verbose=False)
+            self.assertTrue(result.isConverged())
+            self.assertTrue(result.getCurvature() < -1.0)
+            self.assertTrue(result.getEnergy() > LEPSEnergyAndGradient(m2)[0] + 0.4)
+
+    def testRigidBody(self):
+        m1, m2 = lepsEndpoints()
+        c = m2.getCoordinates()
+        rotation = numpy.cross([0.0, 0.0, 1.0], c - numpy.mean(c, axis=0))
+        self.assertRaises(AssertionError, Dimer, m2, rotation, LEPSEnergyAndGradient)
+
+        mode = rotation + numpy.random.RandomState(0).randn(3, 3)
+        dimer = Dimer(m2, mode, LEPSEnergyAndGradient)
+        dimer.minimize(3, 1.0e-3, verbose=False)
+        N = dimer.getMode()
+        c = dimer.getMolecule().getCoordinates()
+        numpy.testing.assert_allclose(projectRigidBody(c[numpy.newaxis], N[numpy.newaxis])[0], N, atol=1.0e-10)
+
+        # model potentials that are not invariant keep the full mode
+        dimer = Dimer(m2, rotation, LEPSEnergyAndGradient, rigid=False)
+        numpy.testing.assert_allclose(dimer.getMode(), rotation / numpy.linalg.norm(rotation))
+
+if __name__ == '__main__':
+    unittest.main()
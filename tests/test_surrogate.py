@@ -0,0 +1,93 @@
+""" Tests of the Gaussian process surrogate and the NEB minimized on it """
+import unittest
+
+import numpy
+
+import neb
+from neb.methods import LEPSEnergyAndGradient
+from neb.methods.leps import VLepsBatch
+from neb.minimizers import FIRE
+from neb.surrogate import GaussianProcess, SurrogateNEB
+
+from helpers import lepsPath
+
+def lepsObservations(n, seed):
+    """ Returns n geometries near the LEPS band with their energies and gradients """
+    c = numpy.array([bead.getCoordinates() for bead in lepsPath(n)])
+    c += 0.05 * numpy.random.RandomState(seed).randn(*numpy.shape(c))
+    rab, rbc, energies, gradients = VLepsBatch(c)
+    return c, energies, gradients
+
+def rotate(coordinates, angle):
+    c, s = numpy.cos(angle), numpy.sin(angle)
+    R = numpy.array([[c, -s, 0.0], [s, c, 0.0], [0.0, 0.0, 1.0]])
+    return numpy.einsum('nia,ba->nib', coordinates, R) + 1.0
+
+class TestGaussianProcess(unittest.TestCase):
+    DESCRIPTORS = (('inverse', 0.2), ('cartesian', 0.5))
+
+    def testObservations(self):
+        c, energies, gradients = lepsObservations(10, 0)
+        for descriptor, lengthscale in self.DESCRIPTORS:
+            gp = GaussianProcess(lengthscale=lengthscale, descriptor=descriptor)
+            gp.addObservations(c, energies, gradients)
+            e, g, variances = gp.predict(c)
+            numpy.testing.assert_allclose(e, energies, atol=1.0e-4)
+            numpy.testing.assert_allclose(g, gradients, atol=1.0e-4)
+            self.assertTrue(numpy.all(variances < 1.0e-6))
+
+    def testAddObservations(self):
+        # the factor extended one observation at a time is the factor of all
+        c, energies, gradients = lepsObservations(10, 0)
+        x = lepsObservations(10, 1)[0]
+        for descriptor, lengthscale in self.DESCRIPTORS:
+            gp = GaussianProcess(lengthscale=lengthscale, descriptor=descriptor)
+            gp.addObservations(c, energies, gradients)
+            incremental = GaussianProcess(lengthscale=lengthscale, descriptor=descriptor)
+            for k in range(0, 10, 3):
+                incremental.addObservations(c[k:k+3], energies[k:k+3], gradients[k:k+3])
+            self.assertEqual(incremental.getNumObservations(), 10)
+            for value, expected in zip(incremental.predict(x), gp.predict(x)):
+                numpy.testing.assert_allclose(value, expected, rtol=1.0e-6, atol=1.0e-8)
+
+    def testGradients(self):
+        c, energies, gradients = lepsObservations(10, 0)
+        x = lepsObservations(10, 1)[0]
+        h = 1.0e-5
+        for descriptor, lengthscale in self.DESCRIPTORS:
+            gp = GaussianProcess(lengthscale=lengthscale, descriptor=descriptor)
+            gp.addObservations(c, energies, gradients)
+            e, g, variances = gp.predict(x, variances=False)
+            self.assertTrue(variances is None)
+            numerical = numpy.zeros(numpy.shape(x))
+            for index in numpy.ndindex(*numpy.shape(x)[1:]):
+                dx = numpy.zeros(numpy.shape(x))
+                dx[(slice(None),) + index] = h
+                numerical[(slice(None),) + index] = (gp.predict(x + dx)[0] - gp.predict(x - dx)[0]) / (2*h)
+            numpy.testing.assert_allclose(g, numerical, atol=1.0e-5)
+
+    def testInvariance(self):
+        c, energies, gradients = lepsObservations(10, 0)
+        x = lepsObservations(10, 1)[0]
+        gp = GaussianProcess(lengthscale=0.2)
+        gp.addObservations(c, energies, gradients)
+        for value, expected in zip(gp.predict(rotate(x, 0.7))[::2], gp.predict(x)[::2]):
+            numpy.testing.assert_allclose(value, expected, atol=1.0e-10)
+
+    def testDescriptor(self):
+        self.assertRaises(ValueError, GaussianProcess, descriptor='distances')
+
+class TestSurrogateNEB(unittest.TestCase):
+
+    def testLEPS(self):
+        n = neb.NEB(lepsPath(), 1.0, climb=True)
+        surrogate = SurrogateNEB(n)
+        result = surrogate.minimize(40, 0.01, LEPSEnergyAndGradient, FIRE(), verbose=False)
+        self.assertTrue(result.isConverged())
+        self.assertTrue(numpy.max(result.getRMSForces()[1:-1]) < 0.01)
+        self.assertAlmostEqual(numpy.max(result.getEnergies()), -2.9805, places=3)
+        # the band minimized with the real function takes almost 2000
+        self.assertTrue(surrogate.getNumEvaluations() < 60)
+
+if __name__ == '__main__':
+    unittest.main()
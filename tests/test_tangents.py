@@ -0,0 +1,106 @@
+""" Tests of the improved tangent and the variable springs """
+import unittest
+
+import numpy
+
+import neb
+from neb.interpolate import Restart
+from neb.methods import LEPSEnergyAndGradient
+
+from helpers import lepsMolecule, lepsPath
+
+# the energies of the beads of the zigzag band: increasing, a maximum,
+# a minimum and a maximum with the higher neighbour after it
+ENERGIES = [0.0, 2.0, 3.0, 1.0, 2.5, 2.2]
+
+def zigzagBand(energies=ENERGIES, **kwargs):
+    """ Returns a NEB whose first atom zigzags along x, evaluated with
+        the energies tabulated by bead and without gradients
+    """
+    def tabulatedEnergy(molecule):
+        c = molecule.getCoordinates()
+        return energies[int(round(c[0,0]))], numpy.zeros(numpy.shape(c))
+
+    template = lepsMolecule(1.0, 1.0)
+    c = numpy.array([template.getCoordinates()] * len(energies))
+    c[:,0,0] = numpy.arange(len(energies))
+    c[:,0,1] = [0.0, 0.5, -0.3, 0.4, 0.0, 0.6]
+    n = neb.NEB(Restart.fromCoordinates(template, c), 1.0, **kwargs)
+    n.beadForces(tabulatedEnergy)
+    return n
+
+def unit(v):
+    return v / numpy.linalg.norm(v)
+
+class TestTangents(unittest.TestCase):
+
+    def testImproved(self):
+        n = zigzagBand()
+        R = n.getBandCoordinates()
+        tm = R[1:-1] - R[:-2]
+        tp = R[2:] - R[1:-1]
+        expected = [
+            tp[0],                 # uphill: the higher neighbour is ahead
+            1.0*tp[1] + 2.0*tm[1], # maximum: weighted by the energy differences
+            1.5*tp[2] + 2.0*tm[2], # minimum
+            1.5*tp[3] + 0.3*tm[3], # maximum with the higher neighbour ahead
+        ]
+        t = n.getTangents()
+        for ibead, tangent in enumerate(expected, start=1):
+            numpy.testing.assert_allclose(t[ibead], unit(tangent), atol=1.0e-12)
+        numpy.testing.assert_array_equal(t[[0, -1]], 0.0)
+
+    def testDownhill(self):
+        # the tangent points to the lower neighbour on the way down
+        n = zigzagBand(ENERGIES[::-1])
+        R = n.getBandCoordinates()
+        numpy.testing.assert_allclose(n.getTangents()[4], unit(R[4] - R[3]), atol=1.0e-12)
+
+    def testBisection(self):
+        n = zigzagBand(tangent='bisection')
+        R = n.getBandCoordinates()
+        t = n.getTangents()
+        for ibead in range(1, len(R) - 1):
+            expected = unit(unit(R[ibead] - R[ibead-1]) + unit(R[ibead+1] - R[ibead]))
+            numpy.testing.assert_allclose(t[ibead], expected, atol=1.0e-12)
+
+class TestVariableSprings(unittest.TestCase):
+
+    def testZigzag(self):
+        n = zigzagBand(kmin=0.1)
+        # the springs between the beads have the energies 2, 3, 3, 2.5 and 2.5
+        # against the higher endpoint at 2.2 and the highest bead at 3
+        k = n._springConstants()
+        numpy.testing.assert_allclose(k, [0.1, 1.0, 1.0, 1.0 - 0.9*0.5/0.8, 1.0 - 0.9*0.5/0.8])
+
+        # the spring forces use the constants of both springs of a bead
+        R = n.getBandCoordinates()
+        d = [numpy.linalg.norm(R[i+1] - R[i]) for i in range(len(R) - 1)]
+        t = n.getTangents()
+        for ibead in range(1, len(R) - 1):
+            expected = (k[ibead]*d[ibead] - k[ibead-1]*d[ibead-1]) * t[ibead]
+            numpy.testing.assert_allclose(n._springforces[ibead], expected, atol=1.0e-12)
+
+    def testLEPS(self):
+        n = neb.NEB(lepsPath(), 1.0, kmin=0.1)
+        n.beadForces(LEPSEnergyAndGradient)
+        k = n._springConstants()
+        self.assertTrue(numpy.all(k >= 0.1))
+        self.assertTrue(numpy.all(k <= 1.0))
+        # the springs of the highest bead are the stiffest
+        imax = numpy.argmax(n.getEnergies())
+        self.assertEqual((k[imax-1], k[imax]), (1.0, 1.0))
+        self.assertTrue(len(numpy.unique(k)) > 2)
+
+    def testConstant(self):
+        n = neb.NEB(lepsPath(), 1.0)
+        n.beadForces(LEPSEnergyAndGradient)
+        numpy.testing.assert_array_equal(n._springConstants(), 1.0)
+
+        # no bead above the endpoints
+        n = zigzagBand(kmin=0.1)
+        n._energies[[0, -1]] = 5.0
+        numpy.testing.assert_array_equal(n._springConstants(), 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+""" Tests of the angles and dihedrals enumerated from the topology """
+import unittest
+
+import neb
+from neb.angle import Angle
+from neb.bond import Bond
+from neb.topology import Topology
+
+def pairwiseAngles(bonds):
+    """ Reference angles from all pairs of bonds (the original percieveAngles) """
+    bonds = list(bonds)
+    for ibd, bond1 in enumerate(bonds):
+        for jbd, bond2 in enumerate(bonds):
+            if ibd <= jbd: continue
+            jatm = bond1.sharesAtom(bond2)
+            if jatm >= 0:
+                iatm = bond1.getNbrAtomIdx(jatm)
+                katm = bond2.getNbrAtomIdx(jatm)
+                yield Angle(iatm, jatm, katm)
+
+def tripleDihedrals(bonds):
+    """ Reference dihedrals i-j-k-l from all triples of bonds (i,j), (j,k) and (k,l) """
+    bonds = [b.getAtomIndices() for b in bonds]
+    dihedrals = set()
+    for b1 in bonds:
+        for b2 in bonds:
+            for b3 in bonds:
+                for (i, j) in (b1, b1[::-1]):
+                    for (k, l) in (b3, b3[::-1]):
+                        if set((j, k)) == set(b2) and b1 != b2 and b3 != b2 and i != l and len(set((i, j, k, l))) == 4:
+                            dihedrals.add(canonical((i, j, k, l)))
+    return dihedrals
+
+def canonical(indices):
+    """ Angles and dihedrals are the same read in both directions """
+    return min(tuple(indices), tuple(indices[::-1]))
+
+def angleKey(a):
+    return canonical((a._id1, a._id2, a._id3))
+
+def dihedralKey(d):
+    return canonical((d._id1, d._id2, d._id3, d._id4))
+
+def ethanol():
+    m = neb.Molecule()
+    m.addAtoms(
+        neb.Atom(6, xyz=[0.00, 0.00, 0.00]),
+        neb.Atom(6, xyz=[1.52, 0.00, 0.00]),
+        neb.Atom(8, xyz=[2.00, 1.35, 0.00]),
+        neb.Atom(1, xyz=[-0.36, 1.03, 0.00]),
+        neb.Atom(1, xyz=[-0.36, -0.51, 0.89]),
+        neb.Atom(1, xyz=[-0.36, -0.51, -0.89]),
+        neb.Atom(1, xyz=[1.88, -0.51, 0.89]),
+        neb.Atom(1, xyz=[1.88, -0.51, -0.89]),
+        neb.Atom(1, xyz=[2.96, 1.35, 0.00])
+    )
+    return m
+
+class TestTopology(unittest.TestCase):
+
+    def checkTopology(self, topology):
+        angles = [angleKey(a) for a in topology.getAngles()]
+        reference = [angleKey(a) for a in pairwiseAngles(topology.getBonds())]
+        self.assertEqual(len(angles), len(set(angles)))
+        self.assertEqual(sorted(angles), sorted(reference))
+
+        dihedrals = [dihedralKey(d) for d in topology.getDihedrals()]
+        self.assertEqual(len(dihedrals), len(set(dihedrals)))
+        self.assertEqual(set(dihedrals), tripleDihedrals(topology.getBonds()))
+        return angles, dihedrals
+
+    def testEthanol(self):
+        m = ethanol()
+        self.assertEqual(len(list(m.getBonds())), 8)
+        angles, dihedrals = self.checkTopology(m.getTopology())
+        self.assertEqual((len(angles), len(dihedrals)), (13, 12))
+        self.assertEqual(sorted(angleKey(a) for a in m.percieveAngles()), sorted(angles))
+        self.assertEqual(m.getTopology().getNeighbours(1), [0, 2, 6, 7])
+
+    def testRings(self):
+        # a three and a four membered ring sharing an atom with a substituent
+        bonds = [Bond(0, 1), Bond(1, 2), Bond(2, 0), Bond(2, 3), Bond(3, 4), Bond(4, 5), Bond(5, 2), Bond(5, 6)]
+        self.checkTopology(Topology(7, bonds))
+
+    def testCache(self):
+        # the topology is kept until atoms are added
+        m = ethanol()
+        topology = m.getTopology()
+        self.assertTrue(m.getTopology() is topology)
+        m.addAtoms(neb.Atom(1, xyz=[2.0, 2.3, 0.0]))
+        self.assertFalse(m.getTopology() is topology)
+        self.assertEqual(m.getTopology().getNeighbours(2), [1, 8, 9])
+
+if __name__ == '__main__':
+    unittest.main()